@@ -0,0 +1,92 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+from models import Answer, db
+
+
+def answer_text_for(raw_answer):
+    # Convert boolean answers to string representation
+    if isinstance(raw_answer, bool):
+        return str(raw_answer).lower()
+    return str(raw_answer)
+
+
+def case_answers_statement(workflow_id, case_id):
+    """
+    SELECT of every stored answer of a case (see load_case_answers).
+    """
+    return select(Answer).filter_by(workflow_id=workflow_id,
+                                    case_number=case_id)
+
+
+def load_case_answers(workflow_id, case_id):
+    """
+    Load every stored answer of a case with a single query.
+
+    Args:
+    - workflow_id (str): Workflow template the answers belong to.
+    - case_id (str): Case id (stored in Answer.case_number).
+
+    Returns:
+    - dict: question_id -> Answer
+    """
+    answers = db.session.scalars(case_answers_statement(workflow_id,
+                                                        case_id)).all()
+    return {answer.question_id: answer for answer in answers}
+
+
+def save_case_answers(template, case, form_data, existing=None):
+    """
+    Write the answers of a submitted form for a case in bulk.
+
+    Existing answers are loaded with one query (unless passed in as
+    `existing`) and diffed against the form; only new answers are
+    inserted and only changed answers are updated, each as a single
+    executemany statement. The caller owns the transaction and commits.
+
+    Args:
+    - template (WorkflowTemplate): Template with questions_list populated.
+    - case (Case): Case the answers belong to.
+    - form_data (dict): Submitted form data keyed by question_<id>.
+    - existing (dict): Optional result of load_case_answers().
+
+    Returns:
+    - tuple: (number of inserted answers, number of updated answers)
+    """
+    if existing is None:
+        existing = load_case_answers(template.id, case.id)
+
+    inserts = []
+    updates = []
+    updated_answers = []
+    for question in template.questions_list:
+        field_id = f'question_{question.question_id}'
+        answer_text = answer_text_for(form_data.get(field_id, ''))
+
+        answer = existing.get(question.question_id)
+        if answer is None:
+            inserts.append({
+                'workflow_id': template.id,
+                'question_id': question.question_id,
+                'answer_text': answer_text,
+                'case_id': case.id,
+                'case_number': case.id,
+            })
+        elif answer.answer_text != answer_text:
+            updates.append({'id': answer.id, 'answer_text': answer_text})
+            updated_answers.append(answer)
+
+    if inserts:
+        db.session.bulk_insert_mappings(Answer, inserts)
+    if updates:
+        db.session.bulk_update_mappings(Answer, updates)
+        # Keep the loaded instances in step with the bulk update
+        for answer in updated_answers:
+            db.session.expire(answer, ['answer_text'])
+    if inserts or updates:
+        # Bulk writes skip the ORM, so bump the case's version by hand
+        # (case ETags, the inbox order and incremental backups use it)
+        case.updated_on = datetime.utcnow()
+
+    return len(inserts), len(updates)
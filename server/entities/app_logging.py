@@ -0,0 +1,202 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import (QueueHandler, QueueListener,
+                              TimedRotatingFileHandler)
+
+from flask import g, has_request_context, request
+
+# Application logging.
+#
+# Records are put on an in-memory queue by the request thread and written by
+# a QueueListener thread, so file and console I/O (and JSON formatting) stay
+# off the request path. Files get one JSON object per line.
+#
+# Config (app.config, or the environment variable of the same name):
+# - LOG_LEVEL: root level (default INFO)
+# - LOG_LEVELS: per-logger levels, e.g. "case_export=DEBUG,sqlalchemy=WARNING"
+# - LOG_FILE: JSON log file, rotated every 3 days (default app.log; '' = off)
+# - LOG_CONSOLE_LEVEL: level of the plain-text console output (default INFO)
+# - LOG_SAMPLE_RATE: share of requests whose DEBUG records are kept
+#   (default 0.01); DEBUG records outside requests are always kept
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_QUEUE_SIZE = 10000
+
+# Attributes every LogRecord has; anything else was passed with extra={...}
+_RECORD_ATTRIBUTES = set(
+    logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {
+        'message', 'asctime', 'request_id', 'endpoint', 'method', 'path'
+    }
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: time, level, logger, message, request
+    fields and any `extra` values.
+    """
+
+    def format(self, record):
+        created = datetime.fromtimestamp(record.created, timezone.utc)
+        entry = {
+            'time': created.isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name in ('request_id', 'endpoint', 'method', 'path'):
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        for name, value in record.__dict__.items():
+            if name not in _RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Tag records with the current request (runs on the calling thread, before
+    the record is queued) and drop DEBUG records of unsampled requests.
+    """
+
+    def filter(self, record):
+        if not has_request_context():
+            return True
+        if record.levelno < logging.INFO and not g.get('log_sampled', False):
+            return False
+        record.request_id = g.get('request_id')
+        record.endpoint = request.endpoint
+        record.method = request.method
+        record.path = request.path
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread. Only the
+    message is resolved here, so mutable arguments are captured as they are
+    when the call is made.
+
+    When the listener falls behind and the queue is full, records are
+    dropped and counted in `dropped` rather than reported through
+    handleError (a traceback written to stderr on the request thread).
+    """
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def parse_levels(value):
+    """
+    "a=DEBUG,b.c=WARNING" (or a dict) -> {'a': 'DEBUG', 'b.c': 'WARNING'}
+    """
+    if isinstance(value, dict):
+        return value
+    levels = {}
+    for item in (value or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _setting(app, name, default):
+    if name in os.environ:
+        return os.environ[name]
+    return app.config.get(name, default)
+
+
+class AppLogging:
+
+    def __init__(self):
+        self.queue = None
+        self.handler = None
+        self.listener = None
+
+    def init_app(self, app):
+        """
+        Route the root logger through the queue and start the listener.
+        """
+        if self.listener is not None:
+            return
+
+        handlers = []
+        log_file = _setting(app, 'LOG_FILE', 'app.log')
+        if log_file:
+            # Rotate logs every 3 days, keep last 3 as backup
+            file_handler = TimedRotatingFileHandler(log_file,
+                                                    when='D',
+                                                    interval=3,
+                                                    backupCount=3)
+            file_handler.setFormatter(JsonFormatter())
+            handlers.append(file_handler)
+
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(_setting(app, 'LOG_CONSOLE_LEVEL', 'INFO'))
+        console_handler.setFormatter(logging.Formatter(DEFAULT_FORMAT))
+        handlers.append(console_handler)
+
+        self.queue = queue.Queue(LOG_QUEUE_SIZE)
+        queue_handler = self.handler = LazyQueueHandler(self.queue)
+        queue_handler.addFilter(RequestContextFilter())
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(_setting(app, 'LOG_LEVEL', 'INFO'))
+        for name, level in parse_levels(_setting(app, 'LOG_LEVELS',
+                                                 '')).items():
+            logging.getLogger(name).setLevel(level)
+
+        # Flask's app.logger has its own handler unless it propagates only
+        app.logger.handlers.clear()
+        app.logger.propagate = True
+
+        self.listener = QueueListener(self.queue,
+                                      *handlers,
+                                      respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.stop)
+
+        sample_rate = float(_setting(app, 'LOG_SAMPLE_RATE', 0.01))
+
+        @app.before_request
+        def _start_request_logging():
+            g.request_id = request.headers.get('X-Request-ID',
+                                               uuid.uuid4().hex[:12])
+            g.log_sampled = random.random() < sample_rate
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+
+app_logging = AppLogging()
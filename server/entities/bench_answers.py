@@ -0,0 +1,134 @@
+"""
+Benchmark: per-question answer writes vs. the batched save_case_answers().
+
+Usage:
+    python bench_answers.py --questions 60 --rounds 50
+
+Runs against a throw-away SQLite file so commits hit the disk the same way
+they do for site.db.
+"""
+import argparse
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from flask import Flask
+
+from models import Answer, Case, Question, QuestionType, WorkflowTemplate, db
+from answers import save_case_answers
+
+
+def per_question_save(template, case, form_data):
+    # The write path edit_case used before save_case_answers()
+    for question in template.questions_list:
+        field_id = f'question_{question.question_id}'
+        answer_text = str(form_data.get(field_id, ''))
+
+        answer = Answer.query.filter_by(workflow_id=template.id,
+                                        question_id=question.question_id,
+                                        case_number=case.id).first()
+        if answer:
+            answer.answer_text = answer_text
+        else:
+            answer = Answer()
+            answer.workflow_id = template.id
+            answer.question_id = question.question_id
+            answer.answer_text = answer_text
+            answer.case_id = case.id
+            answer.case_number = case.id
+            db.session.add(answer)
+
+
+def seed(question_count):
+    question_type = QuestionType(type='text', author='bench')
+    db.session.add(question_type)
+    db.session.flush()
+
+    questions = [
+        Question(question_text=f'Question {i}',
+                 question_type_id=question_type.question_type_id,
+                 author='bench') for i in range(question_count)
+    ]
+    db.session.add_all(questions)
+    db.session.flush()
+
+    template = WorkflowTemplate(title='bench',
+                                role_ids='r1',
+                                question_ids=','.join(q.question_id
+                                                      for q in questions),
+                                author='bench')
+    db.session.add(template)
+    db.session.flush()
+    template.questions_list = questions
+    db.session.commit()
+    return template
+
+
+def new_case(template):
+    case = Case(workflow_id=template.id,
+                current_role_id='r1',
+                author_username='bench')
+    db.session.add(case)
+    db.session.commit()
+    return case
+
+
+def run(save, template, rounds):
+    timings = []
+    for _ in range(rounds):
+        case = new_case(template)
+        # First submit inserts every answer, second one updates them all
+        for value in ('first', 'second'):
+            form_data = {
+                f'question_{q.question_id}': f'{value} {q.question_id}'
+                for q in template.questions_list
+            }
+            started = time.perf_counter()
+            save(template, case, form_data)
+            db.session.commit()
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(name, timings, question_count):
+    timings = sorted(timings)
+    mean = sum(timings) / len(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f'{name:>14}: mean {mean * 1000:8.2f} ms/submit, '
+          f'p95 {p95 * 1000:8.2f} ms, '
+          f'{mean / question_count * 1e6:8.1f} us/question')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--questions', type=int, default=60)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    try:
+        with app.app_context():
+            db.create_all()
+            template = seed(args.questions)
+            print(f'{args.questions} questions, {args.rounds} cases, '
+                  f'2 submits per case')
+            report('per-question',
+                   run(per_question_save, template, args.rounds),
+                   args.questions)
+            report('batched', run(save_case_answers, template, args.rounds),
+                   args.questions)
+            db.session.remove()
+            db.engine.dispose()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,547 @@
+"""
+Benchmark: the hot routes against a seeded database of configurable size.
+
+Usage:
+    python bench_routes.py --scale small --output results.json
+    python bench_routes.py --scale production --database /tmp/bench.db \
+        --baseline results.json --max-regression 20
+
+A SQLite file is seeded with synthetic users, questions, workflow templates,
+approval stages, cases, answers, events and notifications (an existing
+--database file is reused as is, so a large seed only has to be paid once).
+Each route is then driven through the Flask test client and reported with
+p50/p95/p99 latency, SQL statements per request and peak Python memory.
+Results are written as JSON; with --baseline the run is compared against an
+earlier result and exits with status 1 when p95 latency or statements per
+request grew by more than --max-regression percent.
+
+A route that answers anything but 2xx/3xx fails the run (exit status 1, no
+--output written), so a baseline never times error pages. When the Jinja
+templates are not installed next to main.py, render_template is replaced by
+a stub that renders nothing: the view's own queries and work are measured,
+the template's are not (results carry "templates_stubbed": true).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Volumes per --scale; any of them can be overridden on the command line
+SCALES = {
+    'small': {
+        'users': 50,
+        'questions': 100,
+        'templates': 10,
+        'cases': 2000,
+        'answers': 40000,
+        'events': 10000,
+        'messages': 1000,
+    },
+    'production': {
+        'users': 1000,
+        'questions': 500,
+        'templates': 50,
+        'cases': 200000,
+        'answers': 10000000,
+        'events': 1000000,
+        'messages': 50000,
+    },
+}
+
+ROUTES = ('select_workflow_template', 'execute_workflow',
+          'execute_workflow_post', 'view_case', 'edit_case', 'dashboard',
+          'get_notifications')
+
+STATUSES = ('active', 'pending', 'completed', 'abandoned')
+STAGES_PER_TEMPLATE = 3
+SEED_BATCH_SIZE = 10000
+
+
+# ===============================================
+# Seeding
+
+
+def _insert(connection, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == SEED_BATCH_SIZE:
+            connection.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        connection.execute(table.insert(), batch)
+
+
+def seed(volumes, rng):
+    """
+    Fill an empty database with synthetic rows through Core inserts (the
+    model defaults and ORM events are bypassed, the SQL triggers are not).
+
+    Args:
+    - volumes (dict): Row counts, see SCALES.
+    - rng (random.Random): Source of the synthetic values.
+
+    Returns:
+    - float: Seconds spent seeding.
+    """
+    from models import (Answer, ApprovalStage, Case, Event, InternalMessage,
+                        Question, QuestionType, Role, User, WorkflowTemplate,
+                        db, user_roles)
+    from case_counters import rebuild_counters
+
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    user_ids = [f'u{i:06d}' for i in range(volumes['users'])]
+    question_ids = [f'q{i:05d}' for i in range(volumes['questions'])]
+    template_ids = [f't{i:04d}' for i in range(volumes['templates'])]
+    role_ids = ['r-admin', 'r-review', 'r-approve']
+
+    # Enough questions per template to hold answers/cases answers per case
+    per_case = max(1, -(-volumes['answers'] // max(volumes['cases'], 1)))
+    per_template = min(len(question_ids), max(10, per_case))
+    template_questions = {
+        template_id: rng.sample(question_ids, per_template)
+        for template_id in template_ids
+    }
+
+    with db.engine.begin() as connection:
+        _insert(connection, Role.__table__, [{
+            'role_id': role_id,
+            'role_name': role_id[2:] if role_id != 'r-admin' else 'admin',
+            'is_active': True,
+            'created_on': now,
+            'updated_on': now,
+        } for role_id in role_ids])
+        _insert(connection, User.__table__, ({
+            'user_id': user_id,
+            'username': f'user{index}',
+            'email': f'user{index}@example.com',
+            'password_hash': 'x',
+            'is_active': True,
+            'created_on': now,
+            'updated_on': now,
+        } for index, user_id in enumerate(user_ids)))
+        _insert(connection, user_roles, [{
+            'user_id': user_ids[0],
+            'role_id': 'r-admin'
+        }] + [{
+            'user_id': user_id,
+            'role_id': role_ids[1 + index % 2]
+        } for index, user_id in enumerate(user_ids[1:])])
+
+        _insert(connection, QuestionType.__table__, [{
+            'question_type_id': 'qt-text',
+            'type': 'text',
+            'is_active': True,
+            'has_regex': False,
+            'has_options': False,
+            'has_supplemental': False,
+            'created_on': now,
+            'updated_on': now,
+        }])
+        _insert(connection, Question.__table__, ({
+            'question_id': question_id,
+            'question_text': f'Question {index}',
+            'question_type_id': 'qt-text',
+            'created_on': now,
+            'updated_on': now,
+        } for index, question_id in enumerate(question_ids)))
+
+        _insert(connection, WorkflowTemplate.__table__, ({
+            'id': template_id,
+            'title': f'Template {index}',
+            'role_ids': ','.join(role_ids),
+            'question_ids': ','.join(template_questions[template_id]),
+            'author': 'bench',
+            'created_on': now,
+            'updated_on': now,
+        } for index, template_id in enumerate(template_ids)))
+        orders = range(1, STAGES_PER_TEMPLATE + 1)
+        _insert(connection, ApprovalStage.__table__, ({
+            'stage_id': f'{template_id}-s{order}',
+            'stage_name': f'{template_id} stage {order}',
+            'next_stage_name': (f'{template_id} stage {order + 1}'
+                                if order < STAGES_PER_TEMPLATE else None),
+            'is_first': order == 1,
+            'is_last': order == STAGES_PER_TEMPLATE,
+            'order': order,
+            'workflow_template_id': template_id,
+            'approve_role_id': role_ids[order % len(role_ids)],
+            'deny_role_id': role_ids[0],
+            'author': 'bench',
+            'created_on': now,
+            'modified_on': now,
+        } for template_id in template_ids for order in orders))
+
+        case_templates = [
+            rng.choice(template_ids) for _ in range(volumes['cases'])
+        ]
+
+        def cases():
+            for index, template_id in enumerate(case_templates):
+                created = now - timedelta(minutes=index)
+                yield {
+                    'id': f'c{index:08d}',
+                    'case_number': f'n{index:08d}',
+                    'workflow_id': template_id,
+                    'current_role_id': role_ids[index % len(role_ids)],
+                    'current_stage_id':
+                    f'{template_id}-s{1 + index % STAGES_PER_TEMPLATE}',
+                    'created_on': created,
+                    'updated_on': created,
+                    'user_id': rng.choice(user_ids),
+                    'author_username': 'bench',
+                    'status': STATUSES[index % len(STATUSES)],
+                }
+
+        _insert(connection, Case.__table__, cases())
+
+        def answers():
+            case_count = len(case_templates)
+            for index in range(volumes['answers'] if case_count else 0):
+                case_index = index % case_count
+                template_id = case_templates[case_index]
+                questions = template_questions[template_id]
+                case_id = f'c{case_index:08d}'
+                yield {
+                    'id': f'a{index:09d}',
+                    'case_id': case_id,
+                    'case_number': case_id,
+                    'workflow_id': template_id,
+                    'question_id':
+                    questions[(index // case_count) % len(questions)],
+                    'user_id': None,
+                    'answer_text': f'answer {rng.randrange(100000)}',
+                    'created_on': now,
+                }
+
+        _insert(connection, Answer.__table__, answers())
+
+        _insert(connection, Event.__table__, ({
+            'id': f'e{index:08d}',
+            'case_id': f'c{index % len(case_templates):08d}',
+            'event_type': 'status_change',
+            'old_value': STATUSES[index % len(STATUSES)],
+            'new_value': STATUSES[(index + 1) % len(STATUSES)],
+            'created_on': now,
+        } for index in range(volumes['events'] if case_templates else 0)))
+
+        _insert(connection, InternalMessage.__table__, ({
+            'id': f'm{index:08d}',
+            'to_user_id': user_ids[index % len(user_ids)],
+            'subject': f'Case update {index}',
+            'content': 'A case assigned to you changed.',
+            'is_read': index % 3 == 0,
+            'created_on': now - timedelta(seconds=index),
+        } for index in range(volumes['messages'])))
+
+        connection.exec_driver_sql('ANALYZE')
+
+    rebuild_counters()
+    return time.perf_counter() - started
+
+
+# ===============================================
+# Measuring
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a sorted list.
+    """
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+class RouteDriver:
+    """
+    Builds the next request of each route with random but valid arguments.
+    """
+
+    def __init__(self, client, rng):
+        from models import Case, User, WorkflowTemplate, db
+        from template_resolver import split_ids
+
+        self.client = client
+        self.rng = rng
+        self.case_ids = list(
+            db.session.execute(db.select(Case.id).order_by(
+                Case.updated_on.desc()).limit(10000)).scalars())
+        self.user_ids = list(
+            db.session.execute(db.select(User.user_id)).scalars())
+        self.templates = [(template.id, split_ids(template.question_ids))
+                          for template in WorkflowTemplate.query.all()]
+        db.session.remove()
+        # The first user is the admin: sees every case
+        self.login(self.user_ids[0])
+
+    def login(self, user_id):
+        with self.client.session_transaction() as session:
+            session['user_id'] = user_id
+            session['username'] = 'bench'
+
+    def request(self, route):
+        case_id = self.rng.choice(self.case_ids) if self.case_ids else 'none'
+        if route == 'select_workflow_template':
+            return self.client.get('/select_workflow_template?limit=50')
+        if route == 'execute_workflow':
+            return self.client.get('/execute_workflow')
+        if route == 'execute_workflow_post':
+            template_id, question_ids = self.rng.choice(self.templates)
+            data = {
+                f'question_{question_id}': f'bench {self.rng.randrange(1000)}'
+                for question_id in question_ids
+            }
+            data.update(template_id=template_id,
+                        user_id=self.rng.choice(self.user_ids))
+            return self.client.post('/execute_workflow', data=data)
+        if route == 'view_case':
+            return self.client.get(f'/view_case/{case_id}')
+        if route == 'edit_case':
+            return self.client.get(f'/edit_case/{case_id}')
+        if route == 'dashboard':
+            return self.client.get('/dashboard')
+        if route == 'get_notifications':
+            self.login(self.rng.choice(self.user_ids))
+            try:
+                return self.client.get('/notifications')
+            finally:
+                self.login(self.user_ids[0])
+        raise ValueError(f'Unknown route: {route}')
+
+
+def measure(driver, route, requests, warmup, memory_requests):
+    """
+    Latency and statements per request of `requests` calls, then peak
+    traced memory over `memory_requests` more (tracing slows requests down,
+    so it is kept out of the timed calls).
+    """
+    from query_detector import count_queries
+
+    for _ in range(warmup):
+        driver.request(route)
+
+    latencies, statement_counts, statuses = [], [], {}
+    for _ in range(requests):
+        with count_queries() as statements:
+            started = time.perf_counter()
+            response = driver.request(route)
+            latencies.append(time.perf_counter() - started)
+        statement_counts.append(len(statements))
+        statuses[response.status_code] = statuses.get(response.status_code,
+                                                      0) + 1
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        for _ in range(memory_requests):
+            tracemalloc.reset_peak()
+            driver.request(route)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+    failures = sum(count for code, count in statuses.items() if code >= 400)
+    latencies.sort()
+    return {
+        'requests': requests,
+        'failures': failures,
+        'statuses': {str(code): count
+                     for code, count in sorted(statuses.items())},
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': latencies[-1] * 1000,
+        'statements_per_request': sum(statement_counts) / requests,
+        'max_statements': max(statement_counts),
+        'peak_memory_kb': peak // 1024,
+    }
+
+
+def compare(results, baseline, max_regression):
+    """
+    Print the change of every route against a baseline result.
+
+    Returns:
+    - list: Routes whose p95 or statements per request grew by more than
+      max_regression percent.
+    """
+    regressions = []
+    print(f'\nAgainst baseline from {baseline.get("started")}:')
+    for route, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(route)
+        if previous is None:
+            print(f'{route:>26}: not in baseline')
+            continue
+        changes = {}
+        for key in ('p95_ms', 'statements_per_request'):
+            if previous[key]:
+                changes[key] = (current[key] - previous[key]) / previous[
+                    key] * 100
+            else:
+                changes[key] = 0.0 if not current[key] else float('inf')
+        print(f'{route:>26}: p95 {changes["p95_ms"]:+7.1f}%, '
+              f'statements {changes["statements_per_request"]:+7.1f}%')
+        if max_regression is not None and any(
+                change > max_regression for change in changes.values()):
+            regressions.append(route)
+    return regressions
+
+
+def stub_templates(main_module):
+    """
+    Replace main.render_template with one that renders nothing when the
+    templates are not installed.
+
+    Returns:
+    - bool: Whether the stub was installed.
+    """
+    app = main_module.app
+    if os.path.isdir(os.path.join(app.root_path, app.template_folder)):
+        return False
+    main_module.render_template = lambda template_name, **context: ''
+    return True
+
+
+# ===============================================
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scale', choices=list(SCALES), default='small')
+    for name in SCALES['small']:
+        parser.add_argument(f'--{name}',
+                            type=int,
+                            help=f'Override the number of {name}.')
+    parser.add_argument('--database',
+                        help='SQLite file to seed, or reuse if it exists '
+                        '(default: a throw-away temp file).')
+    parser.add_argument('--route',
+                        action='append',
+                        choices=ROUTES,
+                        help='Routes to drive (default: all).')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--memory-requests', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the results as JSON.')
+    parser.add_argument('--baseline', help='Earlier --output to compare to.')
+    parser.add_argument('--max-regression',
+                        type=float,
+                        help='With --baseline: fail when p95 or statements '
+                        'per request grew by more than this percentage.')
+    args = parser.parse_args()
+
+    volumes = dict(SCALES[args.scale])
+    for name in volumes:
+        if getattr(args, name) is not None:
+            volumes[name] = getattr(args, name)
+
+    path = args.database
+    temporary = path is None
+    if temporary:
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        os.remove(path)
+    reuse = os.path.exists(path)
+
+    # main.py reads these at import time
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(path)}'
+    os.environ['EVENT_PIPELINE_MODE'] = 'sync'
+    os.environ['N_PLUS_ONE_DETECTION'] = '0'
+    # Records are still created and queued as in production, not printed
+    os.environ.setdefault('LOG_FILE', '')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('LOG_CONSOLE_LEVEL', 'CRITICAL')
+    import main as main_module
+    from main import app, db
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    templates_stubbed = stub_templates(main_module)
+    rng = random.Random(args.seed)
+    results = {
+        'started': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'database_profile': app.config['DATABASE_PROFILE'],
+        'volumes': volumes,
+        'reused_database': reuse,
+        'templates_stubbed': templates_stubbed,
+        'routes': {},
+    }
+    if templates_stubbed:
+        print('No templates installed: render_template is stubbed')
+
+    try:
+        with app.app_context():
+            if reuse:
+                print(f'Reusing {path}')
+            else:
+                db.create_all()
+                print(f'Seeding {path}: ' +
+                      ', '.join(f'{count} {name}'
+                                for name, count in volumes.items()))
+                results['seed_seconds'] = seed(volumes, rng)
+                print(f'Seeded in {results["seed_seconds"]:.1f}s')
+            driver = RouteDriver(app.test_client(), rng)
+
+        print(f'\n{"route":>26} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+              f'{"SQL/req":>8} {"peak KB":>8}  statuses')
+        for route in args.route or ROUTES:
+            result = measure(driver, route, args.requests, args.warmup,
+                             args.memory_requests)
+            results['routes'][route] = result
+            print(f'{route:>26} {result["p50_ms"]:8.2f} '
+                  f'{result["p95_ms"]:8.2f} {result["p99_ms"]:8.2f} '
+                  f'{result["statements_per_request"]:8.1f} '
+                  f'{result["peak_memory_kb"]:8d}  {result["statuses"]}')
+
+        # ru_maxrss is in KB on Linux, bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        results['max_rss_kb'] = max_rss // 1024 if (
+            sys.platform == 'darwin') else max_rss
+        print(f'\nProcess peak RSS: {results["max_rss_kb"]} KB')
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        if temporary:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    failed = [
+        route for route, result in results['routes'].items()
+        if result['failures']
+    ]
+    if failed:
+        print(f'Failed (non-2xx/3xx responses): {", ".join(failed)}')
+        if args.output:
+            print(f'{args.output} not written')
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+        print(f'Results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline),
+                                  args.max_regression)
+        if regressions:
+            print(f'Regressed: {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark: concurrent reads/writes with each DATABASE_PROFILE.
+
+Usage:
+    python bench_sqlite_profile.py --writers 4 --readers 8 --seconds 5
+
+For every profile a throw-away, file-backed SQLite database is seeded with
+cases; writer threads then update case statuses and append events while
+reader threads page through the case list. Reports committed operations per
+second and how many operations failed with "database is locked".
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+from models import Case, Event, WorkflowTemplate, db
+from db_profile import (DATABASE_PROFILES, apply_database_profile,
+                        install_sqlite_pragmas, sqlite_settings)
+
+STATUSES = ('submitted', 'in_review', 'approved', 'denied')
+
+
+def make_app(path, profile):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['DATABASE_PROFILE'] = profile
+    apply_database_profile(app)
+    db.init_app(app)
+    install_sqlite_pragmas(app)
+    return app
+
+
+def seed(case_count):
+    template = WorkflowTemplate(title='bench',
+                                role_ids='r1',
+                                question_ids='',
+                                author='bench')
+    db.session.add(template)
+    db.session.flush()
+    cases = [
+        Case(workflow_id=template.id,
+             current_role_id='r1',
+             status=STATUSES[i % len(STATUSES)],
+             author_username='bench') for i in range(case_count)
+    ]
+    db.session.add_all(cases)
+    db.session.commit()
+    return [case.id for case in cases]
+
+
+class Counter:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ok = 0
+        self.locked = 0
+
+    def add(self, ok):
+        with self.lock:
+            if ok:
+                self.ok += 1
+            else:
+                self.locked += 1
+
+
+def writer(app, case_ids, stop, counter, offset):
+    with app.app_context():
+        index = offset
+        while not stop.is_set():
+            case_id = case_ids[index % len(case_ids)]
+            index += 1
+            try:
+                case = db.session.get(Case, case_id)
+                old_status = case.status
+                case.status = STATUSES[index % len(STATUSES)]
+                db.session.add(
+                    Event(case_id=case_id,
+                          event_type='status_change',
+                          old_value=old_status,
+                          new_value=case.status))
+                db.session.commit()
+                counter.add(True)
+            except OperationalError:
+                db.session.rollback()
+                counter.add(False)
+        db.session.remove()
+
+
+def reader(app, stop, counter):
+    with app.app_context():
+        while not stop.is_set():
+            try:
+                Case.query.order_by(Case.updated_on.desc(),
+                                    Case.id.desc()).limit(50).all()
+                db.session.commit()
+                counter.add(True)
+            except OperationalError:
+                db.session.rollback()
+                counter.add(False)
+        db.session.remove()
+
+
+def run(profile, args):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    app = make_app(path, profile)
+    try:
+        with app.app_context():
+            db.create_all()
+            case_ids = seed(args.cases)
+            with db.engine.connect() as connection:
+                settings = sqlite_settings(connection)
+
+        stop = threading.Event()
+        writes, reads = Counter(), Counter()
+        threads = [
+            threading.Thread(target=writer,
+                             args=(app, case_ids, stop, writes, i * 97))
+            for i in range(args.writers)
+        ] + [
+            threading.Thread(target=reader, args=(app, stop, reads))
+            for _ in range(args.readers)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        with app.app_context():
+            db.engine.dispose()
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    print(f'{profile:>10}: {writes.ok / args.seconds:8.1f} writes/s '
+          f'({writes.locked} locked), {reads.ok / args.seconds:8.1f} reads/s '
+          f'({reads.locked} locked)')
+    print(f'{"":>10}  {settings}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--cases', type=int, default=2000)
+    parser.add_argument('--profile',
+                        action='append',
+                        choices=list(DATABASE_PROFILES),
+                        help='Profiles to compare (default: all).')
+    args = parser.parse_args()
+
+    print(f'{args.writers} writers, {args.readers} readers, '
+          f'{args.seconds:g}s per profile, {args.cases} cases')
+    for profile in args.profile or DATABASE_PROFILES:
+        run(profile, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+import hashlib
+
+from flask import Blueprint, Response, jsonify, request, session
+from sqlalchemy import func, select
+
+from models import Answer, Case, Comment, Event, db
+from case_inbox import CASE_FILTERS, list_cases
+from query_detector import query_budget
+
+# Versioned JSON API over cases and their answers, comments and events.
+#
+#   GET /api/v1/cases                     ?status=&stage_id=&... &after=&limit=
+#   GET /api/v1/cases/<id>                ?fields=&include=answers,comments,events
+#   GET /api/v1/cases/<id>/answers        ?fields=
+#   GET /api/v1/cases/<id>/comments       ?fields=
+#   GET /api/v1/cases/<id>/events         ?fields=
+#
+# `fields` selects a subset of the resource's fields (sparse fieldsets).
+# Single-case responses carry a strong ETag built from Case.updated_on and
+# the number of answers (plus comments/events when those are returned);
+# a matching If-None-Match is answered with 304 after one small query.
+# Like /search and /export, every route requires a logged-in user.
+case_api = Blueprint('case_api', __name__, url_prefix='/api/v1')
+
+# Public field name -> column
+CASE_FIELDS = {
+    'id': Case.id,
+    'case_number': Case.case_number,
+    'workflow_id': Case.workflow_id,
+    'status': Case.status,
+    'current_role_id': Case.current_role_id,
+    'current_stage_id': Case.current_stage_id,
+    'assigned_user_id': Case.assigned_user_id,
+    'author_username': Case.author_username,
+    'modified_by': Case.modified_by,
+    'created_on': Case.created_on,
+    'updated_on': Case.updated_on,
+}
+
+ANSWER_FIELDS = {
+    'id': Answer.id,
+    'question_id': Answer.question_id,
+    'user_id': Answer.user_id,
+    'answer_text': Answer.answer_text,
+    'created_on': Answer.created_on,
+}
+
+COMMENT_FIELDS = {
+    'id': Comment.comment_id,
+    'question_id': Comment.question_id,
+    'user_id': Comment.user_id,
+    'replying_to_id': Comment.replying_to_id,
+    'content': Comment.content,
+    'created_on': Comment.created_on,
+}
+
+EVENT_FIELDS = {
+    'id': Event.id,
+    'event_type': Event.event_type,
+    'old_value': Event.old_value,
+    'new_value': Event.new_value,
+    'created_on': Event.created_on,
+}
+
+# include name -> (model, case id column, fields, order)
+CASE_CHILDREN = {
+    'answers': (Answer, Answer.case_id, ANSWER_FIELDS, Answer.created_on),
+    'comments': (Comment, Comment.case_id, COMMENT_FIELDS, Comment.created_on),
+    'events': (Event, Event.case_id, EVENT_FIELDS, Event.created_on),
+}
+
+
+class ApiError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@case_api.errorhandler(ApiError)
+def _api_error(error):
+    return jsonify(error=error.message), error.status
+
+
+@case_api.before_request
+def _require_login():
+    if not session.get('user_id'):
+        raise ApiError(403, 'Please log in first')
+
+
+def _split(value):
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def selected_fields(available, value):
+    """
+    Columns for a `fields` query argument (all fields when it is empty).
+    Raises ApiError(400) for unknown names.
+    """
+    names = _split(value)
+    if not names:
+        return dict(available)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(
+            400, f"Unknown fields: {', '.join(unknown)}. "
+            f"Available: {', '.join(available)}")
+    return {name: available[name] for name in names}
+
+
+def _encode(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _rows(query, fields):
+    return [{
+        name: _encode(row[index])
+        for index, name in enumerate(fields)
+    } for row in db.session.execute(query)]
+
+
+def case_version(case_id, counted=('answers', )):
+    """
+    One query: Case.updated_on plus the row counts of the `counted`
+    children. Returns None if the case does not exist.
+    """
+    counts = [
+        select(func.count()).where(case_column == Case.id).scalar_subquery()
+        for _, case_column, _, _ in (CASE_CHILDREN[name] for name in counted)
+    ]
+    return db.session.execute(
+        select(Case.updated_on, *counts).where(Case.id == case_id)).first()
+
+
+def case_etag(case_id, version, counted=('answers', )):
+    updated_on, *counts = version
+    parts = [case_id, _encode(updated_on) or '']
+    parts += [f'{name}={count}' for name, count in zip(counted, counts)]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def _conditional(case_id, counted, build):
+    """
+    Answer 304 if the client's ETag still matches, otherwise build the
+    body. Either way the response carries the current ETag.
+    """
+    version = case_version(case_id, counted)
+    if version is None:
+        raise ApiError(404, f'Case {case_id} not found')
+
+    etag = case_etag(case_id, version, counted)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    # Cached copies must be revalidated, which costs a 304 at most
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _children(name, case_ids, fields):
+    model, case_column, _, order = CASE_CHILDREN[name]
+    query = select(case_column, *fields.values()).where(
+        case_column.in_(case_ids)).order_by(order)
+    children = {case_id: [] for case_id in case_ids}
+    for row in db.session.execute(query):
+        children[row[0]].append({
+            field: _encode(row[index + 1])
+            for index, field in enumerate(fields)
+        })
+    return children
+
+
+@case_api.route('/cases')
+@query_budget(2)
+def list_cases_api():
+    fields = selected_fields(CASE_FIELDS, request.args.get('fields'))
+    filters = {name: request.args.get(name) for name in CASE_FILTERS}
+    page = list_cases(filters,
+                      cursor=request.args.get('after'),
+                      limit=request.args.get('limit', type=int))
+    cases = [{
+        name: _encode(getattr(case, column.key))
+        for name, column in fields.items()
+    } for case in page.cases]
+    return jsonify(cases=cases, next_cursor=page.next_cursor)
+
+
+@case_api.route('/cases/<string:case_id>')
+@query_budget(5)
+def get_case_api(case_id):
+    fields = selected_fields(CASE_FIELDS, request.args.get('fields'))
+    include = _split(request.args.get('include'))
+    unknown = [name for name in include if name not in CASE_CHILDREN]
+    if unknown:
+        raise ApiError(400, f"Unknown include: {', '.join(unknown)}")
+    counted = tuple(dict.fromkeys(['answers'] + include))
+
+    def build():
+        rows = _rows(select(*fields.values()).where(Case.id == case_id),
+                     fields)
+        if not rows:
+            # Deleted since case_version() found it
+            raise ApiError(404, f'Case {case_id} not found')
+        case = rows[0]
+        for name in include:
+            child_fields = CASE_CHILDREN[name][2]
+            case[name] = _children(name, [case_id], child_fields)[case_id]
+        return case
+
+    return _conditional(case_id, counted, build)
+
+
+def _child_route(name):
+
+    def get_children_api(case_id):
+        fields = selected_fields(CASE_CHILDREN[name][2],
+                                 request.args.get('fields'))
+        counted = tuple(dict.fromkeys(['answers', name]))
+        return _conditional(
+            case_id, counted,
+            lambda: {name: _children(name, [case_id], fields)[case_id]})
+
+    get_children_api.__name__ = f'get_case_{name}_api'
+    get_children_api.query_budget = 2
+    case_api.add_url_rule(f'/cases/<string:case_id>/{name}',
+                          view_func=get_children_api)
+
+
+for _name in CASE_CHILDREN:
+    _child_route(_name)
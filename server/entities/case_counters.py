@@ -0,0 +1,129 @@
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, inspect
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from models import Case, CaseStatusCount, db
+
+DASHBOARD_STATUSES = ('active', 'pending', 'completed', 'abandoned')
+
+# Column default of Case.status, applied on insert when status is not set
+DEFAULT_STATUS = 'active'
+
+
+def counters_enabled():
+    return has_app_context() and current_app.config.get(
+        'CASE_STATUS_COUNTERS', False)
+
+
+def status_breakdown():
+    """
+    Number of cases per status from a single GROUP BY over `cases`.
+    """
+    rows = db.session.query(Case.status, func.count(Case.id)).group_by(
+        Case.status).all()
+    return {status: count for status, count in rows if status is not None}
+
+
+def counted_status_breakdown():
+    """
+    Number of cases per status read from the case_status_counts table.
+    """
+    return {
+        row.status: row.count
+        for row in CaseStatusCount.query.all()
+    }
+
+
+def dashboard_stats():
+    counts = counted_status_breakdown() if counters_enabled(
+    ) else status_breakdown()
+    stats = {status: 0 for status in DASHBOARD_STATUSES}
+    stats.update(counts)
+    return stats
+
+
+def rebuild_counters():
+    """
+    Recompute case_status_counts from `cases` and commit.
+
+    Returns:
+    - dict: status -> (counted, actual) for every status that was wrong.
+    """
+    actual = status_breakdown()
+    counted = counted_status_breakdown()
+
+    mismatches = {
+        status: (counted.get(status, 0), actual.get(status, 0))
+        for status in set(actual) | set(counted)
+        if counted.get(status, 0) != actual.get(status, 0)
+    }
+
+    CaseStatusCount.query.delete()
+    db.session.add_all([
+        CaseStatusCount(status=status, count=count)
+        for status, count in actual.items()
+    ])
+    db.session.commit()
+    return mismatches
+
+
+# ===================================================
+# Maintenance: every flush that inserts, deletes or changes the status of a
+# Case adjusts case_status_counts on the same connection, so the counters
+# commit or roll back together with the case itself.
+
+
+@event.listens_for(Case.status, 'set', active_history=True)
+def _load_previous_status(case, value, oldvalue, initiator):
+    # active_history makes SQLAlchemy load the old status of an expired
+    # case before it is overwritten, so the flush below can decrement it
+    pass
+
+
+def _status_deltas(session):
+    deltas = {}
+
+    def add(status, delta):
+        if status is not None:
+            deltas[status] = deltas.get(status, 0) + delta
+
+    for case in session.new:
+        if isinstance(case, Case):
+            add(case.status or DEFAULT_STATUS, 1)
+
+    for case in session.dirty:
+        if isinstance(case, Case):
+            history = inspect(case).attrs.status.history
+            if history.added or history.deleted:
+                add(history.deleted[0] if history.deleted else None, -1)
+                add(history.added[0] if history.added else None, 1)
+
+    for case in session.deleted:
+        if isinstance(case, Case):
+            history = inspect(case).attrs.status.history
+            add(history.deleted[0] if history.deleted else case.status, -1)
+
+    return {status: delta for status, delta in deltas.items() if delta}
+
+
+@event.listens_for(Session, 'before_flush')
+def _update_status_counters(session, flush_context, instances):
+    if not counters_enabled():
+        return
+
+    deltas = _status_deltas(session)
+    if not deltas:
+        return
+
+    table = CaseStatusCount.__table__
+    # One upsert per status: two writers creating the first case of a new
+    # status cannot both insert its row
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.status],
+        set_={'count': table.c.count + statement.excluded.count})
+    session.connection().execute(statement, [{
+        'status': status,
+        'count': delta
+    } for status, delta in deltas.items()])
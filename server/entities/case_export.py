@@ -0,0 +1,265 @@
+import csv
+import io
+import json
+import time
+from itertools import chain
+from datetime import datetime
+
+from sqlalchemy import select
+
+from models import Answer, Case, Comment, Event, db
+
+EXPORT_CHUNK_SIZE = 500
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+CASE_COLUMNS = ('id', 'case_number', 'workflow_id', 'status',
+                'current_role_id', 'current_stage_id', 'assigned_user_id',
+                'author_username', 'modified_by', 'created_on', 'updated_on')
+
+# One CSV row per case, answer, comment and event, told apart by record_type
+CSV_COLUMNS = ('record_type', 'case_id', 'case_number', 'workflow_id',
+               'status', 'current_stage_id', 'author_username', 'item_id',
+               'question_id', 'user_id', 'event_type', 'old_value',
+               'new_value', 'text', 'created_on', 'updated_on')
+
+
+class ExportStats:
+
+    def __init__(self):
+        self.cases = 0
+        self.rows = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def parse_date(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def _case_query(template_id=None, status=None, since=None, until=None):
+    query = select(*[getattr(Case, name) for name in CASE_COLUMNS])
+    if template_id:
+        query = query.where(Case.workflow_id == template_id)
+    if status:
+        query = query.where(Case.status == status)
+    if since:
+        query = query.where(Case.created_on >= since)
+    if until:
+        query = query.where(Case.created_on < until)
+    return query.order_by(Case.id)
+
+
+def _children(case_ids):
+    # Answers, comments and events of one chunk of cases: three queries
+    children = {id: {'answers': [], 'comments': [], 'events': []}
+                for id in case_ids}
+
+    for row in db.session.execute(
+            select(Answer.id, Answer.case_id, Answer.case_number,
+                   Answer.question_id, Answer.user_id, Answer.answer_text,
+                   Answer.created_on).where(Answer.case_id.in_(case_ids))):
+        children[row.case_id]['answers'].append({
+            'id': row.id,
+            'question_id': row.question_id,
+            'user_id': row.user_id,
+            'answer_text': row.answer_text,
+            'created_on': _isoformat(row.created_on),
+        })
+
+    for row in db.session.execute(
+            select(Comment.comment_id, Comment.case_id, Comment.user_id,
+                   Comment.question_id, Comment.replying_to_id,
+                   Comment.content, Comment.created_on).where(
+                       Comment.case_id.in_(case_ids))):
+        children[row.case_id]['comments'].append({
+            'id': row.comment_id,
+            'question_id': row.question_id,
+            'user_id': row.user_id,
+            'replying_to_id': row.replying_to_id,
+            'content': row.content,
+            'created_on': _isoformat(row.created_on),
+        })
+
+    for row in db.session.execute(
+            select(Event.id, Event.case_id, Event.event_type, Event.old_value,
+                   Event.new_value, Event.created_on).where(
+                       Event.case_id.in_(case_ids))):
+        children[row.case_id]['events'].append({
+            'id': row.id,
+            'event_type': row.event_type,
+            'old_value': row.old_value,
+            'new_value': row.new_value,
+            'created_on': _isoformat(row.created_on),
+        })
+
+    return children
+
+
+def iter_case_records(stats=None, **filters):
+    """
+    Yield one dict per case (with its answers, comments and events),
+    reading `cases` in chunks of EXPORT_CHUNK_SIZE so memory use does not
+    grow with the number of exported rows.
+
+    Filters: template_id, status, since, until (created_on range).
+    """
+    result = db.session.execute(
+        _case_query(**filters).execution_options(
+            yield_per=EXPORT_CHUNK_SIZE))
+
+    for chunk in result.partitions():
+        children = _children([row.id for row in chunk])
+        for row in chunk:
+            record = {
+                name: _isoformat(row[index]) if name in (
+                    'created_on', 'updated_on') else row[index]
+                for index, name in enumerate(CASE_COLUMNS)
+            }
+            record.update(children[row.id])
+            if stats is not None:
+                stats.cases += 1
+                stats.rows += 1 + sum(
+                    len(items) for items in children[row.id].values())
+            yield record
+
+    if stats is not None:
+        stats.seconds = time.perf_counter() - stats.started
+
+
+def iter_orphaned_answers(stats=None,
+                          template_id=None,
+                          status=None,
+                          since=None,
+                          until=None):
+    """
+    Yield answers that belong to no case (case_id is NULL), which the case
+    records cannot carry, as 'orphaned_answer' records after the cases.
+
+    The template and date filters apply to the answer's workflow_id and
+    created_on; a status filter matches no orphaned answer.
+    """
+    if status:
+        return
+    query = select(Answer.id, Answer.case_number, Answer.workflow_id,
+                   Answer.question_id, Answer.user_id, Answer.answer_text,
+                   Answer.created_on).where(Answer.case_id.is_(None))
+    if template_id:
+        query = query.where(Answer.workflow_id == template_id)
+    if since:
+        query = query.where(Answer.created_on >= since)
+    if until:
+        query = query.where(Answer.created_on < until)
+
+    for row in db.session.execute(
+            query.order_by(Answer.id).execution_options(
+                yield_per=EXPORT_CHUNK_SIZE)):
+        if stats is not None:
+            stats.rows += 1
+        yield {
+            'record_type': 'orphaned_answer',
+            'id': row.id,
+            'case_number': row.case_number,
+            'workflow_id': row.workflow_id,
+            'question_id': row.question_id,
+            'user_id': row.user_id,
+            'answer_text': row.answer_text,
+            'created_on': _isoformat(row.created_on),
+        }
+
+    if stats is not None:
+        stats.seconds = time.perf_counter() - stats.started
+
+
+def _orphaned_answer_csv_row(answer):
+    return {
+        'record_type': answer['record_type'],
+        'case_number': answer['case_number'],
+        'workflow_id': answer['workflow_id'],
+        'item_id': answer['id'],
+        'question_id': answer['question_id'],
+        'user_id': answer['user_id'],
+        'text': answer['answer_text'],
+        'created_on': answer['created_on'],
+    }
+
+
+def _csv_rows(record):
+    case = {
+        'case_id': record['id'],
+        'case_number': record['case_number'],
+        'workflow_id': record['workflow_id'],
+        'status': record['status'],
+        'current_stage_id': record['current_stage_id'],
+        'author_username': record['author_username'],
+    }
+    yield dict(case,
+               record_type='case',
+               created_on=record['created_on'],
+               updated_on=record['updated_on'])
+    for answer in record['answers']:
+        yield dict(case,
+                   record_type='answer',
+                   item_id=answer['id'],
+                   question_id=answer['question_id'],
+                   user_id=answer['user_id'],
+                   text=answer['answer_text'],
+                   created_on=answer['created_on'])
+    for comment in record['comments']:
+        yield dict(case,
+                   record_type='comment',
+                   item_id=comment['id'],
+                   question_id=comment['question_id'],
+                   user_id=comment['user_id'],
+                   text=comment['content'],
+                   created_on=comment['created_on'])
+    for case_event in record['events']:
+        yield dict(case,
+                   record_type='event',
+                   item_id=case_event['id'],
+                   event_type=case_event['event_type'],
+                   old_value=case_event['old_value'],
+                   new_value=case_event['new_value'],
+                   created_on=case_event['created_on'])
+
+
+def export_cases(export_format='ndjson', stats=None, **filters):
+    """
+    Yield the export as text chunks in the given format ('ndjson' or 'csv').
+    Cases come first, then the answers that have no case.
+    """
+    records = iter_case_records(stats=stats, **filters)
+    orphans = iter_orphaned_answers(stats=stats, **filters)
+
+    if export_format == 'ndjson':
+        for record in chain(records, orphans):
+            yield json.dumps(record) + '\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    for record in records:
+        writer.writerows(_csv_rows(record))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    for count, answer in enumerate(orphans, 1):
+        writer.writerow(_orphaned_answer_csv_row(answer))
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,105 @@
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+
+from models import Case
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# request.args name -> Case column used for server-side filtering
+CASE_FILTERS = {
+    'status': Case.status,
+    'stage_id': Case.current_stage_id,
+    'assignee_id': Case.assigned_user_id,
+    'template_id': Case.workflow_id,
+}
+
+
+def encode_cursor(case):
+    # Legacy rows have no updated_on; an empty timestamp stands for NULL
+    updated_on = case.updated_on.isoformat() if case.updated_on else ''
+    return f'{updated_on},{case.id}'
+
+
+def decode_cursor(cursor):
+    """
+    Turn a cursor from encode_cursor() back into (updated_on, id);
+    updated_on is None for a row without one. Returns None for a missing
+    or malformed cursor (i.e. the first page).
+    """
+    if not cursor:
+        return None
+    updated_on, _, case_id = cursor.partition(',')
+    if not case_id:
+        return None
+    if not updated_on:
+        return None, case_id
+    try:
+        return datetime.fromisoformat(updated_on), case_id
+    except ValueError:
+        return None
+
+
+class CasePage:
+
+    def __init__(self, cases, next_cursor):
+        self.cases = cases
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def list_cases(filters=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Return one page of cases, newest first, using keyset pagination over
+    (updated_on, id) so the cost of a page does not depend on how deep it
+    is or on how many cases exist. Cases without updated_on come last
+    (SQLite sorts NULL lowest).
+
+    workflow_template, user and approval_stage are loaded in the same
+    query so the listing template does not trigger lazy loads per row.
+
+    Args:
+    - filters (dict): Optional values for the keys of CASE_FILTERS.
+    - cursor (str): next_cursor of the previous page, or None.
+    - limit (int): Page size, capped at MAX_PAGE_SIZE.
+
+    Returns:
+    - CasePage
+    """
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+
+    query = Case.query.options(joinedload(Case.workflow_template),
+                               joinedload(Case.user),
+                               joinedload(Case.approval_stage))
+
+    for name, value in (filters or {}).items():
+        if value and name in CASE_FILTERS:
+            query = query.filter(CASE_FILTERS[name] == value)
+
+    position = decode_cursor(cursor)
+    if position:
+        updated_on, case_id = position
+        if updated_on is None:
+            query = query.filter(Case.updated_on.is_(None),
+                                 Case.id < case_id)
+        else:
+            query = query.filter(
+                or_(Case.updated_on < updated_on,
+                    and_(Case.updated_on == updated_on, Case.id < case_id),
+                    Case.updated_on.is_(None)))
+
+    # Fetch one extra row to know whether there is a next page
+    cases = query.order_by(Case.updated_on.desc(),
+                           Case.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(cases) > limit:
+        cases = cases[:limit]
+        next_cursor = encode_cursor(cases[-1])
+
+    return CasePage(cases, next_cursor)
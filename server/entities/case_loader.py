@@ -0,0 +1,99 @@
+from flask import abort
+from sqlalchemy.orm import joinedload
+
+from models import Case, Role, db
+from answers import load_case_answers
+from stage_graph import stage_graph
+from template_resolver import resolve_template
+
+
+class CaseDocument:
+    """
+    Everything needed to show or edit one case.
+
+    Attributes:
+    - case (Case): The case, with workflow_template loaded.
+    - template (WorkflowTemplate): The case's workflow template, or None.
+    - questions (list): Template questions in template order, each with
+      question_type loaded.
+    - answers (dict): question_id -> Answer for this case.
+    - current_stage (StageNode): Current approval stage, or None.
+    - current_role (Role): Role matching case.current_role_id, or None.
+    """
+
+    def __init__(self, case, template, questions, answers, current_stage,
+                 current_role):
+        self.case = case
+        self.template = template
+        self.questions = questions
+        self.answers = answers
+        self.current_stage = current_stage
+        self.current_role = current_role
+
+    @property
+    def current_role_name(self):
+        return self.current_role.role_name if self.current_role else "Unknown Role"
+
+    @property
+    def current_stage_name(self):
+        return self.current_stage.stage_name if self.current_stage else 'Unknown Stage'
+
+    @property
+    def questions_with_answers(self):
+        return [(question, self.answers.get(question.question_id))
+                for question in self.questions]
+
+    def to_dict(self):
+        case = self.case
+        return {
+            'id': case.id,
+            'case_number': case.case_number,
+            'workflow_id': case.workflow_id,
+            'workflow_title': self.template.title if self.template else None,
+            'status': case.status,
+            'author_username': case.author_username,
+            'assigned_user_id': case.assigned_user_id,
+            'current_role_id': case.current_role_id,
+            'current_role_name': self.current_role_name,
+            'current_stage_id': case.current_stage_id,
+            'current_stage_name': self.current_stage_name,
+            'created_on': case.created_on.isoformat() if case.created_on else None,
+            'updated_on': case.updated_on.isoformat() if case.updated_on else None,
+            'questions': [{
+                'question_id': question.question_id,
+                'question_text': question.question_text,
+                'question_type': question.question_type.type,
+                'answer': answer.answer_text if answer else None,
+            } for question, answer in self.questions_with_answers],
+        }
+
+
+def load_case_document(case_id):
+    """
+    Load a case document with a fixed number of queries, however many
+    questions the template has: case + template + role, questions +
+    question types, answers. The current stage comes from the stage graph.
+
+    Aborts with 404 if the case does not exist.
+    """
+    row = db.session.query(Case, Role).outerjoin(
+        Role, Role.role_id == Case.current_role_id).options(
+            joinedload(Case.workflow_template)).filter(
+                Case.id == case_id).first()
+    if row is None:
+        abort(404)
+    case, current_role = row
+
+    template = case.workflow_template
+    questions = []
+    answers = {}
+    if template:
+        questions = resolve_template(template, roles=False).questions_list
+        answers = load_case_answers(template.id, case.id)
+
+    return CaseDocument(case=case,
+                        template=template,
+                        questions=questions,
+                        answers=answers,
+                        current_stage=stage_graph.get(case.current_stage_id),
+                        current_role=current_role)
@@ -0,0 +1,143 @@
+from sqlalchemy import event, text
+
+from models import Case, db
+
+# Full-text indexes over answers.answer_text and comments.content.
+# Both are FTS5 "external content" tables: they store only the index and
+# read the text back from the source table by rowid. Triggers keep them in
+# step with every INSERT, UPDATE and DELETE, including bulk writes.
+#
+# The source tables use SQLite's implicit rowid, which VACUUM may
+# renumber; run `flask rebuild-search-index` after a VACUUM.
+SEARCH_SOURCES = {
+    'answer': ('answers', 'answer_text'),
+    'comment': ('comments', 'content'),
+}
+
+SNIPPET_TOKENS = 12
+MAX_SEARCH_RESULTS = 100
+
+
+def _schema_statements(table, column):
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column}, content='{table}', tokenize='unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.rowid, new.{column}); "
+        f"END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) "
+        f"VALUES ('delete', old.rowid, old.{column}); "
+        f"END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} "
+        f"ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) "
+        f"VALUES ('delete', old.rowid, old.{column}); "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.rowid, new.{column}); "
+        f"END",
+    ]
+
+
+def install_search_index(connection):
+    """
+    Create the FTS5 tables and their triggers if they do not exist.
+    """
+    for table, column in SEARCH_SOURCES.values():
+        for statement in _schema_statements(table, column):
+            connection.execute(text(statement))
+
+
+def rebuild_search_index():
+    """
+    Create the search index if needed and re-index all existing rows.
+    Returns the number of indexed rows per source table.
+    """
+    counts = {}
+    with db.engine.begin() as connection:
+        install_search_index(connection)
+        for table, _ in SEARCH_SOURCES.values():
+            fts = f'{table}_fts'
+            connection.execute(
+                text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+            counts[table] = connection.execute(
+                text(f"SELECT count(*) FROM {table}")).scalar()
+    return counts
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index(target, connection, **kw):
+    # db.create_all() creates the index together with the tables
+    if connection.dialect.name == 'sqlite':
+        install_search_index(connection)
+
+
+def fts_query(terms):
+    """
+    Turn user input into an FTS5 query that matches all of its words.
+    Every word is quoted so FTS5 operators in the input are taken literally.
+    """
+    words = [word.replace('"', '""') for word in terms.split()]
+    return ' '.join(f'"{word}"' for word in words if word)
+
+
+def search_cases(terms, limit=20):
+    """
+    Ranked search of answers and comments.
+
+    Args:
+    - terms (str): Words to search for (all must match one answer/comment).
+    - limit (int): Maximum number of cases returned, clamped to
+      1..MAX_SEARCH_RESULTS.
+
+    Returns:
+    - list: One dict per case, best match first:
+      {'case_id', 'case_number', 'status', 'score', 'snippets': [...]}
+    """
+    query = fts_query(terms)
+    if not query:
+        return []
+    # LIMIT -1 would mean "no limit" to SQLite
+    limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+
+    matches = []
+    for source, (table, column) in SEARCH_SOURCES.items():
+        fts = f'{table}_fts'
+        case_column = 'src.case_id'
+        if table == 'answers':
+            case_column = 'coalesce(src.case_id, src.case_number)'
+        rows = db.session.execute(
+            text(f"SELECT {case_column} AS case_id, bm25({fts}) AS score, "
+                 f"snippet({fts}, 0, '[', ']', '...', {SNIPPET_TOKENS}) "
+                 f"AS snippet "
+                 f"FROM {fts} JOIN {table} AS src ON src.rowid = {fts}.rowid "
+                 f"WHERE {fts} MATCH :query ORDER BY score LIMIT :limit"), {
+                     'query': query,
+                     'limit': limit * 5
+                 })
+        matches.extend((row.case_id, row.score, source, row.snippet)
+                       for row in rows)
+
+    # bm25() is lower for better matches; keep each case's best score
+    results = {}
+    for case_id, score, source, snippet in sorted(matches,
+                                                  key=lambda m: m[1]):
+        result = results.setdefault(case_id, {
+            'case_id': case_id,
+            'score': -score,
+            'snippets': [],
+        })
+        if len(result['snippets']) < 3:
+            result['snippets'].append({'source': source, 'text': snippet})
+
+    ranked = list(results.values())[:limit]
+    cases = {
+        case.id: case
+        for case in Case.query.filter(
+            Case.id.in_([result['case_id'] for result in ranked])).all()
+    }
+    for result in ranked:
+        case = cases.get(result['case_id'])
+        result['case_number'] = case.case_number if case else None
+        result['status'] = case.status if case else None
+    return ranked
@@ -0,0 +1,103 @@
+from sqlalchemy import literal, select
+
+from models import Comment, db
+
+DEFAULT_THREADS_PER_PAGE = 20
+
+# Hard stop for the recursion in case replying_to_id ever forms a cycle
+MAX_THREAD_DEPTH = 50
+
+
+class CommentNode:
+
+    def __init__(self, comment, depth):
+        self.comment = comment
+        self.depth = depth
+        self.replies = []
+
+
+class CommentThreadPage:
+
+    def __init__(self, threads, page, per_page, has_next):
+        self.threads = threads
+        self.page = page
+        self.per_page = per_page
+        self.has_next = has_next
+
+    @property
+    def next_page(self):
+        return self.page + 1 if self.has_next else None
+
+    @property
+    def previous_page(self):
+        return self.page - 1 if self.page > 1 else None
+
+    def flat(self):
+        """
+        Comments of this page in display order (each followed by its
+        replies), for templates that render a flat list.
+        """
+        comments = []
+        stack = list(reversed(self.threads))
+        while stack:
+            node = stack.pop()
+            comments.append(node.comment)
+            stack.extend(reversed(node.replies))
+        return comments
+
+
+def load_comment_threads(case_id,
+                         page=1,
+                         per_page=DEFAULT_THREADS_PER_PAGE,
+                         max_depth=None):
+    """
+    Load one page of a case's comment threads with a single recursive CTE.
+
+    Top-level comments (no replying_to_id) are paged oldest first; every
+    reply below them is fetched in the same statement and nested in memory.
+
+    Args:
+    - case_id (str): Case whose comments are loaded.
+    - page (int): 1-based page of top-level threads.
+    - per_page (int): Top-level threads per page.
+    - max_depth (int): Deepest reply level to load (0 = top-level only).
+
+    Returns:
+    - CommentThreadPage
+    """
+    page = max(page or 1, 1)
+    depth_limit = MAX_THREAD_DEPTH if max_depth is None else min(
+        max_depth, MAX_THREAD_DEPTH)
+
+    # One extra root tells us whether there is a next page
+    roots = select(Comment.comment_id).where(
+        Comment.case_id == case_id,
+        Comment.replying_to_id.is_(None)).order_by(
+            Comment.created_on,
+            Comment.comment_id).limit(per_page + 1).offset(
+                (page - 1) * per_page).subquery()
+
+    thread = select(roots.c.comment_id,
+                    literal(0).label('depth')).cte('thread', recursive=True)
+    thread = thread.union_all(
+        select(Comment.comment_id, (thread.c.depth + 1).label('depth')).where(
+            Comment.replying_to_id == thread.c.comment_id,
+            Comment.case_id == case_id, thread.c.depth < depth_limit))
+
+    rows = db.session.query(Comment, thread.c.depth).join(
+        thread, thread.c.comment_id == Comment.comment_id).order_by(
+            thread.c.depth, Comment.created_on, Comment.comment_id).all()
+
+    # Rows come parents-first, so every parent exists before its replies
+    nodes = {}
+    threads = []
+    for comment, depth in rows:
+        node = CommentNode(comment, depth)
+        nodes[comment.comment_id] = node
+        if depth == 0:
+            threads.append(node)
+        else:
+            nodes[comment.replying_to_id].replies.append(node)
+
+    has_next = len(threads) > per_page
+    return CommentThreadPage(threads[:per_page], page, per_page, has_next)
@@ -0,0 +1,161 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+BACKUP_SUFFIX = '.db.gz'
+
+
+class BackupRestartLimit(sqlite3.DatabaseError):
+    """
+    Raised when writers to the source keep restarting the online backup.
+    """
+
+
+class BackupResult:
+
+    def __init__(self, path, database_bytes, compressed_bytes, seconds,
+                 removed):
+        self.path = path
+        self.database_bytes = database_bytes
+        self.compressed_bytes = compressed_bytes
+        self.seconds = seconds
+        self.removed = removed
+
+    @property
+    def megabytes_per_second(self):
+        if not self.seconds:
+            return 0.0
+        return self.database_bytes / self.seconds / (1024 * 1024)
+
+
+def backup_database(database_path,
+                    backup_dir='backups',
+                    pages=256,
+                    sleep=0.005,
+                    keep=7,
+                    progress=None,
+                    max_restarts=10,
+                    name=None):
+    """
+    Take a consistent, compressed snapshot of a live SQLite database.
+
+    Uses SQLite's online backup API: `pages` pages are copied per step and
+    the source is unlocked for `sleep` seconds between steps, so the app
+    keeps serving while the copy runs. If another connection writes to the
+    source mid-copy, SQLite restarts the copy, so the snapshot always
+    matches one committed state; after `max_restarts` restarts the backup
+    gives up with BackupRestartLimit rather than retrying forever. The
+    copy is integrity-checked, gzipped into backup_dir and only the newest
+    `keep` backups are retained.
+
+    Args:
+    - database_path (str): Path of the live database file.
+    - backup_dir (str): Directory that receives <name>_<timestamp>.db.gz.
+    - pages (int): Pages copied per step.
+    - sleep (float): Seconds between steps.
+    - keep (int): Number of backups to retain (0 keeps all).
+    - progress (callable): Optional progress(remaining, total) callback.
+    - max_restarts (int): Restarts caused by concurrent writes before the
+      backup is abandoned.
+    - name (str): File name prefix and retention group (default: the
+      database file name).
+
+    Returns:
+    - BackupResult
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    name = name or os.path.splitext(os.path.basename(database_path))[0]
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%fZ')
+    target = os.path.join(backup_dir, f'{name}_{stamp}{BACKUP_SUFFIX}')
+
+    started = time.perf_counter()
+    fd, snapshot = tempfile.mkstemp(suffix='.db', dir=backup_dir)
+    os.close(fd)
+    try:
+        source = sqlite3.connect(database_path)
+        destination = sqlite3.connect(snapshot)
+        try:
+            restarts = 0
+            last_remaining = None
+
+            def report(status, remaining, total):
+                nonlocal restarts, last_remaining
+                # More pages left than after the previous step: a write to
+                # the source made SQLite start the copy over
+                if last_remaining is not None and remaining > last_remaining:
+                    restarts += 1
+                    if restarts > max_restarts:
+                        # Raising from the callback aborts the backup
+                        raise BackupRestartLimit(
+                            f'Backup restarted {restarts} times by '
+                            f'concurrent writes; giving up')
+                last_remaining = remaining
+                if progress:
+                    progress(remaining, total)
+
+            with destination:
+                source.backup(destination,
+                              pages=pages,
+                              progress=report,
+                              sleep=sleep)
+            check = destination.execute('PRAGMA quick_check').fetchone()[0]
+            if check != 'ok':
+                raise sqlite3.DatabaseError(
+                    f'Backup failed integrity check: {check}')
+        finally:
+            destination.close()
+            source.close()
+
+        database_bytes = os.path.getsize(snapshot)
+        with open(snapshot, 'rb') as raw, gzip.open(target + '.part',
+                                                    'wb') as packed:
+            shutil.copyfileobj(raw, packed, 1024 * 1024)
+        os.replace(target + '.part', target)
+    finally:
+        for leftover in (snapshot, target + '.part'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    seconds = time.perf_counter() - started
+    removed = enforce_retention(backup_dir, name, keep)
+    return BackupResult(target, database_bytes, os.path.getsize(target),
+                        seconds, removed)
+
+
+def list_backups(backup_dir, name):
+    """
+    Backups of database `name` in backup_dir, oldest first.
+    """
+    prefix = f'{name}_'
+    if not os.path.isdir(backup_dir):
+        return []
+    return sorted(
+        os.path.join(backup_dir, file_name)
+        for file_name in os.listdir(backup_dir)
+        if file_name.startswith(prefix) and file_name.endswith(BACKUP_SUFFIX))
+
+
+def enforce_retention(backup_dir, name, keep):
+    """
+    Delete all but the newest `keep` backups. Returns the deleted paths.
+    """
+    if not keep:
+        return []
+    backups = list_backups(backup_dir, name)
+    removed = backups[:-keep]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def restore_backup(backup_path, database_path):
+    """
+    Unpack a gzipped backup to database_path (the app must be stopped).
+    """
+    with gzip.open(backup_path, 'rb') as packed, open(database_path,
+                                                      'wb') as raw:
+        shutil.copyfileobj(packed, raw, 1024 * 1024)
@@ -0,0 +1,104 @@
+from sqlalchemy import event
+
+from models import db
+
+# Named database profiles. Select one with the DATABASE_PROFILE config key
+# (or environment variable); 'default' keeps SQLite's stock settings.
+#
+# pragmas are run on every new DBAPI connection, in order. engine_options
+# are passed to create_engine() through SQLALCHEMY_ENGINE_OPTIONS.
+DATABASE_PROFILES = {
+    'default': {
+        'pragmas': {},
+        'engine_options': {},
+    },
+    'production': {
+        'pragmas': {
+            # Readers no longer block the writer (and vice versa)
+            'journal_mode': 'WAL',
+            # Safe with WAL: a power loss can drop the last commits but
+            # never corrupts the database
+            'synchronous': 'NORMAL',
+            # Negative = KiB: 64 MB page cache per connection
+            'cache_size': -64000,
+            'mmap_size': 256 * 1024 * 1024,
+            'temp_store': 'MEMORY',
+            # Wait for a competing writer instead of failing with
+            # "database is locked"
+            'busy_timeout': 5000,
+            # foreign_keys stays off: the delete routes of teams, roles,
+            # users and templates do not remove dependent rows first
+        },
+        'engine_options': {
+            'pool_size': 10,
+            'max_overflow': 10,
+            'pool_timeout': 30,
+            # Recycle so that long-lived connections pick up schema changes
+            'pool_recycle': 3600,
+            'connect_args': {
+                'timeout': 5,
+                'check_same_thread': False,
+            },
+        },
+    },
+}
+
+
+def get_profile(name):
+    if name not in DATABASE_PROFILES:
+        raise ValueError(f'Unknown DATABASE_PROFILE {name!r}; expected one '
+                         f'of {", ".join(DATABASE_PROFILES)}')
+    return DATABASE_PROFILES[name]
+
+
+def apply_database_profile(app):
+    """
+    Merge the selected profile's engine options into the app config.
+    Must run before db.init_app(app); options already set in
+    SQLALCHEMY_ENGINE_OPTIONS win over the profile.
+    """
+    profile = get_profile(app.config.get('DATABASE_PROFILE', 'default'))
+    options = dict(profile['engine_options'])
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    app.config.setdefault('SQLITE_PRAGMAS', profile['pragmas'])
+
+
+def _pragma_hook(pragmas):
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+        finally:
+            cursor.close()
+
+    return set_pragmas
+
+
+def install_sqlite_pragmas(app):
+    """
+    Register a connect hook that applies SQLITE_PRAGMAS to every new
+    connection of the app's SQLite engines. Run right after db.init_app(app),
+    before any connection is opened.
+    """
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _pragma_hook(pragmas))
+
+
+def sqlite_settings(connection, names=('journal_mode', 'synchronous',
+                                       'cache_size', 'mmap_size',
+                                       'busy_timeout', 'foreign_keys')):
+    """
+    Current values of the given pragmas on a connection (for checks).
+    """
+    return {
+        name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+        for name in names
+    }
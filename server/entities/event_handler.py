@@ -0,0 +1,212 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import Event, db
+
+logger = logging.getLogger(__name__)
+# Events that could not be written, one JSON row per record, so they can be
+# replayed by hand
+dead_letter_logger = logging.getLogger(__name__ + '.dead_letter')
+
+# Multi-row INSERT size; 6 columns per row keeps a full batch well below
+# SQLite's limit on bound parameters per statement
+MAX_BATCH_SIZE = 150
+
+
+class EventPipeline:
+    """
+    Writes Event rows in batches on a background thread.
+
+    Rows are queued in memory and flushed with a single multi-row INSERT
+    once `batch_size` rows are waiting or `flush_interval` seconds have
+    passed, whichever comes first. The queue is flushed on shutdown.
+
+    A batch whose INSERT fails is retried one row at a time, so one bad
+    row does not take the rest of the batch with it; rows that still fail
+    go to the dead-letter log.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=1.0, max_queue=10000):
+        self.app = None
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._flush_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.flushed_events = 0
+        self.flush_count = 0
+        self.failed_events = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = min(
+            app.config.get('EVENT_BATCH_SIZE', self.batch_size),
+            MAX_BATCH_SIZE)
+        self.flush_interval = app.config.get('EVENT_FLUSH_INTERVAL',
+                                             self.flush_interval)
+        atexit.register(self.stop)
+
+    def enqueue(self, rows):
+        self._ensure_started()
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                # Writer is falling behind: flush on the caller's thread
+                self.flush()
+                self._queue.put(row)
+
+    def flush(self):
+        """
+        Write everything that is queued right now. Returns rows written.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take(self.batch_size)
+                if not batch:
+                    return written
+                self._write(batch)
+                written += len(batch)
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def metrics(self):
+        return {
+            'queue_depth': self._queue.qsize(),
+            'flushed_events': self.flushed_events,
+            'failed_events': self.failed_events,
+            'flush_count': self.flush_count,
+            'last_flush_seconds': self.last_flush_seconds,
+            'max_flush_seconds': self.max_flush_seconds,
+            'avg_flush_seconds': (self.total_flush_seconds /
+                                  self.flush_count if self.flush_count else
+                                  0.0),
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='event-pipeline',
+                                                daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            deadline = time.monotonic() + self.flush_interval
+            # Wake up early once a full batch is waiting
+            while (self._queue.qsize() < self.batch_size
+                   and time.monotonic() < deadline
+                   and not self._stopping.is_set()):
+                time.sleep(min(0.05, self.flush_interval))
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error('Event pipeline flush failed: %s', e)
+
+    def _take(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(Event.__table__.insert().values(batch))
+            written = len(batch)
+        except Exception as e:
+            logger.error('Failed to write %d case events, retrying one by '
+                         'one: %s', len(batch), e)
+            written = self._write_rows(batch)
+
+        elapsed = time.perf_counter() - started
+        self.flushed_events += written
+        self.flush_count += 1
+        self.last_flush_seconds = elapsed
+        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        self.total_flush_seconds += elapsed
+
+    def _write_rows(self, batch):
+        written = 0
+        with self.app.app_context():
+            for row in batch:
+                try:
+                    with db.engine.begin() as connection:
+                        connection.execute(Event.__table__.insert(), row)
+                    written += 1
+                except Exception as e:
+                    self.failed_events += 1
+                    dead_letter_logger.error('%s',
+                                             json.dumps(row, default=str),
+                                             extra={'error': str(e)})
+        return written
+
+
+event_pipeline = EventPipeline()
+
+
+def handle_case_event(case_id, event_type, old_value=None, new_value=None):
+    """
+    Record a status or stage change of a case.
+
+    With EVENT_PIPELINE_MODE = 'sync' the Event is added to the current
+    session and committed with the request (useful in tests). Otherwise it
+    is held on the session until the request commits and then handed to
+    the background event pipeline, so a rolled back request logs nothing
+    and the request never waits for the write.
+    """
+    row = {
+        'id': str(uuid.uuid4())[:8],
+        'case_id': case_id,
+        'event_type': event_type,
+        'old_value': old_value,
+        'new_value': new_value,
+        'created_on': datetime.utcnow(),
+    }
+
+    if current_app.config.get('EVENT_PIPELINE_MODE', 'async') == 'sync':
+        db.session.add(Event(**row))
+        return
+
+    db.session.info.setdefault('pending_case_events', []).append(row)
+
+
+@event.listens_for(Session, 'after_commit')
+def _enqueue_committed_events(session):
+    rows = session.info.pop('pending_case_events', None)
+    if rows:
+        event_pipeline.enqueue(rows)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_rolled_back_events(session):
+    session.info.pop('pending_case_events', None)
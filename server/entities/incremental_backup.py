@@ -0,0 +1,355 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, create_engine, event, func, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import RowChange, db
+from db_backup import backup_database, restore_backup
+
+# Table -> column used as its high-water mark. Rows whose column is past the
+# mark are written to the next delta.
+WATERMARK_COLUMNS = {
+    'team': 'updated_on',
+    'role': 'updated_on',
+    'user': 'updated_on',
+    'question_types': 'updated_on',
+    'questions': 'updated_on',
+    'workflow_templates': 'updated_on',
+    'option_lists': 'updated_on',
+    'cases': 'updated_on',
+    'approval_stages': 'modified_on',
+    'screenbuilders': 'modified_on',
+    # Append-only mark: no update timestamp on these tables
+    'answers': 'created_on',
+    'comments': 'created_on',
+    'events': 'created_on',
+    'internal_messages': 'created_on',
+}
+
+# Tables with a created_on mark whose rows can still change in place; a
+# trigger logs their updates to row_changes so the next delta re-exports them
+LOGGED_UPDATE_TABLES = ('answers', 'comments', 'internal_messages')
+
+# Small tables without any timestamp, copied whole into every delta
+FULL_COPY_TABLES = ('user_roles', 'case_status_counts')
+
+# Rows committed by transactions still open when a delta starts may carry a
+# timestamp just before the new mark; re-reading this window catches them
+# (replaying a row twice is harmless)
+SAFETY_MARGIN = timedelta(minutes=1)
+
+DELTA_SUFFIX = '.delta.ndjson.gz'
+
+# Base snapshots are named <name>-incremental-base_<stamp>.db.gz, outside
+# the <name>_* group that `flask backup-db --keep N` prunes
+BASE_NAME = '{name}-incremental-base'
+RESTORE_BATCH_SIZE = 500
+
+
+def _key_column(table_name):
+    return list(db.metadata.tables[table_name].primary_key.columns)[0]
+
+
+def _trigger_statements():
+    for table_name in WATERMARK_COLUMNS:
+        key = _key_column(table_name).name
+        yield (f'CREATE TRIGGER IF NOT EXISTS {table_name}_row_changes_ad '
+               f'AFTER DELETE ON "{table_name}" BEGIN '
+               f"INSERT INTO row_changes (table_name, row_id, op) "
+               f"VALUES ('{table_name}', old.{key}, 'delete'); END")
+        if table_name in LOGGED_UPDATE_TABLES:
+            yield (f'CREATE TRIGGER IF NOT EXISTS {table_name}_row_changes_au '
+                   f'AFTER UPDATE ON "{table_name}" BEGIN '
+                   f"INSERT INTO row_changes (table_name, row_id, op) "
+                   f"VALUES ('{table_name}', new.{key}, 'update'); END")
+
+
+def install_change_log(connection):
+    """
+    Create the row_changes triggers (tombstones and logged updates).
+    """
+    RowChange.__table__.create(connection, checkfirst=True)
+    for statement in _trigger_statements():
+        connection.execute(text(statement))
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_change_log(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        install_change_log(connection)
+
+
+# ===================================================
+# State: <backup_dir>/<name>_incremental.json links a base snapshot to its
+# deltas and holds the current watermarks.
+
+
+def _state_path(backup_dir, name):
+    return os.path.join(backup_dir, f'{name}_incremental.json')
+
+
+def load_state(backup_dir, name):
+    path = _state_path(backup_dir, name)
+    if not os.path.exists(path):
+        return None
+    with open(path) as state_file:
+        return json.load(state_file)
+
+
+def _save_state(backup_dir, name, state):
+    path = _state_path(backup_dir, name)
+    with open(path + '.part', 'w') as state_file:
+        json.dump(state, state_file, indent=2)
+    os.replace(path + '.part', path)
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _row_dict(row):
+    return {key: _encode(value) for key, value in row._mapping.items()}
+
+
+def _max_change_id(connection):
+    return connection.execute(select(func.max(RowChange.id))).scalar() or 0
+
+
+def _prune_change_log(change_id):
+    # Changes up to change_id are in the base or a written delta already.
+    # The watermark row itself is kept: in a row_changes table created
+    # without AUTOINCREMENT, an empty table would reuse ids from 1 and the
+    # next delta would skip those changes as already backed up
+    with db.engine.begin() as connection:
+        connection.execute(
+            RowChange.__table__.delete().where(RowChange.id < change_id))
+
+
+def take_base_backup(database_path, backup_dir='backups'):
+    """
+    Start a new chain: full online snapshot plus fresh watermarks. The
+    change log rows the snapshot covers are deleted, all but the newest.
+    """
+    name = os.path.splitext(os.path.basename(database_path))[0]
+    with db.engine.begin() as connection:
+        install_change_log(connection)
+        # Marks are taken before the copy starts; anything written during
+        # the copy is replayed by the first delta
+        mark = (datetime.utcnow() - SAFETY_MARGIN).isoformat()
+        change_id = _max_change_id(connection)
+
+    result = backup_database(database_path,
+                             backup_dir=backup_dir,
+                             keep=0,
+                             name=BASE_NAME.format(name=name))
+    _save_state(
+        backup_dir, name, {
+            'base': os.path.basename(result.path),
+            'watermarks': {table: mark
+                           for table in WATERMARK_COLUMNS},
+            'change_id': change_id,
+            'deltas': [],
+        })
+    _prune_change_log(change_id)
+    return result.path
+
+
+def take_delta_backup(database_path, backup_dir='backups'):
+    """
+    Write every row changed since the last run, plus tombstones for deleted
+    rows, to a new gzipped NDJSON delta file and advance the watermarks.
+
+    Returns:
+    - tuple: (delta path, {table: rows written})
+    """
+    name = os.path.splitext(os.path.basename(database_path))[0]
+    state = load_state(backup_dir, name)
+    if state is None:
+        raise RuntimeError(
+            f'No base backup for {name} in {backup_dir}; take one first.')
+
+    sequence = len(state['deltas']) + 1
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%fZ')
+    path = os.path.join(backup_dir, f'{name}_{stamp}{DELTA_SUFFIX}')
+    counts = {}
+
+    with db.engine.connect() as connection, gzip.open(path + '.part',
+                                                      'wt') as delta:
+        install_change_log(connection)
+        connection.commit()
+
+        next_mark = (datetime.utcnow() - SAFETY_MARGIN).isoformat()
+        next_change_id = _max_change_id(connection)
+
+        def write(line):
+            delta.write(json.dumps(line) + '\n')
+            counts[line['table']] = counts.get(line['table'], 0) + 1
+
+        delta.write(
+            json.dumps({
+                'op': 'header',
+                'base': state['base'],
+                'sequence': sequence,
+                'watermarks': state['watermarks'],
+                'change_id': [state['change_id'], next_change_id],
+            }) + '\n')
+
+        # Tombstones first: a row deleted and re-created since the last run
+        # must end up present
+        changes = connection.execute(
+            select(RowChange.table_name, RowChange.row_id,
+                   RowChange.op).where(
+                       RowChange.id > state['change_id'],
+                       RowChange.id <= next_change_id).order_by(RowChange.id))
+        updated = {}
+        for change in changes:
+            if change.op == 'delete':
+                write({
+                    'op': 'delete',
+                    'table': change.table_name,
+                    'key': change.row_id
+                })
+            else:
+                updated.setdefault(change.table_name, set()).add(change.row_id)
+
+        for table_name, column_name in WATERMARK_COLUMNS.items():
+            table = db.metadata.tables[table_name]
+            since = datetime.fromisoformat(state['watermarks'][table_name])
+            rows = connection.execution_options(yield_per=1000).execute(
+                select(table).where(table.c[column_name] >= since))
+            seen = set()
+            key = _key_column(table_name).name
+            for row in rows:
+                seen.add(row._mapping[key])
+                write({'op': 'upsert', 'table': table_name, 'row': _row_dict(row)})
+
+            # Logged in-place updates not already covered by the mark
+            ids = list(updated.get(table_name, set()) - seen)
+            for start in range(0, len(ids), RESTORE_BATCH_SIZE):
+                for row in connection.execute(
+                        select(table).where(table.c[key].in_(
+                            ids[start:start + RESTORE_BATCH_SIZE]))):
+                    write({
+                        'op': 'upsert',
+                        'table': table_name,
+                        'row': _row_dict(row)
+                    })
+
+        for table_name in FULL_COPY_TABLES:
+            table = db.metadata.tables[table_name]
+            rows = [_row_dict(row) for row in connection.execute(select(table))]
+            delta.write(
+                json.dumps({
+                    'op': 'replace_table',
+                    'table': table_name,
+                    'rows': rows
+                }) + '\n')
+            counts[table_name] = len(rows)
+
+    os.replace(path + '.part', path)
+
+    state['watermarks'] = {table: next_mark for table in WATERMARK_COLUMNS}
+    state['change_id'] = next_change_id
+    state['deltas'].append(os.path.basename(path))
+    _save_state(backup_dir, name, state)
+    _prune_change_log(next_change_id)
+    return path, counts
+
+
+# ===================================================
+# Restore
+
+
+def _decode_row(table, row):
+    decoded = {}
+    for column in table.columns:
+        if column.name not in row:
+            continue
+        value = row[column.name]
+        if isinstance(column.type, DateTime) and value is not None:
+            value = datetime.fromisoformat(value)
+        decoded[column.name] = value
+    return decoded
+
+
+def _upsert(connection, table, rows):
+    statement = sqlite_insert(table)
+    keys = [column.name for column in table.primary_key.columns]
+    statement = statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={
+            column.name: statement.excluded[column.name]
+            for column in table.columns if column.name not in keys
+        })
+    connection.execute(statement, rows)
+
+
+def _apply_delta(connection, path):
+    pending_table = None
+    pending = []
+
+    def flush():
+        if pending:
+            _upsert(connection, db.metadata.tables[pending_table], pending)
+            pending.clear()
+
+    with gzip.open(path, 'rt') as delta:
+        for line in delta:
+            change = json.loads(line)
+            if change['op'] == 'header':
+                continue
+            table = db.metadata.tables[change['table']]
+
+            if change['op'] == 'upsert':
+                if change['table'] != pending_table or len(
+                        pending) >= RESTORE_BATCH_SIZE:
+                    flush()
+                    pending_table = change['table']
+                pending.append(_decode_row(table, change['row']))
+                continue
+
+            flush()
+            if change['op'] == 'delete':
+                key = _key_column(change['table'])
+                connection.execute(table.delete().where(key == change['key']))
+            elif change['op'] == 'replace_table':
+                connection.execute(table.delete())
+                if change['rows']:
+                    connection.execute(
+                        table.insert(),
+                        [_decode_row(table, row) for row in change['rows']])
+    flush()
+
+
+def restore_chain(backup_dir, name, target_path, upto=None):
+    """
+    Rebuild a database from a base backup and its deltas, in order.
+
+    Args:
+    - backup_dir (str): Directory holding <name>_incremental.json.
+    - name (str): Database name (e.g. 'site').
+    - target_path (str): Database file to create (overwritten).
+    - upto (int): Apply only the first `upto` deltas (default: all).
+
+    Returns:
+    - list: Delta files applied.
+    """
+    state = load_state(backup_dir, name)
+    if state is None:
+        raise RuntimeError(f'No incremental backups for {name} in {backup_dir}')
+
+    restore_backup(os.path.join(backup_dir, state['base']), target_path)
+
+    deltas = state['deltas'][:upto] if upto is not None else state['deltas']
+    engine = create_engine(f'sqlite:///{target_path}')
+    try:
+        for delta in deltas:
+            # One transaction per delta: a chain is restored delta by delta
+            with engine.begin() as connection:
+                _apply_delta(connection, os.path.join(backup_dir, delta))
+    finally:
+        engine.dispose()
+    return deltas
@@ -0,0 +1,282 @@
+import json
+import os
+import sqlite3
+import time
+
+# Restore of the JSON backups written by backupDatabase.js:
+#
+#   {"database_name": ..., "exported_at": ...,
+#    "tables": {"<name>": {"schema": [...], "row_count": n, "data": [...]}}}
+#
+# The file is parsed incrementally, so memory use is bounded by READ_CHUNK
+# plus one row, not by the size of the backup.
+
+READ_CHUNK = 1024 * 1024
+INSERT_BATCH_SIZE = 5000
+
+_decoder = json.JSONDecoder()
+
+# Characters that may follow a complete JSON value
+_DELIMITERS = frozenset(' \t\r\n,:]}')
+
+
+class _JsonStream:
+    """
+    Minimal pull parser: walks objects and arrays one member at a time and
+    decodes leaf values (rows, schemas) with the stdlib decoder.
+    """
+
+    def __init__(self, stream, chunk_size=READ_CHUNK):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop what has been consumed so the buffer never grows unbounded
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in (
+                    ' \t\r\n'):
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def _take(self, *allowed):
+        char = self.peek()
+        if char not in allowed:
+            raise ValueError(f'Malformed backup: expected one of {allowed}, '
+                             f'found {char!r}')
+        self.pos += 1
+        return char
+
+    def value(self):
+        """
+        Decode the complete JSON value at the cursor.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # A number or literal cut by the read ("1." of "1.5", "12"
+                # of "12e3") decodes "successfully"; only trust a value
+                # followed by a delimiter, or the end of the file
+                if self.eof or (end < len(self.buffer)
+                                and self.buffer[end] in _DELIMITERS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def keys(self):
+        """
+        Yield the keys of the object at the cursor. The caller must consume
+        each key's value (value(), keys() or items()) before the next key.
+        """
+        self._take('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self._take(':')
+            yield key
+            if self._take(',', '}') == '}':
+                return
+
+    def items(self):
+        """
+        Yield the decoded elements of the array at the cursor.
+        """
+        self._take('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self._take(',', ']') == ']':
+                return
+
+
+class RestoreResult:
+
+    def __init__(self, tables, seconds, foreign_key_violations):
+        self.tables = tables
+        self.seconds = seconds
+        self.foreign_key_violations = foreign_key_violations
+
+    @property
+    def rows(self):
+        return sum(self.tables.values())
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _create_table(connection, table, schema):
+    # Same DDL as restoreDatabase.js
+    columns = []
+    for column in schema:
+        definition = f"{_quote(column['name'])} {column['type']}"
+        if column.get('is_primary_key'):
+            definition += ' PRIMARY KEY'
+        if column.get('notnull'):
+            definition += ' NOT NULL'
+        if column.get('default_value') is not None:
+            definition += f" DEFAULT {column['default_value']}"
+        columns.append(definition)
+    connection.execute(f'CREATE TABLE IF NOT EXISTS {_quote(table)} '
+                       f'({", ".join(columns)})')
+
+
+def _drop_indexes(connection, table):
+    """
+    Drop the explicit indexes of a table (restoring into an existing
+    schema) and return their DDL so they can be rebuilt after the load.
+    """
+    indexes = connection.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+        "AND tbl_name = ? AND sql IS NOT NULL", (table, )).fetchall()
+    for name, _ in indexes:
+        connection.execute(f'DROP INDEX {_quote(name)}')
+    return [sql for _, sql in indexes]
+
+
+def _cell(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _load_rows(connection, table, columns, rows, total, batch_size,
+               progress):
+    sql = (f'INSERT INTO {_quote(table)} '
+           f'({", ".join(_quote(column) for column in columns)}) '
+           f'VALUES ({", ".join("?" for _ in columns)})')
+    loaded = 0
+    batch = []
+    for row in rows:
+        batch.append(tuple(_cell(row.get(column)) for column in columns))
+        if len(batch) >= batch_size:
+            connection.executemany(sql, batch)
+            loaded += len(batch)
+            batch = []
+            if progress:
+                progress(table, loaded, total)
+    if batch:
+        connection.executemany(sql, batch)
+        loaded += len(batch)
+    if progress:
+        progress(table, loaded, total)
+    return loaded
+
+
+def _load_tables(connection, reader, tables, deferred_indexes, batch_size,
+                 progress):
+    """
+    Create and fill every table of the backup. Loaded row counts are added
+    to `tables`, the DDL of dropped indexes to `deferred_indexes`.
+    """
+    for key in reader.keys():
+        if key != 'tables':
+            reader.value()
+            continue
+        for table in reader.keys():
+            schema = None
+            row_count = None
+            for field in reader.keys():
+                if field == 'schema':
+                    schema = reader.value()
+                    _create_table(connection, table, schema)
+                    deferred_indexes.extend(_drop_indexes(connection, table))
+                elif field == 'row_count':
+                    row_count = reader.value()
+                elif field == 'data':
+                    if schema is None:
+                        raise ValueError(f'Malformed backup: data of {table} '
+                                         f'precedes its schema')
+                    columns = [column['name'] for column in schema]
+                    connection.execute('BEGIN')
+                    tables[table] = _load_rows(connection, table, columns,
+                                               reader.items(), row_count,
+                                               batch_size, progress)
+                    connection.execute('COMMIT')
+                else:
+                    reader.value()
+
+
+def restore_json_backup(backup_path,
+                        database_path,
+                        batch_size=INSERT_BATCH_SIZE,
+                        replace=True,
+                        progress=None,
+                        read_chunk=READ_CHUNK):
+    """
+    Restore a backupDatabase.js JSON backup into a SQLite database.
+
+    Tables are created from their saved schema and filled with executemany
+    in batches of `batch_size`, one transaction per table. Foreign keys are
+    not enforced and explicit indexes are dropped while loading; indexes
+    are rebuilt and foreign keys checked once every table is loaded.
+
+    Args:
+    - backup_path (str): JSON backup file.
+    - database_path (str): Database file to restore into.
+    - batch_size (int): Rows per executemany call.
+    - replace (bool): Start from an empty file; otherwise rows are added to
+      the existing tables (e.g. a schema made by `db.create_all()`).
+    - progress (callable): Optional progress(table, loaded, row_count).
+    - read_chunk (int): Characters read from the file at a time.
+
+    Returns:
+    - RestoreResult
+    """
+    if replace and os.path.exists(database_path):
+        os.remove(database_path)
+
+    started = time.perf_counter()
+    tables = {}
+    deferred_indexes = []
+    connection = sqlite3.connect(database_path, isolation_level=None)
+    try:
+        connection.execute('PRAGMA foreign_keys = OFF')
+        if replace:
+            # The target is a fresh file: a failed restore is simply rerun
+            connection.execute('PRAGMA journal_mode = OFF')
+            connection.execute('PRAGMA synchronous = OFF')
+
+        try:
+            with open(backup_path, encoding='utf-8') as backup:
+                _load_tables(connection, _JsonStream(backup, read_chunk),
+                             tables, deferred_indexes, batch_size, progress)
+        finally:
+            # Also after a failed load: in append mode the tables held data
+            # before the restore and must not be left without their indexes
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            for sql in deferred_indexes:
+                connection.execute(sql)
+        violations = connection.execute(
+            'PRAGMA foreign_key_check').fetchall()
+    finally:
+        connection.close()
+
+    return RestoreResult(tables, time.perf_counter() - started, violations)
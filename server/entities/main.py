@@ -3,85 +3,132 @@ import os
 import uuid
 from datetime import datetime
 import logging
-from logging.handlers import TimedRotatingFileHandler
 
-from flask import Flask, redirect, render_template, request, url_for
+from flask import Flask, Response, jsonify, redirect, render_template, request, url_for
 from flask_migrate import Migrate
-from flask import flash
+from flask import flash, stream_with_context
+import click
 
 from wtforms import BooleanField
 
 from forms import QuestionTypeForm, RoleForm, TeamForm, UserForm, QuestionForm, WorkflowTemplateForm, LoginForm, ApprovalStageForm, ScreenBuilderForm, OptionListForm
 
-from forms import generate_form
+from forms import get_form_class
 from flask import session
 
 from models import (  # Use the 'db' instance from models
     Question, QuestionType, Role, Team, User, db, WorkflowTemplate, Answer,
-    Case, Comment, ApprovalStage, ScreenBuilder, OptionList, InternalMessage)
-from event_handler import handle_case_event
+    Case, Comment, ApprovalStage, ScreenBuilder, OptionList, InternalMessage,
+    Event, user_roles)
+from event_handler import event_pipeline, handle_case_event
+from stage_graph import stage_graph
+from answers import save_case_answers
+from app_logging import app_logging
+from case_loader import load_case_document
+from case_inbox import CASE_FILTERS, list_cases
+from case_counters import dashboard_stats, rebuild_counters
+from notifications import notification_hub, stream_events
+from case_search import rebuild_search_index, search_cases
+from comment_threads import load_comment_threads
+from case_api import case_api
+from case_export import EXPORT_FORMATS, ExportStats, export_cases, parse_date
+from db_backup import BackupRestartLimit, backup_database
+from db_profile import apply_database_profile, install_sqlite_pragmas
+from json_restore import restore_json_backup
+from incremental_backup import (load_state, restore_chain, take_base_backup,
+                                take_delta_backup)
+from metrics import request_metrics
+from page_cache import cached_list_page
+from query_plans import check_query_plans
+from reference_data import reference_data
+from query_detector import query_budget, query_detector
+from question_regex import compile_pattern, find_invalid_answers
+from template_resolver import resolve_template, resolve_templates, split_ids
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key'
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///site.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL',
+                                                   'sqlite:///site.db')
+
+# 'production' turns on WAL, tuned pragmas and a larger connection pool
+# (see db_profile.DATABASE_PROFILES)
+app.config['DATABASE_PROFILE'] = os.environ.get('DATABASE_PROFILE', 'default')
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# Serve dashboard counts from the case_status_counts table instead of
+# counting `cases`. Run `flask rebuild-case-counters` before enabling.
+app.config['CASE_STATUS_COUNTERS'] = os.environ.get('CASE_STATUS_COUNTERS',
+                                                    '0') == '1'
+
+# Case events are written in batches by a background thread ('async') or in
+# the request's own transaction ('sync', e.g. for tests)
+app.config['EVENT_PIPELINE_MODE'] = os.environ.get('EVENT_PIPELINE_MODE',
+                                                   'async')
+app.config['EVENT_BATCH_SIZE'] = 100
+app.config['EVENT_FLUSH_INTERVAL'] = 1.0
+apply_database_profile(app)
 # Initialize the existing 'db' instance with the app
 db.init_app(app)
+install_sqlite_pragmas(app)
 
 # Initialize Flask-Migrate
 migrate = Migrate(app, db)
 
-# Set up logging with log rotation
+event_pipeline.init_app(app)
+
+# JSON API under /api/v1 (see case_api)
+app.register_blueprint(case_api)
 
-log_handler = TimedRotatingFileHandler(
-    'app.log', when='D', interval=3,
-    backupCount=3)  # Rotate logs every 3 days, keep last 3 as backup
-log_handler.setLevel(logging.DEBUG)
-log_handler.setFormatter(
-    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+# Per-endpoint latency, SQL and template timings, served at /metrics
+request_metrics.init_app(app)
 
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.DEBUG)
-console_handler.setFormatter(
-    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+# Report repeated statement shapes (N+1 queries); on in debug mode unless
+# N_PLUS_ONE_DETECTION=0/1 is set
+if 'N_PLUS_ONE_DETECTION' in os.environ:
+    app.config['N_PLUS_ONE_DETECTION'] = os.environ[
+        'N_PLUS_ONE_DETECTION'] == '1'
+query_detector.init_app(app)
 
-logging.basicConfig(level=logging.DEBUG,
-                    handlers=[log_handler, console_handler])
+# Logging: JSON lines to LOG_FILE written by a background thread; DEBUG
+# records are kept for a LOG_SAMPLE_RATE share of requests (see app_logging).
+# LOG_LEVELS sets per-module levels, e.g. "case_export=DEBUG,werkzeug=WARNING"
+for _name, _default in (('LOG_LEVEL', 'INFO'), ('LOG_LEVELS', ''),
+                        ('LOG_FILE', 'app.log'), ('LOG_CONSOLE_LEVEL', 'INFO'),
+                        ('LOG_SAMPLE_RATE', '0.01')):
+    app.config[_name] = os.environ.get(_name, _default)
+app_logging.init_app(app)
 
 logger = logging.getLogger(__name__)
 
 
 @app.route('/')
 def index():
-    print(f"index()")
     return render_template('index.html')
 
 
 @app.route('/teams')
+@cached_list_page(Team)
 def teams():
-    print(f"/teams()")
     try:
         teams = Team.query.all()
         return render_template('team.html', teams=teams)
     except Exception as e:
-        app.logger.error(f"Failed to fetch teams: {e}")
+        app.logger.error('Failed to fetch teams: %s', e)
         return "An error occurred while fetching teams.", 500
 
 
 @app.route('/team/new', methods=['GET', 'POST'])
 def new_team():
-    print(f"new_team()")
-
     form = TeamForm()
     vvv = form.validate_on_submit()
 
     if not vvv:
-        print('New team validation failed')
+        logger.debug('New team validation failed')
         for fieldName, errorMessages in form.errors.items():
             for err in errorMessages:
-                app.logger.error(f"Error in {fieldName}: {err}")
+                app.logger.error('Error in %s: %s', fieldName, err)
 
     if form.validate_on_submit():
         try:
@@ -96,32 +143,26 @@ def new_team():
             return redirect(url_for('teams'))
         except Exception as e:
             db.session.rollback()
-            app.logger.error(f"Failed to create new team: {e}")
+            app.logger.error('Failed to create new team: %s', e)
             return "An error occurred while creating a new team.", 500
     return render_template('team_form.html', form=form)
 
 
 @app.route('/team/<string:id>/edit', methods=['GET', 'POST'])
 def edit_team(id):
-    print(f"edit team({id})")
-
     team = Team.query.get_or_404(id)
     form = TeamForm(obj=team)
-    print("bbb")
     if form.validate_on_submit():
         try:
-            print("ccc")
             team.team_name = form.team_name.data
             team.description = form.description.data
             team.contact = form.contact.data
             team.is_active = form.is_active.data
-            print("team:", team)
             db.session.commit()
             return redirect(url_for('teams'))
         except Exception as e:
-            print(f"Failed to edit team with id {id}: {e}")
             db.session.rollback()
-            app.logger.error(f"Failed to edit team with id {id}: {e}")
+            app.logger.error('Failed to edit team with id %s: %s', id, e)
             return "An error occurred while editing the team.", 500
     return render_template('team_form.html', form=form, team=team)
 
@@ -129,7 +170,7 @@ def edit_team(id):
 @app.route('/team/<string:id>/delete')
 def delete_team(id):
 
-    print(f"delete_team({id})")
+    logger.info('Deleting team %s', id)
     try:
         team = Team.query.get_or_404(id)
         db.session.delete(team)
@@ -137,7 +178,7 @@ def delete_team(id):
         return redirect(url_for('teams'))
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Failed to delete team with id {id}: {e}")
+        app.logger.error('Failed to delete team with id %s: %s', id, e)
         return "An error occurred while deleting the team.", 500
 
 
@@ -149,7 +190,7 @@ def delete_case(case_id):
 
     id = case_id
 
-    print(f"delete_case({id})")
+    logger.info('Deleting case %s', id)
     try:
         case = Case.query.get_or_404(id)
         answers = Answer.query.filter_by(case_id=case.id).all()
@@ -160,13 +201,20 @@ def delete_case(case_id):
         for comment in comments:
             db.session.delete(comment)
 
+        # Write events still queued by the pipeline first, so none lands
+        # after the case is gone
+        event_pipeline.flush()
+        events = Event.query.filter_by(case_id=case.id).all()
+        for case_event in events:
+            db.session.delete(case_event)
+
         db.session.delete(case)
         db.session.commit()
         return redirect(url_for('select_workflow_template'))
         # return redirect(url_for('teams'))
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Failed to delete team with id {id}: {e}")
+        app.logger.error('Failed to delete team with id %s: %s', id, e)
         return "An error occurred while deleting the team.", 500
 
 
@@ -174,8 +222,9 @@ def delete_case(case_id):
 
 
 @app.route('/roles')
+@cached_list_page(Role)
 def roles():
-    roles = Role.query.all()
+    roles = reference_data.roles.rows
     return render_template('roles.html', roles=roles)
 
 
@@ -194,7 +243,7 @@ def new_role():
             return redirect(url_for('roles'))
         except Exception as e:
             db.session.rollback()
-            app.logger.error(f"Failed to create new role: {e}")
+            app.logger.error('Failed to create new role: %s', e)
             return "An error occurred while creating a new role.", 500
     return render_template('roles_form.html', form=form)
 
@@ -212,7 +261,7 @@ def edit_role(id):
             return redirect(url_for('roles'))
         except Exception as e:
             db.session.rollback()
-            app.logger.error(f"Failed to edit role with id {id}: {e}")
+            app.logger.error('Failed to edit role with id %s: %s', id, e)
             return "An error occurred while editing the role.", 500
     return render_template('roles_form.html', form=form, role=role)
 
@@ -226,7 +275,7 @@ def delete_role(id):
         return redirect(url_for('roles'))
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Failed to delete role with id {id}: {e}")
+        app.logger.error('Failed to delete role with id %s: %s', id, e)
         return "An error occurred while deleting the role.", 500
 
 
@@ -234,6 +283,7 @@ def delete_role(id):
 
 
 @app.route('/users')
+@cached_list_page(User, user_roles, Role)
 def users():
     users = User.query.all()
     return render_template('users.html', users=users)
@@ -246,12 +296,6 @@ def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 
-# Example of using hash_password in your code
-user_password = "user_password_123"
-hashed = hash_password(user_password)
-print(f"Hashed password: {hashed}")
-
-
 @app.route('/user/new', methods=['GET', 'POST'])
 def new_user():
     form = UserForm()
@@ -268,7 +312,7 @@ def new_user():
             return redirect(url_for('users'))
         except Exception as e:
             db.session.rollback()
-            app.logger.error(f"Failed to create new user: {e}")
+            app.logger.error('Failed to create new user: %s', e)
             return "An error occurred while creating a new user.", 500
     return render_template('users_form.html', form=form)
 
@@ -294,16 +338,15 @@ def edit_user(id):
             # Update role associations based on form selections
             selected_roles = request.form.getlist('roles')
 
-            user.roles = [
-                Role.query.get(role_id) for role_id in selected_roles
-            ]
+            user.roles = Role.query.filter(
+                Role.role_id.in_(selected_roles)).all()
 
             db.session.commit()
             return redirect(url_for('users'))
 
         except Exception as e:
             db.session.rollback()
-            app.logger.error(f"Failed to edit user with id {id}: {e}")
+            app.logger.error('Failed to edit user with id %s: %s', id, e)
             return "An error occurred while editing the user.", 500
 
     # Ensure the form is populated with current roles
@@ -324,7 +367,7 @@ def delete_user(id):
         return redirect(url_for('users'))
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Failed to delete user with id {id}: {e}")
+        app.logger.error('Failed to delete user with id %s: %s', id, e)
         return "An error occurred while deleting the user.", 500
 
 
@@ -332,8 +375,9 @@ def delete_user(id):
 
 
 @app.route('/questiontypes')
+@cached_list_page(QuestionType)
 def list_questiontypes():
-    questiontypes = QuestionType.query.all()
+    questiontypes = reference_data.question_types.rows
     return render_template('questiontypes.html', questiontypes=questiontypes)
 
 
@@ -341,7 +385,6 @@ def list_questiontypes():
 def new_questiontype():
     form = QuestionTypeForm()
     if form.validate_on_submit():
-        print(f'questiontypes.  form.validate_on_submit():{form}')
         questiontype = QuestionType()
         questiontype.question_type_id = str(uuid.uuid4())[:8]
         questiontype.type = form.type.data
@@ -350,15 +393,14 @@ def new_questiontype():
         questiontype.has_options = form.has_options.data
         questiontype.options_str = form.options_str.data
 
-        print('new_questiontype: Form object for debugging:', form)
-        print('Form components:', {field.name: field.data for field in form})
-
         questiontype.has_supplemental = form.has_supplemental.data
         questiontype.supplemental_str = form.supplemental_str.data
         questiontype.author = form.author.data
 
         db.session.add(questiontype)
         db.session.commit()
+        if questiontype.has_regex and questiontype.regex_str:
+            compile_pattern(questiontype.regex_str)
         flash('New Question Type created!')
         return redirect(url_for('list_questiontypes'))
 
@@ -371,11 +413,7 @@ def edit_questiontype(id):
     form = QuestionTypeForm(obj=questiontype)
 
     if form.validate_on_submit():
-
-        print('new_questiontype: Form object for debugging:', form)
-        print('/questiontypes/<string:id>/edit   Form components:',
-              {field.name: field.data
-               for field in form})
+        logger.debug('Updating question type %s', id)
 
         questiontype.type = form.type.data
 
@@ -390,6 +428,8 @@ def edit_questiontype(id):
 
         questiontype.author = form.author.data
         db.session.commit()
+        if questiontype.has_regex and questiontype.regex_str:
+            compile_pattern(questiontype.regex_str)
 
         flash('Question Type updated!')
         return redirect(url_for('list_questiontypes'))
@@ -415,8 +455,9 @@ def delete_questiontype(id):
 
 
 @app.route('/questions', methods=['GET'])
+@cached_list_page(Question, QuestionType)
 def list_questions():
-    questions = Question.query.all()
+    questions = reference_data.questions.rows
     return render_template('questions.html', questions=questions)
 
 
@@ -457,8 +498,8 @@ def edit_question(question_id):
                 url_for('list_questions'))  # Redirect to a suitable page
         except Exception as e:
             db.session.rollback()
-            app.logger.error(
-                f"Failed to edit question with id {question_id}: {e}")
+            app.logger.error('Failed to edit question with id %s: %s',
+                             question_id, e)
             return "An error occurred while editing the question.", 500
 
     return render_template('questions_form.html', form=form, question=question)
@@ -474,8 +515,8 @@ def delete_question(question_id):
         return redirect(url_for('list_questions'))
     except Exception as e:
         db.session.rollback()
-        app.logger.error(
-            f"Failed to delete question with id {question_id}: {e}")
+        app.logger.error('Failed to delete question with id %s: %s',
+                         question_id, e)
         return "An error occurred while deleting the question.", 500
 
 
@@ -484,12 +525,7 @@ def delete_question(question_id):
 
 @app.route('/workflowtemplates', methods=['GET'])
 def list_workflowtemplates():
-    templates = WorkflowTemplate.query.all()
-    for template in templates:
-        template.roles_list = Role.query.filter(
-            Role.role_id.in_(template.role_ids.split(','))).all()
-        template.questions_list = Question.query.filter(
-            Question.question_id.in_(template.question_ids.split(','))).all()
+    templates = resolve_templates(WorkflowTemplate.query.all())
     return render_template('workflowtemplates.html', templates=templates)
 
 
@@ -502,9 +538,7 @@ def new_workflowtemplate():
     if form.validate_on_submit():
         # Get the ordered roles from the form data
         ordered_roles = request.form.get('orderedRoles', '')
-
-        for role in ordered_roles:
-            print("roles:" + role)
+        logger.debug('New workflow template roles: %s', ordered_roles)
 
         ordered_questions = request.form.get('orderedQuestions', '')
 
@@ -530,17 +564,6 @@ def edit_workflowtemplate(id):
     template = WorkflowTemplate.query.get_or_404(id)
     form = WorkflowTemplateForm(obj=template)
 
-    if request.method == 'POST':
-        print("\n========>  POST Request")
-    else:
-        print("\n========>  GET Request")
-        print('====>1')
-        if template.role_ids:
-            for role_id in template.role_ids.split(','):
-                print(f'role_id stored in template{role_id}')
-        else:
-            print('None stored in template. ')
-
     if form.validate_on_submit():
         # Update the template with form data
         template.title = form.title.data
@@ -550,13 +573,8 @@ def edit_workflowtemplate(id):
 
         # Use ordered roles for updating the template
         template.role_ids = ordered_roles
-
-        print('=====> in validate.\n====>2 ')
-        if template.role_ids:
-            for role_id in template.role_ids.split(','):
-                print(f'role_id stored in template{role_id}')
-        else:
-            print('None stored in template. ')
+        logger.debug('Workflow template %s roles: %s', id,
+                     template.role_ids or None)
 
         # Update questions
         ordered_questions = request.form.get('orderedQuestions', '')
@@ -595,8 +613,8 @@ def delete_workflowtemplate(id):
         return redirect(url_for('list_workflowtemplates'))
     except Exception as e:
         db.session.rollback()
-        app.logger.error(
-            f"Failed to delete workflow template with id {id}: {e}")
+        app.logger.error('Failed to delete workflow template with id %s: %s',
+                         id, e)
         return "An error occurred while deleting the workflow template.", 500
 
 
@@ -604,6 +622,7 @@ def delete_workflowtemplate(id):
 
 
 @app.route('/select_workflow_template')
+@query_budget(8)
 def select_workflow_template():
     user_id = session.get(
         'user_id')  # Assuming user_id is stored in the session
@@ -612,35 +631,38 @@ def select_workflow_template():
 
     # Fetch user roles
     user = User.query.get(user_id)
-    admin_roles = Role.query.filter_by(role_name='admin').all()
-    templates = WorkflowTemplate.query.all()
-    stages = ApprovalStage.query.all()
+    templates = reference_data.workflow_templates.rows
+    stages = reference_data.approval_stages.rows
 
     # Check if user has admin role
-    is_admin = any(role in admin_roles for role in user.roles)
+    is_admin = any(role.role_name == 'admin' for role in user.roles)
     users = []
+
+    # Server-side filters: ?status=&stage_id=&assignee_id=&template_id=
+    filters = {name: request.args.get(name) for name in CASE_FILTERS}
     try:
 
         if is_admin:
-            # Fetch all cases for admins
-            cases = Case.query.all()
+            # Admins page through all cases
             users = User.query.all()
         else:
-            # Fetch only user's cases
-            cases = Case.query.filter_by(assigned_user_id=user.user_id).all()
+            # Only the user's own cases
+            filters['assignee_id'] = user.user_id
+            users.append(user)
 
-            # Assume you have some logic to retrieve user data
-            user = User.query.get(user_id)
-            if user:
-                users.append(user)  # Append the user to the list
+        page = list_cases(filters,
+                          cursor=request.args.get('after'),
+                          limit=request.args.get('limit', type=int))
 
         return render_template('select_workflow_template.html',
                                templates=templates,
-                               cases=cases,
+                               cases=page.cases,
+                               next_cursor=page.next_cursor,
+                               filters=filters,
                                users=users,
                                stages=stages)
     except Exception as e:
-        app.logger.error(f"Failed to fetch cases: {e}")
+        app.logger.error('Failed to fetch cases: %s', e)
         return "An error occurred while fetching cases.", 500
 
 
@@ -693,51 +715,27 @@ def select_workflow_template():
 # main.py (Add an execution route)
 
 
-def validate_regex(value, regex_str):
-    import re
-    return bool(re.match(regex_str, str(value)))
+def flash_invalid_answers(failures):
+    # Report every failed answer of a submission at once
+    for question, raw_answer in failures:
+        flash(
+            f'Invalid format for question: {question.question_text}. Must match: {question.question_type.regex_str}'
+        )
 
 
 def save_answers(template, form_data, case_id):
-    print(
-        f'\n\n==> in save answers(), case_id:{case_id}:  template:{template}:, form_data:{form_data}:\n\n'
-    )
-
     # Fetch the case to get its case_number
     case = Case.query.get(case_id)
-    case_number = case.id if case else None
-
-    for question in template.questions_list:
-        field_id = f'question_{question.question_id}'
-        raw_answer = form_data.get(field_id, '')
-
-        if question.question_type.has_regex and question.question_type.regex_str:
-            if not validate_regex(raw_answer,
-                                  question.question_type.regex_str):
-                flash(
-                    f'Invalid format for question: {question.question_text}. Must match: {question.question_type.regex_str}'
-                )
-                return False
-
-        # Convert boolean answers to string representation
-        if isinstance(raw_answer, bool):
-            answer_text = str(raw_answer).lower()
-        else:
-            answer_text = str(raw_answer)
 
-        # Create and save an Answer instance for each question
-        answer = Answer()
-        answer.workflow_id = template.id
-        answer.question_id = question.question_id
-        answer.answer_text = answer_text
-        # answer.user_id = user.user_id
-        answer.case_id = case_id
-        answer.case_number = case_number  # Set case_number here
+    failures = find_invalid_answers(template.questions_list, form_data)
+    if failures:
+        flash_invalid_answers(failures)
+        return False
 
-        db.session.add(answer)
+    # Insert new answers and update changed ones; the caller commits
+    save_case_answers(template, case, form_data)
 
-    db.session.commit()
-    print("Answers saved successfully")
+    logger.debug('Answers saved for case %s', case_id)
     return True
 
 
@@ -745,54 +743,26 @@ def save_answers(template, form_data, case_id):
 
 
 @app.route('/execute_workflow', methods=['GET', 'POST'])
+@query_budget(10)
 def execute_workflow():
 
-    print(f"\n in: execute_workflow")
     users = User.query.all()
-    templates = WorkflowTemplate.query.all()
-
-    # Print all request data
-    if request.data:
-        print(f"Request data: {request.data}")
-    else:
-        print("No request data available.")
+    templates = reference_data.workflow_templates.rows
 
     if request.method == 'POST':
 
         template_id = request.form.get('template_id')
-        print(f"post 11:  template_id: {template_id}")
 
         user_id = request.form.get('user_id')  # Get the selected user ID
         template = WorkflowTemplate.query.get_or_404(template_id)
+        logger.debug('Executing workflow template %s (%s), roles %s',
+                     template.id, template.title, template.role_ids)
 
-        # Debug template and print 'None' if not valued
-        try:
-            if template:
-                print(f"Template ID: {template.id}")
-                print(f"Template Name: {template.title}")
-                print(f"Role IDs: {template.role_ids}")
-                print(f"Question IDs: {template.question_ids}")
-
-                print(f"Created at: {template.created_at}")
-                print(f"Updated at: {template.updated_at}")
-                if template.case:
-                    print(f"case: {template.case}")
-                else:
-                    print("case: not valued")
-            else:
-                print("template=None")
-        except AttributeError as e:
-            print(f"Error accessing template attributes: {e}")
-
-        # print(f'post 33')
         # Populate questions_list from question_ids
-        template.questions_list = Question.query.filter(
-            Question.question_id.in_(template.question_ids.split(','))).all()
-
-        # print(f'post 44')
+        resolve_template(template, roles=False)
 
         # Create dynamic form based on the template
-        form_class = generate_form(template)
+        form_class = get_form_class(template)
 
         form = form_class()
 
@@ -801,25 +771,13 @@ def execute_workflow():
         if case_id:
 
             case = Case.query.get(case_id)
-            if case:
-                # List all components of case if it is valued
-                for attr, value in case.__dict__.items():
-                    if not attr.startswith('_'):  # Avoid internal attributes
-                        print(f"Case component {attr}: {value}")
-            else:
-                print('No components of case')
+            if case is None:
+                logger.warning('Case %s not found for workflow template %s',
+                               case_id, template.id)
         else:
-            print("\nDebug: Creating new case components")
-
-            print(f"\nDebug: Type (template):{type(template)}")
-
-            wfc = WorkflowTemplate.query.filter_by(id=template.id).all()
-            print(f"\nDebug: what is Type (wfc):{type(wfc)}")
-            print(f"\nDebug: whats in wfc:{wfc.__repr__()}")
-
             # Create new case only if we don't have an existing one
             author = session.get('username', 'Anonymous')
-            role_ids = template.role_ids.split(',')
+            role_ids = split_ids(template.role_ids)
             initial_role = role_ids[0] if role_ids else None
 
             user_id = request.form.get('user_id')
@@ -830,44 +788,40 @@ def execute_workflow():
             case.author_username = author
             case.assigned_user_id = user_id
 
-            first_approval_stage = ApprovalStage.query.filter_by(
-                workflow_template_id=template_id, is_first=True).first()
+            first_approval_stage = stage_graph.first(template.id)
 
             case.current_stage_id = first_approval_stage.stage_id
-
-            # Get request values out of form and print them
-            for field, value in form.data.items():
-                print(f"== > !case - Form field {field} has value {value}")
             db.session.add(case)
-            db.session.commit()
+            # Flush for the id, commit once below: a commit here would
+            # expire template.questions_list and save_answers() would
+            # reload every question one by one
+            db.session.flush()
 
         if form.validate_on_submit():
-            print(f"\n   ==>in: execute_workflow form validate.  ")
-
             # Get the current stage ID using the template_id
             current_stage_id = case.current_stage_id
 
             # If current_stage_id is empty, set it from approval stage
             if not current_stage_id:
-                approval_stage = ApprovalStage.query.filter_by(
-                    workflow_template_id=template.id, is_first=True).first()
+                approval_stage = stage_graph.first(template.id)
 
                 if approval_stage:
-                    current_stage_id = approval_stage.id
+                    current_stage_id = approval_stage.stage_id
                     case.current_stage_id = current_stage_id
                 else:
-                    print('No approval stage for this template')
+                    logger.warning('No approval stage for template %s',
+                                   template.id)
 
             if not save_answers(template, form.data, case.id):
+                # Keep the new case so the corrected form can resubmit it
+                db.session.commit()
                 return render_template('execute_workflow.html',
                                        form=form,
                                        template=template,
                                        case=case)
 
             # Move to the next role logic
-            role_ids = template.role_ids.split(',')
-            print(f"\nin: execute_workflow  role_ids:{role_ids}")
-
+            role_ids = split_ids(template.role_ids)
             current_role_index = role_ids.index(case.current_role_id)
 
             if current_role_index < len(role_ids) - 1:
@@ -889,15 +843,12 @@ def execute_workflow():
             flash('Workflow step executed successfully!')
             return redirect(url_for('select_workflow_template'))
 
+        db.session.commit()
         return render_template('execute_workflow.html',
                                form=form,
                                template=template,
                                case=case)
 
-    print(
-        f"===> if get!   Number of users: {len(users)}  Templates{len(templates)}"
-    )
-
     return render_template('select_workflow_template.html',
                            templates=templates,
                            users=users)
@@ -930,9 +881,7 @@ def login():
 
             username = session.get('username')
             user_id = session.get('user_id')
-            print(
-                f"===\n\n /login Username: {form.username.data}, User ID: {user_id}"
-            )
+            logger.info('User %s logged in', user_id)
 
             # Adjust as per your login logic
             return redirect(url_for('select_workflow_template'))
@@ -946,107 +895,76 @@ def login():
 @app.route('/view_case/<string:case_id>')
 def view_case(case_id):
 
-    print(f'\n\nview_case(case_id):{case_id}\n\n')
+    # Fetch the case, its role, questions and answers in a fixed number
+    # of queries (404 if the case does not exist)
+    document = load_case_document(case_id)
 
-    # Fetch the case using the provided case_id
-    case = Case.query.get_or_404(case_id)
-
-    # Fetch the role name associated with the current role_id
-    current_role = Role.query.get(case.current_role_id)
-    current_role_name = current_role.role_name if current_role else "Unknown Role"
-
-    # Fetch questions and related answers for this case
-    questions_with_answers = []
-    if case.workflow_template:
-        question_ids = case.workflow_template.question_ids.split(',')
-        questions = Question.query.filter(
-            Question.question_id.in_(question_ids)).all()
-
-        for question in questions:
-            answer = Answer.query.filter_by(
-                workflow_id=case.workflow_id,
-                question_id=question.question_id,
-                case_number=case.id  # Check case_number as well
-            ).first()
-            questions_with_answers.append((question, answer))
-
-        # Pass the updated context to the template
-    return render_template('view_case.html',
-                           case=case,
-                           current_role_name=current_role_name,
-                           questions_with_answers=questions_with_answers)
+    # Pass the updated context to the template
+    return render_template(
+        'view_case.html',
+        case=document.case,
+        current_role_name=document.current_role_name,
+        questions_with_answers=document.questions_with_answers)
 
 
 #  =================================================
 @app.route('/edit_case/<string:case_id>', methods=['GET', 'POST'])
+@query_budget(8)
 def edit_case(case_id):
     # Indicate the beginning of the case editing process for debugging
-    logger.debug(f"\n\n==>def edit_case({case_id}): ")
+    logger.debug('edit_case(%s)', case_id)
 
-    # Fetch the case object from the database, return 404 if not found
-    case = Case.query.get_or_404(case_id)
-    logger.info(f"Fetched case with ID: {case_id}")
+    # Fetch the case with its template, questions and answers, return 404
+    # if not found
+    document = load_case_document(case_id)
+    case = document.case
+    logger.debug('Fetched case with ID: %s', case_id)
     # Retrieve the associated workflow template
-    template = case.workflow_template
-    logger.info(f"Workflow template retrieved for case ID: {case_id}")
+    template = document.template
+    logger.debug('Workflow template retrieved for case ID: %s',
+                 case_id)
 
     if case.current_stage_id:
-        logger.debug(
-            f"\n  ==>we HAVE a currstage. current stages id is:{case.current_stage_id}"
-        )
+        logger.debug('Current stage id: %s', case.current_stage_id)
     else:
-        logger.debug('\n  ==>curr stage is none')
-
-    if case.current_stage_id:
-        # Query the ApprovalStage where the current stage ID matches
-        current_stage = ApprovalStage.query.filter_by(
-            stage_id=case.current_stage_id).first()
-        logger.debug(f"current stage is: {current_stage}")
-        if current_stage == case.current_stage_id:
-            logger.debug(f"Current Stage Name: {current_stage.stage_name}")
+        logger.debug('Case %s has no current stage', case_id)
 
     # Show current stage name instead of stage id in edit_case.html template
     # Fetch the current stage name
-    current_stage_name = 'Unknown Stage'
-    if case.current_stage_id:
-        current_stage = ApprovalStage.query.get(case.current_stage_id)
-        current_stage_name = current_stage.stage_name if current_stage else 'Unknown Stage'
-        app.logger.debug(f"Fetched current_stage_name: {current_stage_name}")
+    current_stage = document.current_stage
+    current_stage_name = document.current_stage_name
+    app.logger.debug('Fetched current_stage_name: %s', current_stage_name)
 
     # Populate questions list from the template
-    template.questions_list = Question.query.filter(
-        Question.question_id.in_(template.question_ids.split(','))).all()
-    app.logger.debug(
-        f"Populated questions_list with {len(template.questions_list)} questions."
-    )
+    template.questions_list = document.questions
+    app.logger.debug('Populated questions_list with %s questions.',
+                     len(template.questions_list))
 
     # Generate dynamic form based on the workflow template
-    form_class = generate_form(template)
+    form_class = get_form_class(template)
     form = form_class()
-    app.logger.debug(f"Generated dynamic form for the template.")
+    app.logger.debug('Generated dynamic form for the template.')
 
     # Handle HTTP GET requests
     if request.method == 'GET':
         # Log GET request event
-        app.logger.debug(
-            f"\n\n  ==>/edit_case:{case_id}: request.method == 'GET' ")
+        app.logger.debug('edit_case %s: GET', case_id)
 
         # Initialize dictionary to store pre-populated form data
         form_data = {}
 
         # Populate form data with existing answers from the database
+        answers = document.answers
         for question in template.questions_list:
             field_id = f'question_{question.question_id}'
 
-            # Retrieve the corresponding answer from the database
-            answer = Answer.query.filter_by(workflow_id=template.id,
-                                            question_id=question.question_id,
-                                            case_number=case.id).first()
+            # Retrieve the corresponding answer
+            answer = answers.get(question.question_id)
 
             # Log the retrieval of answers
-            app.logger.debug(
-                f"Retrieved answer for question_id {question.question_id}: {'Found' if answer else 'Not Found'}"
-            )
+            app.logger.debug('Retrieved answer for question_id %s: %s',
+                             question.question_id,
+                             'Found' if answer else 'Not Found')
 
             # If answer exists and form has corresponding field, populate it
             if answer and hasattr(form, field_id):
@@ -1064,28 +982,24 @@ def edit_case(case_id):
     # Handle form submission
     if form.validate_on_submit():
         # Log form submission event
-        logger.debug(f"Form submitted for case editing with ID: {case_id}")
-        print(f"\n\n validate_on_submit(): Editing Case with ID: {case_id}")
-
-        # Fetch current stage and determine next stage
-        current_stage = ApprovalStage.query.get(case.current_stage_id)
+        logger.debug('Form submitted for case editing with ID: %s', case_id)
 
+        # Current stage was resolved above; determine next stage
         # Log current stage details
-        logger.debug(f"Current stage: {current_stage}")
+        logger.debug('Current stage: %s', current_stage)
         if current_stage and current_stage.is_last:
             case.status = "completed"
             handle_case_event(case_id,
                               case.status,
                               old_value='active',
                               new_value='completed')
-            logger.debug(f"Case ID {case_id} marked as completed.")
+            logger.debug('Case ID %s marked as completed.', case_id)
         elif current_stage:
-            next_stage = ApprovalStage.query.filter_by(
-                order=current_stage.order + 1).first()
-            logger.debug(f"Next stage: {next_stage}")
+            next_stage = stage_graph.next(current_stage.stage_id)
+            logger.debug('Next stage: %s', next_stage)
 
             if not next_stage:
-                logger.error(f"No next stage found for case ID {case_id}.")
+                logger.error('No next stage found for case ID %s.', case_id)
                 handle_case_event(case_id,
                                   event_type='completed',
                                   old_value=current_stage.stage_name,
@@ -1099,57 +1013,33 @@ def edit_case(case_id):
                                   event_type='stage cahnge',
                                   old_value=current_stage.stage_name,
                                   new_value=current_stage.next_stage_name)
-                logger.debug(
-                    f"Case ID {case_id} current stage updated to {next_stage.stage_id}."
-                )
-
-        # Iterate over questions to update answers
-        for question in template.questions_list:
-            field_id = f'question_{question.question_id}'
-            raw_answer = form.data.get(field_id, '')
-
-            # Convert boolean answers to string
-            answer_text = str(raw_answer).lower() if isinstance(
-                raw_answer, bool) else str(raw_answer)
-
-            # Validate answer against regular expression, if applicable
-            if question.question_type.has_regex and question.question_type.regex_str:
-                if not validate_regex(raw_answer,
-                                      question.question_type.regex_str):
-                    flash(
-                        f'Invalid format for question: {question.question_text}. Must match: {question.question_type.regex_str}'
-                    )
-                    # Log regex validation failure
-                    logger.warning(
-                        f"Validation failed for question {question.question_text} with answer {raw_answer}."
-                    )
-
-                    # Re-render form with error message if validation fails
-                    return render_template('edit_case.html',
-                                           form=form,
-                                           case=case,
-                                           template=template)
-
-            # Update or create the answer in the database
-            answer = Answer.query.filter_by(workflow_id=template.id,
-                                            question_id=question.question_id,
-                                            case_number=case.id).first()
-
-            # Log answer update or creation
-            logger.debug(
-                f"Answer for question ID {question.question_id} will be updated or created."
-            )
-            if answer:  # Update existing answer
-                answer.answer_text = answer_text
-            else:  # Create new answer if it doesn't exist
-                # print("\n---> in form validation. print 222 if not answer")
-                answer = Answer()
-                answer.workflow_id = template.id
-                answer.question_id = question.question_id
-                answer.answer_text = answer_text
-                answer.case_id = case.id
-                answer.case_number = case.id
-                db.session.add(answer)
+                logger.debug('Case ID %s current stage updated to %s.',
+                             case_id, next_stage.stage_id)
+
+        # Validate every answer against its regular expression before
+        # anything is written
+        failures = find_invalid_answers(template.questions_list, form.data)
+        if failures:
+            flash_invalid_answers(failures)
+            # Log regex validation failures
+            for question, raw_answer in failures:
+                logger.warning(
+                    'Validation failed for question %s with answer %s.',
+                    question.question_text, raw_answer)
+
+            # Re-render form with error messages if validation fails
+            return render_template('edit_case.html',
+                                   form=form,
+                                   case=case,
+                                   template=template)
+
+        # Update or create the answers in the database
+        inserted, updated = save_case_answers(template,
+                                              case,
+                                              form.data,
+                                              existing=document.answers)
+        logger.debug('Answers for case ID %s: %s created, %s updated.',
+                     case_id, inserted, updated)
 
         # Handle comment if provided
         comment_text = request.form.get('comment')
@@ -1173,27 +1063,39 @@ def edit_case(case_id):
     # for field, value in form.data.items():
     # print(f"form.data.items: {field}: value:{value}")
 
-# Fetch comments for this case
-    comments = Comment.query.filter_by(case_id=case_id).all()
+# Fetch comment threads for this case in one query
+    comment_page = load_comment_threads(
+        case_id, page=request.args.get('comments_page', 1, type=int))
+    # Threads beyond this page are only reachable through these links
+    next_comments_url = url_for(
+        'edit_case', case_id=case_id, comments_page=comment_page.next_page
+    ) if comment_page.next_page else None
+    previous_comments_url = url_for(
+        'edit_case', case_id=case_id, comments_page=comment_page.previous_page
+    ) if comment_page.previous_page else None
 
     # Render the edit case template with the form, case, template and comments data
     return render_template('edit_case.html',
                            form=form,
                            case=case,
                            template=template,
-                           comments=comments)
+                           comments=comment_page.flat(),
+                           comment_threads=comment_page.threads,
+                           comment_page=comment_page,
+                           next_comments_url=next_comments_url,
+                           previous_comments_url=previous_comments_url)
 
 
 # ===================================================
 
 if __name__ == '__main__':
     with app.app_context():
-        print("111")
         db.create_all()
     app.run(host='0.0.0.0', port=5000, debug=True)
 
 
 @app.route('/screenbuilders')
+@cached_list_page(ScreenBuilder)
 def list_screenbuilders():
     screens = ScreenBuilder.query.all()
     return render_template('screenbuilders.html', screens=screens)
@@ -1245,8 +1147,9 @@ def delete_screenbuilder(id):
 
 
 @app.route('/approval_stages')
+@cached_list_page(ApprovalStage, WorkflowTemplate)
 def list_approval_stages():
-    stages = ApprovalStage.query.all()
+    stages = reference_data.approval_stages.rows
     return render_template('approval_stages.html', stages=stages)
 
 
@@ -1254,14 +1157,10 @@ def list_approval_stages():
 def new_approval_stage():
     form = ApprovalStageForm()
 
-    # Print all items in the form
-    for field, value in form.data.items():
-        print(f"{field}: {value}")
-
-        if not form.validate_on_submit():
-            for fieldName, errorMessages in form.errors.items():
-                for err in errorMessages:
-                    app.logger.error(f"Error in {fieldName}: {err}")
+    if not form.validate_on_submit():
+        for fieldName, errorMessages in form.errors.items():
+            for err in errorMessages:
+                app.logger.error('Error in %s: %s', fieldName, err)
 
     if form.validate_on_submit():
         stage = ApprovalStage()
@@ -1275,9 +1174,6 @@ def new_approval_stage():
 
         stage.workflow_template_id = form.workflow_template.data
 
-        # Debugging the form.workflow_template.data
-        print(f"\n\n Workflow Template Data: {form.workflow_template.data}")
-
         stage.approve_role_id = form.approve_role.data  # Form value is already the role_id
         stage.deny_role_id = form.deny_role.data  # Form value is already the role_id
         stage.author = session.get('username', 'Anonymous')
@@ -1332,6 +1228,7 @@ def delete_approval_stage(id):
 
 
 @app.route('/optionlists')
+@cached_list_page(OptionList)
 def list_optionlists():
     optionlists = OptionList.query.all()
     return render_template('optionlists.html', optionlists=optionlists)
@@ -1388,7 +1285,7 @@ def delete_optionlist(id):
 # ================================
 @app.route('/save_draft/<string:case_id>', methods=['GET', 'POST'])
 def save_draft(case_id):
-    print(f"Saving draft for case ID: {case_id}")
+    logger.info('Saving draft for case ID: %s', case_id)
 
 
 @app.route('/notifications')
@@ -1399,11 +1296,35 @@ def get_notifications():
 
     notifications = InternalMessage.query.filter_by(
         to_user_id=user_id,
-        is_read=False).order_by(InternalMessage.created_at.desc()).all()
+        is_read=False).order_by(InternalMessage.created_on.desc()).all()
 
     return render_template('notifications.html', notifications=notifications)
 
 
+@app.route('/notifications/stream')
+def stream_notifications():
+    user_id = session.get('user_id')
+    if not user_id:
+        return "Please log in first", 403
+
+    # Push new messages instead of having every open tab poll
+    return Response(stream_events(user_id),
+                    mimetype='text/event-stream',
+                    headers={
+                        'Cache-Control': 'no-cache',
+                        'X-Accel-Buffering': 'no'
+                    })
+
+
+@app.route('/notifications/unread_count')
+def unread_notifications_count():
+    user_id = session.get('user_id')
+    if not user_id:
+        return "Please log in first", 403
+
+    return jsonify(unread_count=notification_hub.unread_count(user_id))
+
+
 @app.route('/notifications/mark_read/<string:message_id>', methods=['POST'])
 def mark_notification_read(message_id):
     user_id = session.get('user_id')
@@ -1430,6 +1351,8 @@ def mark_all_notifications_read():
         {InternalMessage.is_read: True})
 
     db.session.commit()
+    # Bulk update bypasses the session hooks that maintain the count
+    notification_hub.reset_unread(user_id)
     flash('All notifications marked as read')
     return redirect(url_for('get_notifications'))
 
@@ -1439,49 +1362,48 @@ def mark_all_notifications_read():
 
 @app.route('/save_template/<string:case_id>', methods=['GET', 'POST'])
 def save_template(case_id):
-    print(f"Saving template for case ID: {case_id}")
+    logger.info('Saving template for case ID: %s', case_id)
     flash('Template saved successfully!')  # Placeholder response
     return redirect(url_for('edit_case', case_id=case_id))
 
 
 @app.route('/change_reviewer/<string:case_id>', methods=['GET', 'POST'])
 def change_reviewer(case_id):
-    print(f"Changing reviewer for case ID: {case_id}")
+    logger.info('Changing reviewer for case ID: %s', case_id)
     flash('Reviewer changed successfully!')  # Placeholder response
     return redirect(url_for('edit_case', case_id=case_id))
 
 
 @app.route('/edit/<string:case_id>', methods=['GET', 'POST'])
 def edit(case_id):
-    print(f"Editing case ID: {case_id}")
+    logger.info('Editing case ID: %s', case_id)
     flash('Case edited!')  # Placeholder response
     return redirect(url_for('edit_case', case_id=case_id))
 
 
 @app.route('/resubmit/<string:case_id>', methods=['GET', 'POST'])
 def resubmit(case_id):
-    print(f"Resubmitting case ID: {case_id}")
+    logger.info('Resubmitting case ID: %s', case_id)
     flash('Case resubmitted!')  # Placeholder response
     return redirect(url_for('edit_case', case_id=case_id))
 
 
 @app.route('/approve/<string:case_id>', methods=['GET', 'POST'])
 def approve_case(case_id):
-    print(f"Approving case ID: {case_id}")
+    logger.info('Approving case ID: %s', case_id)
     flash('Case approved!')  # Placeholder response
     return redirect(url_for('edit_case', case_id=case_id))
 
 
 @app.route('/deny/<string:case_id>', methods=['GET', 'POST'])
 def deny_case(case_id):
-    print(f"Denying case ID: {case_id}")
+    logger.info('Denying case ID: %s', case_id)
     try:
         # Fetch the case by the given case_id
         case = Case.query.get_or_404(case_id)
 
         # Fetch the approval stage where it's the first stage in the workflow
-        approval_stage = ApprovalStage.query.filter_by(
-            workflow_template_id=case.workflow_id, is_first=True).first()
+        approval_stage = stage_graph.first(case.workflow_id)
 
         # Update the current stage of the case to the first stage
         if approval_stage:
@@ -1492,7 +1414,7 @@ def deny_case(case_id):
             flash('No initial stage found for the case template!')
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Error denying case ID {case_id}: {e}")
+        app.logger.error('Error denying case ID %s: %s', case_id, e)
         flash('An error occurred while denying the case.')
 
     return redirect(url_for('edit_case', case_id=case_id))
@@ -1523,17 +1445,223 @@ def reassign_user(case_id):
 
 @app.route('/return_to_previous/<string:case_id>', methods=['GET', 'POST'])
 def return_to_previous(case_id):
-    print(f"Returning to previous for case ID: {case_id}")
+    logger.info('Returning to previous for case ID: %s', case_id)
     flash('Returned to previous step!')  # Placeholder response
     return redirect(url_for('edit_case', case_id=case_id))
 
 
+@app.route('/metrics')
+def metrics():
+    return Response(request_metrics.render(),
+                    mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/dashboard')
 def dashboard():
-    stats = {
-        'active': Case.query.filter_by(status='active').count(),
-        'pending': Case.query.filter_by(status='pending').count(),
-        'completed': Case.query.filter_by(status='completed').count(),
-        'abandoned': Case.query.filter_by(status='abandoned').count()
-    }
+    stats = dashboard_stats()
     return render_template('dashboard.html', stats=stats)
+
+
+@app.route('/search')
+def search():
+    user_id = session.get('user_id')
+    if not user_id:
+        return "Please log in first", 403
+
+    terms = request.args.get('q', '')
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify(query=terms, results=search_cases(terms, limit=limit))
+
+
+@app.route('/export/cases')
+def export_cases_route():
+    user_id = session.get('user_id')
+    if not user_id:
+        return "Please log in first", 403
+
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return f"Unknown export format: {export_format}", 400
+    try:
+        filters = {
+            'template_id': request.args.get('template_id'),
+            'status': request.args.get('status'),
+            'since': parse_date(request.args.get('since')),
+            'until': parse_date(request.args.get('until')),
+        }
+    except ValueError as e:
+        return f"Invalid date: {e}", 400
+
+    stats = ExportStats()
+
+    def generate():
+        yield from export_cases(export_format, stats=stats, **filters)
+        logger.info('Exported %s cases (%s rows) at %.0f rows/s',
+                    stats.cases, stats.rows, stats.rows_per_second)
+
+    # Streamed: rows are written as they are read, never held in memory
+    return Response(stream_with_context(generate()),
+                    mimetype=EXPORT_FORMATS[export_format],
+                    headers={
+                        'Content-Disposition':
+                        f'attachment; filename=cases.{export_format}'
+                    })
+
+
+@app.cli.command('export-cases')
+@click.option('--format',
+              'export_format',
+              type=click.Choice(list(EXPORT_FORMATS)),
+              default='ndjson')
+@click.option('--template-id', default=None)
+@click.option('--status', default=None)
+@click.option('--since', default=None, help='Created on or after (ISO date).')
+@click.option('--until', default=None, help='Created before (ISO date).')
+@click.option('--output', type=click.File('w'), default='-')
+def export_cases_command(export_format, template_id, status, since, until,
+                         output):
+    """Stream cases with answers, comments and events as NDJSON or CSV.
+
+    Answers without a case follow as 'orphaned_answer' records.
+    """
+    stats = ExportStats()
+    for chunk in export_cases(export_format,
+                              stats=stats,
+                              template_id=template_id,
+                              status=status,
+                              since=parse_date(since),
+                              until=parse_date(until)):
+        output.write(chunk)
+    click.echo(
+        f"Exported {stats.cases} cases ({stats.rows} rows) in "
+        f"{stats.seconds:.1f}s, {stats.rows_per_second:.0f} rows/s",
+        err=True)
+
+
+@app.cli.command('backup-db')
+@click.option('--dir', 'backup_dir', default='backups', show_default=True)
+@click.option('--keep', default=7, show_default=True,
+              help='Backups to retain (0 keeps all).')
+@click.option('--pages', default=256, show_default=True,
+              help='Pages copied per step.')
+@click.option('--sleep', default=0.005, show_default=True,
+              help='Seconds between steps.')
+@click.option('--max-restarts', default=10, show_default=True,
+              help='Restarts caused by concurrent writes before giving up.')
+def backup_db_command(backup_dir, keep, pages, sleep, max_restarts):
+    """Take an online, compressed snapshot of the app database."""
+    database_path = db.engine.url.database
+    try:
+        result = backup_database(database_path,
+                                 backup_dir=backup_dir,
+                                 pages=pages,
+                                 sleep=sleep,
+                                 keep=keep,
+                                 max_restarts=max_restarts)
+    except BackupRestartLimit as e:
+        raise click.ClickException(
+            f"{e}. Retry when the database is less busy, or raise "
+            f"--max-restarts / --pages.")
+    click.echo(f"Backup written to {result.path}: "
+               f"{result.database_bytes} bytes -> {result.compressed_bytes} "
+               f"compressed in {result.seconds:.2f}s "
+               f"({result.megabytes_per_second:.1f} MB/s)")
+    for path in result.removed:
+        click.echo(f"Removed old backup {path}")
+
+
+@app.cli.command('backup-incremental')
+@click.option('--dir', 'backup_dir', default='backups', show_default=True)
+@click.option('--full', is_flag=True,
+              help='Start a new chain with a full base backup.')
+def backup_incremental_command(backup_dir, full):
+    """Write the rows changed since the last backup to a delta file."""
+    database_path = db.engine.url.database
+    name = os.path.splitext(os.path.basename(database_path))[0]
+    if full or load_state(backup_dir, name) is None:
+        path = take_base_backup(database_path, backup_dir=backup_dir)
+        click.echo(f"Base backup written to {path}")
+        return
+    path, counts = take_delta_backup(database_path, backup_dir=backup_dir)
+    click.echo(f"Delta written to {path}")
+    for table, count in sorted(counts.items()):
+        click.echo(f"  {table}: {count}")
+
+
+@app.cli.command('restore-incremental')
+@click.option('--dir', 'backup_dir', default='backups', show_default=True)
+@click.option('--name', default='site', show_default=True,
+              help='Database name of the backup chain.')
+@click.option('--target', required=True,
+              help='Database file to rebuild (overwritten).')
+@click.option('--upto', type=int, default=None,
+              help='Apply only the first N deltas.')
+def restore_incremental_command(backup_dir, name, target, upto):
+    """Rebuild a database from a base backup plus its deltas."""
+    deltas = restore_chain(backup_dir, name, target, upto=upto)
+    click.echo(f"Restored {target} from base + {len(deltas)} deltas. "
+               f"Start a new chain (--full) before resuming backups.")
+
+
+@app.cli.command('restore-json')
+@click.argument('backup_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--target', default='restored_teams.db', show_default=True,
+              help='Database file to restore into.')
+@click.option('--append', is_flag=True,
+              help='Load into the existing target instead of replacing it.')
+@click.option('--batch-size', default=5000, show_default=True,
+              help='Rows per executemany batch.')
+def restore_json_command(backup_file, target, append, batch_size):
+    """Restore a JSON backup written by backupDatabase.js."""
+
+    def report(table, loaded, total):
+        if total:
+            click.echo(f"  {table}: {loaded}/{total} rows "
+                       f"({loaded * 100 // total}%)")
+        else:
+            click.echo(f"  {table}: {loaded} rows")
+
+    result = restore_json_backup(backup_file,
+                                 target,
+                                 batch_size=batch_size,
+                                 replace=not append,
+                                 progress=report)
+    click.echo(f"Restored {result.rows} rows in {len(result.tables)} tables "
+               f"to {target} in {result.seconds:.2f}s "
+               f"({result.rows_per_second:.0f} rows/s)")
+    if result.foreign_key_violations:
+        click.echo(f"Warning: {len(result.foreign_key_violations)} rows "
+                   f"violate foreign keys")
+
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail unless every hot query is answered from an index."""
+    failures = 0
+    for name, (plan, problems) in check_query_plans().items():
+        click.echo(f"{name}: {'; '.join(problems) or 'ok'}")
+        for detail in plan:
+            click.echo(f"    {detail}")
+        failures += bool(problems)
+    if failures:
+        raise click.ClickException(
+            f"{failures} hot queries are not answered from an index; "
+            f"run `flask db upgrade`.")
+
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Create the answer/comment full-text index and re-index all rows."""
+    counts = rebuild_search_index()
+    for table, count in counts.items():
+        click.echo(f"{table}: {count} rows indexed")
+
+
+@app.cli.command('rebuild-case-counters')
+def rebuild_case_counters_command():
+    """Check case_status_counts against `cases` and rebuild it."""
+    db.create_all()
+    mismatches = rebuild_counters()
+    for status, (counted, actual) in sorted(mismatches.items()):
+        click.echo(f"{status}: counter was {counted}, cases has {actual}")
+    click.echo(f"Case status counters rebuilt ({len(mismatches)} corrected).")
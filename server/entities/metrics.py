@@ -0,0 +1,244 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import before_render_template, g, has_request_context, request
+from flask import template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Request instrumentation exposed in the Prometheus text format.
+#
+# For every endpoint: wall time, number and total time of SQL statements
+# (from the cursor execute events of every engine) and template render time.
+# Whatever remains of the wall time is view code: forms, Python, I/O.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"'
+                          for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.help}',
+            f'# TYPE {self.name} counter'
+        ]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{_labels(self.labels, labels)} '
+                         f'{_number(value)}')
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [
+                    [0] * (len(self.buckets) + 1), 0.0, 0
+                ]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.help}',
+            f'# TYPE {self.name} histogram'
+        ]
+        with self._lock:
+            series = sorted((labels, [list(counts), total, count])
+                            for labels, (counts, total,
+                                         count) in self._series.items())
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'), ),
+                                           counts):
+                cumulative += bucket_count
+                le = _labels(self.labels, labels, [('le', _number(bound))])
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            label_text = _labels(self.labels, labels)
+            lines.append(f'{self.name}_sum{label_text} {_number(total)}')
+            lines.append(f'{self.name}_count{label_text} {count}')
+        return lines
+
+
+class RequestMetrics:
+    """
+    Per-endpoint request, SQL and template metrics for one process.
+    """
+
+    def __init__(self):
+        self.requests = Counter('http_requests_total',
+                                'Requests handled.',
+                                ('endpoint', 'method', 'status'))
+        self.latency = Histogram('http_request_duration_seconds',
+                                 'Wall time per request.',
+                                 ('endpoint', 'method'))
+        self.statements = Counter('db_statements_total',
+                                  'SQL statements executed by requests.',
+                                  ('endpoint', ))
+        self.statement_seconds = Counter(
+            'db_statement_seconds_total',
+            'Time spent executing SQL statements.', ('endpoint', ))
+        self.statements_per_request = Histogram(
+            'db_statements_per_request',
+            'SQL statements executed per request.', ('endpoint', ),
+            STATEMENT_BUCKETS)
+        self.render_seconds = Counter(
+            'template_render_seconds_total',
+            'Time spent rendering templates, by endpoint.', ('endpoint', ))
+        self.template_latency = Histogram('template_render_duration_seconds',
+                                          'Render time per template.',
+                                          ('template', ))
+        self.background_statements = Counter(
+            'db_background_statements_total',
+            'SQL statements executed outside requests.')
+        self.metrics = (self.requests, self.latency, self.statements,
+                        self.statement_seconds, self.statements_per_request,
+                        self.render_seconds, self.template_latency,
+                        self.background_statements)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        # Signal receivers are held weakly: connect bound methods of this
+        # module-level object, not lambdas
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    # ------------------------------------------------------------------
+    # Request lifecycle (state lives on flask.g)
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_statements = 0
+        g.metrics_statement_seconds = 0.0
+        g.metrics_render_seconds = 0.0
+        g.metrics_render_started = []
+
+    def _after_request(self, response):
+        self._record(response.status_code)
+        return response
+
+    def _teardown_request(self, exc):
+        # after_request does not run when the view raised
+        if exc is not None:
+            self._record(500)
+
+    def _record(self, status):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or 'unmatched'
+        method = request.method
+
+        self.requests.inc((endpoint, method, str(status)))
+        self.latency.observe(elapsed, (endpoint, method))
+        self.statements.inc((endpoint, ), g.metrics_statements)
+        self.statement_seconds.inc((endpoint, ), g.metrics_statement_seconds)
+        self.statements_per_request.observe(g.metrics_statements,
+                                            (endpoint, ))
+        self.render_seconds.inc((endpoint, ), g.metrics_render_seconds)
+
+    def _before_render(self, sender, template, context, **extra):
+        if 'metrics_render_started' in g:
+            g.metrics_render_started.append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        if not g.get('metrics_render_started'):
+            return
+        elapsed = time.perf_counter() - g.metrics_render_started.pop()
+        g.metrics_render_seconds += elapsed
+        self.template_latency.observe(elapsed,
+                                      (template.name or '<string>', ))
+
+    # ------------------------------------------------------------------
+    # SQL statements
+
+    def statement_executed(self, elapsed):
+        if has_request_context() and 'metrics_started' in g:
+            g.metrics_statements += 1
+            g.metrics_statement_seconds += elapsed
+        else:
+            self.background_statements.inc()
+
+
+request_metrics = RequestMetrics()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info.setdefault('metrics_query_started', []).append(
+        time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    started = conn.info['metrics_query_started'].pop()
+    request_metrics.statement_executed(time.perf_counter() - started)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _statement_failed(context):
+    # after_cursor_execute is skipped for a failed statement
+    connection = context.connection
+    started = connection.info.get('metrics_query_started') if (
+        connection is not None) else None
+    if started:
+        started.pop()
@@ -0,0 +1,260 @@
+"""baseline schema
+
+The tables as db.create_all() built them before migrations were added, so
+`flask db upgrade` can start from an empty database. Databases created with
+db.create_all() already have them: run `flask db stamp 1d07b3e5a9c2` once,
+then `flask db upgrade`.
+
+Revision ID: 1d07b3e5a9c2
+Revises:
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d07b3e5a9c2'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('case_status_counts',
+                    sa.Column('status', sa.String(length=20),
+                              nullable=False),
+                    sa.Column('count', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('status'))
+    op.create_table('option_lists',
+                    sa.Column('id', sa.String(), nullable=False),
+                    sa.Column('name', sa.Text(), nullable=False),
+                    sa.Column('list_data', sa.Text(), nullable=True),
+                    sa.Column('version', sa.Text(), nullable=True),
+                    sa.Column('supercedes', sa.Text(), nullable=True),
+                    sa.Column('author', sa.String(), nullable=False),
+                    sa.Column('created_on', sa.DateTime(), nullable=True),
+                    sa.Column('updated_on', sa.DateTime(), nullable=True),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_table('question_types',
+                    sa.Column('question_type_id', sa.String(),
+                              nullable=False),
+                    sa.Column('type', sa.String(), nullable=False),
+                    sa.Column('is_active', sa.Boolean(), nullable=True),
+                    sa.Column('has_regex', sa.Boolean(), nullable=True),
+                    sa.Column('regex_str', sa.String(), nullable=True),
+                    sa.Column('has_options', sa.Boolean(), nullable=True),
+                    sa.Column('options_str', sa.String(), nullable=True),
+                    sa.Column('has_supplemental', sa.Boolean(),
+                              nullable=True),
+                    sa.Column('supplemental_str', sa.String(),
+                              nullable=True),
+                    sa.Column('created_on', sa.DateTime(), nullable=True),
+                    sa.Column('updated_on', sa.DateTime(), nullable=True),
+                    sa.Column('author', sa.String(), nullable=True),
+                    sa.PrimaryKeyConstraint('question_type_id'),
+                    sa.UniqueConstraint('type'))
+    op.create_table('role',
+                    sa.Column('role_id', sa.String(), nullable=False),
+                    sa.Column('role_name', sa.String(length=100),
+                              nullable=False),
+                    sa.Column('description', sa.Text(), nullable=True),
+                    sa.Column('created_on', sa.DateTime(), nullable=False),
+                    sa.Column('updated_on', sa.DateTime(), nullable=True),
+                    sa.Column('is_active', sa.Boolean(), nullable=True),
+                    sa.PrimaryKeyConstraint('role_id'))
+    # Ids are backup watermarks and must never be reused
+    op.create_table('row_changes',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('table_name', sa.String(length=50),
+                              nullable=False),
+                    sa.Column('row_id', sa.String(), nullable=False),
+                    sa.Column('op', sa.String(length=10), nullable=False),
+                    sa.Column('changed_on',
+                              sa.DateTime(),
+                              server_default=sa.text('(CURRENT_TIMESTAMP)'),
+                              nullable=True),
+                    sa.PrimaryKeyConstraint('id'),
+                    sqlite_autoincrement=True)
+    op.create_table('screenbuilders',
+                    sa.Column('sb_id', sa.String(), nullable=False),
+                    sa.Column('name', sa.String(length=100), nullable=False),
+                    sa.Column('question_ids', sa.String(), nullable=False),
+                    sa.Column('created_on', sa.DateTime(), nullable=True),
+                    sa.Column('modified_on', sa.DateTime(), nullable=True),
+                    sa.Column('author', sa.String(length=100),
+                              nullable=False),
+                    sa.PrimaryKeyConstraint('sb_id'))
+    op.create_table('team',
+                    sa.Column('team_id', sa.String(), nullable=False),
+                    sa.Column('team_name', sa.String(length=100),
+                              nullable=False),
+                    sa.Column('description', sa.Text(), nullable=True),
+                    sa.Column('contact', sa.String(length=100),
+                              nullable=True),
+                    sa.Column('created_on', sa.DateTime(), nullable=True),
+                    sa.Column('updated_on', sa.DateTime(), nullable=True),
+                    sa.Column('is_active', sa.Boolean(), nullable=True),
+                    sa.PrimaryKeyConstraint('team_id'))
+    op.create_table('user',
+                    sa.Column('user_id', sa.String(), nullable=False),
+                    sa.Column('username', sa.String(length=100),
+                              nullable=False),
+                    sa.Column('email', sa.String(length=100),
+                              nullable=False),
+                    sa.Column('password_hash', sa.String(length=128),
+                              nullable=False),
+                    sa.Column('is_active', sa.Boolean(), nullable=True),
+                    sa.Column('created_on', sa.DateTime(), nullable=True),
+                    sa.Column('updated_on', sa.DateTime(), nullable=True),
+                    sa.PrimaryKeyConstraint('user_id'),
+                    sa.UniqueConstraint('email'))
+    op.create_table('workflow_templates',
+                    sa.Column('id', sa.String(), nullable=False),
+                    sa.Column('title', sa.String(length=255),
+                              nullable=False),
+                    sa.Column('role_ids', sa.String(), nullable=False),
+                    sa.Column('question_ids', sa.String(), nullable=False),
+                    sa.Column('created_on', sa.DateTime(), nullable=True),
+                    sa.Column('updated_on', sa.DateTime(), nullable=True),
+                    sa.Column('author', sa.String(), nullable=False),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_table('approval_stages',
+                    sa.Column('stage_id', sa.String(), nullable=False),
+                    sa.Column('stage_name', sa.String(length=100),
+                              nullable=False),
+                    sa.Column('next_stage_name', sa.String(length=100),
+                              nullable=True),
+                    sa.Column('last_stage_name', sa.String(length=100),
+                              nullable=True),
+                    sa.Column('created_on', sa.DateTime(), nullable=True),
+                    sa.Column('modified_on', sa.DateTime(), nullable=True),
+                    sa.Column('author', sa.String(length=100),
+                              nullable=False),
+                    sa.Column('modified_by', sa.String(length=100),
+                              nullable=True),
+                    sa.Column('is_first', sa.Boolean(), nullable=True),
+                    sa.Column('is_last', sa.Boolean(), nullable=True),
+                    sa.Column('order', sa.Integer(), nullable=False),
+                    sa.Column('conditions', sa.String(), nullable=True),
+                    sa.Column('workflow_template_id', sa.String(),
+                              nullable=True),
+                    sa.Column('approve_role_id', sa.String(),
+                              nullable=True),
+                    sa.Column('deny_role_id', sa.String(), nullable=True),
+                    sa.ForeignKeyConstraint(['workflow_template_id'],
+                                            ['workflow_templates.id']),
+                    sa.ForeignKeyConstraint(['approve_role_id'],
+                                            ['role.role_id']),
+                    sa.ForeignKeyConstraint(['deny_role_id'],
+                                            ['role.role_id']),
+                    sa.PrimaryKeyConstraint('stage_id'))
+    op.create_table('internal_messages',
+                    sa.Column('id', sa.String(), nullable=False),
+                    sa.Column('to_user_id', sa.String(), nullable=False),
+                    sa.Column('subject', sa.String(length=200),
+                              nullable=False),
+                    sa.Column('content', sa.Text(), nullable=False),
+                    sa.Column('is_read', sa.Boolean(), nullable=True),
+                    sa.Column('created_on', sa.DateTime(), nullable=True),
+                    sa.ForeignKeyConstraint(['to_user_id'],
+                                            ['user.user_id']),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_internal_messages_to_user_id_is_read_created_on',
+                    'internal_messages',
+                    ['to_user_id', 'is_read', 'created_on'])
+    op.create_table('questions',
+                    sa.Column('question_id', sa.String(), nullable=False),
+                    sa.Column('question_text', sa.String(), nullable=False),
+                    sa.Column('question_help', sa.String(), nullable=True),
+                    sa.Column('question_type_id', sa.String(),
+                              nullable=False),
+                    sa.Column('created_on', sa.DateTime(), nullable=True),
+                    sa.Column('updated_on', sa.DateTime(), nullable=True),
+                    sa.Column('author', sa.String(), nullable=True),
+                    sa.ForeignKeyConstraint(
+                        ['question_type_id'],
+                        ['question_types.question_type_id']),
+                    sa.PrimaryKeyConstraint('question_id'))
+    op.create_table('user_roles',
+                    sa.Column('user_id', sa.String(), nullable=False),
+                    sa.Column('role_id', sa.String(), nullable=False),
+                    sa.ForeignKeyConstraint(['user_id'], ['user.user_id']),
+                    sa.ForeignKeyConstraint(['role_id'], ['role.role_id']),
+                    sa.PrimaryKeyConstraint('user_id', 'role_id'))
+    op.create_table('cases',
+                    sa.Column('id', sa.String(), nullable=False),
+                    sa.Column('case_number', sa.String(), nullable=False),
+                    sa.Column('workflow_id', sa.String(), nullable=False),
+                    sa.Column('current_role_id', sa.String(),
+                              nullable=False),
+                    sa.Column('current_stage_id', sa.String(),
+                              nullable=True),
+                    sa.Column('created_on', sa.DateTime(), nullable=True),
+                    sa.Column('updated_on', sa.DateTime(), nullable=True),
+                    sa.Column('modified_by', sa.String(length=100),
+                              nullable=True),
+                    sa.Column('user_id', sa.String(), nullable=True),
+                    sa.Column('author_username', sa.String(),
+                              nullable=False),
+                    sa.Column('status', sa.String(length=20), nullable=True),
+                    sa.ForeignKeyConstraint(['workflow_id'],
+                                            ['workflow_templates.id']),
+                    sa.ForeignKeyConstraint(['current_stage_id'],
+                                            ['approval_stages.stage_id']),
+                    sa.ForeignKeyConstraint(['user_id'], ['user.user_id']),
+                    sa.PrimaryKeyConstraint('id'),
+                    sa.UniqueConstraint('case_number'))
+    op.create_index('ix_cases_updated_on_id', 'cases', ['updated_on', 'id'])
+    op.create_table('answers',
+                    sa.Column('id', sa.String(), nullable=False),
+                    sa.Column('case_id', sa.String(), nullable=True),
+                    sa.Column('case_number', sa.String(), nullable=True),
+                    sa.Column('workflow_id', sa.String(), nullable=False),
+                    sa.Column('question_id', sa.String(), nullable=False),
+                    sa.Column('user_id', sa.String(), nullable=True),
+                    sa.Column('answer_text', sa.Text(), nullable=False),
+                    sa.Column('created_on', sa.DateTime(), nullable=True),
+                    sa.ForeignKeyConstraint(['case_id'], ['cases.id']),
+                    sa.ForeignKeyConstraint(['workflow_id'],
+                                            ['workflow_templates.id']),
+                    sa.ForeignKeyConstraint(['question_id'],
+                                            ['questions.question_id']),
+                    sa.ForeignKeyConstraint(['user_id'], ['user.user_id']),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_table('comments',
+                    sa.Column('comment_id', sa.String(), nullable=False),
+                    sa.Column('content', sa.Text(), nullable=False),
+                    sa.Column('user_id', sa.String(), nullable=False),
+                    sa.Column('replying_to_id', sa.String(), nullable=True),
+                    sa.Column('created_on', sa.DateTime(), nullable=True),
+                    sa.Column('question_id', sa.String(), nullable=True),
+                    sa.Column('case_id', sa.String(), nullable=False),
+                    sa.ForeignKeyConstraint(['replying_to_id'],
+                                            ['comments.comment_id']),
+                    sa.ForeignKeyConstraint(['question_id'],
+                                            ['questions.question_id']),
+                    sa.ForeignKeyConstraint(['case_id'], ['cases.id']),
+                    sa.PrimaryKeyConstraint('comment_id'))
+    op.create_table('events',
+                    sa.Column('id', sa.String(), nullable=False),
+                    sa.Column('case_id', sa.String(), nullable=False),
+                    sa.Column('event_type', sa.String(length=50),
+                              nullable=False),
+                    sa.Column('old_value', sa.String(length=100),
+                              nullable=True),
+                    sa.Column('new_value', sa.String(length=100),
+                              nullable=True),
+                    sa.Column('created_on', sa.DateTime(), nullable=True),
+                    sa.ForeignKeyConstraint(['case_id'], ['cases.id']),
+                    sa.PrimaryKeyConstraint('id'))
+
+
+def downgrade():
+    for table in ('events', 'comments', 'answers', 'cases', 'user_roles',
+                  'questions', 'internal_messages', 'approval_stages',
+                  'workflow_templates', 'user', 'team', 'screenbuilders',
+                  'row_changes', 'role', 'question_types', 'option_lists',
+                  'case_status_counts'):
+        op.drop_table(table)
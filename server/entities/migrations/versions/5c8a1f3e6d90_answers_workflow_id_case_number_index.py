@@ -0,0 +1,33 @@
+"""answers(workflow_id, case_number) index
+
+load_case_answers reads every answer of a case by workflow_id and
+case_number; the (workflow_id, question_id, case_number) index only serves
+its workflow_id prefix.
+
+Revision ID: 5c8a1f3e6d90
+Revises: 8b1e4d0c7a25
+Create Date: 2026-10-18 14:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c8a1f3e6d90'
+down_revision = '8b1e4d0c7a25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_answers_workflow_id_case_number',
+                    'answers', ['workflow_id', 'case_number'],
+                    if_not_exists=True)
+    op.execute('ANALYZE answers')
+
+
+def downgrade():
+    op.drop_index('ix_answers_workflow_id_case_number',
+                  table_name='answers',
+                  if_exists=True)
@@ -0,0 +1,26 @@
+"""answers.case_id index
+
+Revision ID: 8b1e4d0c7a25
+Revises: 3f9c2a7d1b64
+Create Date: 2026-10-18 13:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1e4d0c7a25'
+down_revision = '3f9c2a7d1b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_answers_case_id',
+                    'answers', ['case_id'],
+                    if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_answers_case_id', table_name='answers', if_exists=True)
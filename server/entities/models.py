@@ -9,6 +9,10 @@ db = SQLAlchemy()
 
 class InternalMessage(db.Model):
     __tablename__ = 'internal_messages'
+    __table_args__ = (
+        # Unread notifications of a user, newest first
+        db.Index('ix_internal_messages_to_user_id_is_read_created_on',
+                 'to_user_id', 'is_read', 'created_on'), )
 
     id = db.Column(db.String,
                    primary_key=True,
@@ -70,6 +74,10 @@ user_roles = db.Table(
 
 
 class User(db.Model):
+    __table_args__ = (
+        # Login looks users up by username
+        db.Index('ix_user_username', 'username'), )
+
     user_id = db.Column(db.String,
                         primary_key=True,
                         default=lambda: str(uuid.uuid4())[:8])
@@ -167,6 +175,8 @@ class Question(db.Model):
 
 class Comment(db.Model):
     __tablename__ = 'comments'
+    __table_args__ = (db.Index('ix_comments_case_id', 'case_id'), )
+
     comment_id = db.Column(db.String,
                            primary_key=True,
                            default=lambda: str(uuid.uuid4())[:8])
@@ -244,6 +254,16 @@ def create_case(workflow_id, author):
 
 class Answer(db.Model):
     __tablename__ = 'answers'
+    __table_args__ = (
+        # Answer of one question in one case
+        db.Index('ix_answers_workflow_id_question_id_case_number',
+                 'workflow_id', 'question_id', 'case_number'),
+        # Every answer of a case (load_case_answers)
+        db.Index('ix_answers_workflow_id_case_number', 'workflow_id',
+                 'case_number'),
+        # Answers of a case (API answer counts and case ETags, exports)
+        db.Index('ix_answers_case_id', 'case_id'),
+    )
 
     id = db.Column(db.String,
                    primary_key=True,
@@ -279,6 +299,14 @@ class Answer(db.Model):
 
 class Case(db.Model):
     __tablename__ = 'cases'
+    __table_args__ = (
+        # Keyset pagination of the case inbox (see case_inbox.list_cases)
+        db.Index('ix_cases_updated_on_id', 'updated_on', 'id'),
+        # Inbox and dashboard filters
+        db.Index('ix_cases_status', 'status'),
+        db.Index('ix_cases_user_id', 'user_id'),
+        db.Index('ix_cases_current_stage_id', 'current_stage_id'),
+    )
 
     id = db.Column(db.String,
                    primary_key=True,
@@ -374,6 +402,13 @@ class ScreenBuilder(db.Model):
 
 class ApprovalStage(db.Model):
     __tablename__ = 'approval_stages'
+    __table_args__ = (
+        # First stage and next stage (by order) of a workflow template
+        db.Index('ix_approval_stages_workflow_template_id_is_first',
+                 'workflow_template_id', 'is_first'),
+        db.Index('ix_approval_stages_workflow_template_id_order',
+                 'workflow_template_id', 'order'),
+    )
 
     stage_id = db.Column(db.String,
                          primary_key=True,
@@ -433,6 +468,7 @@ class OptionList(db.Model):
 
 class Event(db.Model):
     __tablename__ = 'events'
+    __table_args__ = (db.Index('ix_events_case_id', 'case_id'), )
 
     id = db.Column(db.String,
                    primary_key=True,
@@ -445,3 +481,35 @@ class Event(db.Model):
     created_on = db.Column(db.DateTime, default=datetime.utcnow)
 
     case = db.relationship('Case', backref='events')
+
+
+class CaseStatusCount(db.Model):
+    __tablename__ = 'case_status_counts'
+
+    # Materialized number of cases per status, kept in step with `cases`
+    # by case_counters when CASE_STATUS_COUNTERS is enabled
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CaseStatusCount {self.status}: {self.count}>'
+
+
+class RowChange(db.Model):
+    __tablename__ = 'row_changes'
+    # Ids are watermarks: SQLite must never hand out an id again once the
+    # log has been pruned
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    # Change log written by SQL triggers (see incremental_backup): deletes
+    # of every backed-up table, and updates of tables that have no
+    # updated_on column. Incremental backups read it past a watermark id.
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.String, nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # 'delete' or 'update'
+    changed_on = db.Column(db.DateTime,
+                           server_default=db.func.current_timestamp())
+
+    def __repr__(self):
+        return f'<RowChange {self.op} {self.table_name} {self.row_id}>'
@@ -0,0 +1,215 @@
+import json
+import queue
+import threading
+import time
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models import InternalMessage
+
+# Seconds a cached unread count is trusted before it is counted again
+UNREAD_COUNT_TTL = 60
+
+
+class NotificationHub:
+    """
+    In-process delivery of new InternalMessage rows and unread counts.
+
+    - Unread counts are cached per user: counted with the
+      (to_user_id, is_read, created_on) index, then adjusted when messages
+      are inserted, deleted or marked read.
+    - Open /notifications/stream connections subscribe per user and get
+      every message committed for that user pushed to them.
+
+    Only messages written through this process's SQLAlchemy session adjust
+    the cache or are pushed. Changes made by other processes (or by bulk
+    statements) reach the count when it is recounted, at most
+    `unread_ttl` seconds later.
+    """
+
+    def __init__(self, subscriber_queue_size=100, unread_ttl=UNREAD_COUNT_TTL):
+        self.subscriber_queue_size = subscriber_queue_size
+        self.unread_ttl = unread_ttl
+        # user_id -> (count, monotonic time it was counted)
+        self._unread = {}
+        # user_id -> number of adjustments so far, to spot a commit that
+        # lands while the user's messages are being counted
+        self._changes = {}
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    # Unread counts
+
+    def _count(self, user_id):
+        return InternalMessage.query.filter_by(to_user_id=user_id,
+                                               is_read=False).count()
+
+    def _cached_unread(self, user_id):
+        entry = self._unread.get(user_id)
+        if entry is None or time.monotonic() - entry[1] > self.unread_ttl:
+            return None
+        return entry[0]
+
+    def unread_count(self, user_id):
+        count = self._cached_unread(user_id)
+        if count is not None:
+            return count
+        with self._lock:
+            changes = self._changes.get(user_id, 0)
+        counted_at = time.monotonic()
+        count = self._count(user_id)
+        with self._lock:
+            # A message committed during the count may or may not be in
+            # it; leave the cache empty and count again next time
+            if self._changes.get(user_id, 0) == changes:
+                self._unread[user_id] = (count, counted_at)
+        return count
+
+    def adjust_unread(self, user_id, delta):
+        with self._lock:
+            self._changes[user_id] = self._changes.get(user_id, 0) + 1
+            # Users that are not cached are counted on their next read
+            entry = self._unread.get(user_id)
+            if entry is not None:
+                self._unread[user_id] = (max(0, entry[0] + delta), entry[1])
+
+    def reset_unread(self, user_id):
+        with self._lock:
+            self._changes[user_id] = self._changes.get(user_id, 0) + 1
+            self._unread[user_id] = (0, time.monotonic())
+
+    # Push delivery
+
+    def subscribe(self, user_id):
+        subscriber = queue.Queue(maxsize=self.subscriber_queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(payload)
+            except queue.Full:
+                # Slow client; it will catch up from the unread count
+                pass
+
+    def message_payload(self, message):
+        return {
+            'id': message['id'],
+            'subject': message['subject'],
+            'created_on': message['created_on'].isoformat()
+            if message['created_on'] else None,
+            'unread_count': self._cached_unread(message['to_user_id']),
+        }
+
+
+notification_hub = NotificationHub()
+
+
+def format_sse(payload, event_name='message'):
+    return f"event: {event_name}\ndata: {json.dumps(payload)}\n\n"
+
+
+def stream_events(user_id, keepalive_seconds=15):
+    """
+    Server-Sent Events for one user: the current unread count first, then
+    every new message as it is committed. Must be subscribed before the
+    response starts so nothing committed in between is missed.
+    """
+    subscriber = notification_hub.subscribe(user_id)
+    unread_count = notification_hub.unread_count(user_id)
+
+    def events():
+        try:
+            yield format_sse({'unread_count': unread_count}, 'unread')
+            while True:
+                try:
+                    payload = subscriber.get(timeout=keepalive_seconds)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing the connection
+                    yield ': keep-alive\n\n'
+                    continue
+                yield format_sse(payload)
+        finally:
+            notification_hub.unsubscribe(user_id, subscriber)
+
+    return events()
+
+
+# ===================================================
+# Session hooks: snapshot new, deleted and newly read messages when they are
+# flushed and apply them to the cache (and push them) only once they are
+# committed.
+
+
+def _message_snapshot(message):
+    return {
+        'id': message.id,
+        'to_user_id': message.to_user_id,
+        'subject': message.subject,
+        'is_read': message.is_read,
+        'created_on': message.created_on,
+    }
+
+
+@event.listens_for(InternalMessage.is_read, 'set', active_history=True)
+def _load_previous_is_read(message, value, oldvalue, initiator):
+    # active_history loads the old is_read of an expired message before it
+    # is overwritten, so a repeated "mark read" is not counted twice
+    pass
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_message_deletes(session, flush_context, instances):
+    # Before the flush: a deleted, expired row can still be loaded here
+    changes = session.info.setdefault('internal_message_changes', [])
+    for message in session.deleted:
+        if isinstance(message,
+                      InternalMessage) and message.is_read is False:
+            changes.append(('deleted', _message_snapshot(message)))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_message_changes(session, flush_context):
+    changes = session.info.setdefault('internal_message_changes', [])
+    for message in session.new:
+        if isinstance(message, InternalMessage):
+            changes.append(('new', _message_snapshot(message)))
+    for message in session.dirty:
+        if isinstance(message, InternalMessage):
+            history = inspect(message).attrs.is_read.history
+            if history.added and history.deleted and bool(
+                    history.added[0]) != bool(history.deleted[0]):
+                changes.append(('read' if history.added[0] else 'unread',
+                                _message_snapshot(message)))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_message_changes(session):
+    for change, message in session.info.pop('internal_message_changes', []):
+        user_id = message['to_user_id']
+        if change == 'new':
+            if not message['is_read']:
+                notification_hub.adjust_unread(user_id, 1)
+            notification_hub.publish(user_id,
+                                     notification_hub.message_payload(message))
+        else:
+            notification_hub.adjust_unread(
+                user_id, 1 if change == 'unread' else -1)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_message_changes(session):
+    session.info.pop('internal_message_changes', None)
@@ -0,0 +1,163 @@
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import timezone
+
+from flask import Response, request, session
+from sqlalchemy import String, cast, func, literal, select
+
+from models import db
+
+MAX_CACHED_PAGES = 256
+
+
+def _change_column(table):
+    for name in ('updated_on', 'modified_on'):
+        if name in table.c:
+            return table.c[name]
+    return None
+
+
+def _keys_column(table):
+    # Every primary key of the table, sorted and joined: swapping one
+    # association row for another keeps the count but changes this
+    keys = [cast(column, String) for column in table.primary_key.columns]
+    ordered = select(*keys).order_by(*keys).subquery()
+    joined = ordered.c[0]
+    for column in list(ordered.c)[1:]:
+        joined = joined + '|' + column
+    return select(func.group_concat(joined, ',')).scalar_subquery()
+
+
+def table_fingerprints(*tables):
+    """
+    (row count, latest updated_on/modified_on, key digest) of each table, in
+    one query. A create, edit or delete changes at least one of them.
+
+    Args:
+    - tables: Models or Table objects. Tables without a timestamp column
+      (association tables such as user_roles) get a digest of their
+      primary keys instead; the others get None.
+
+    Returns:
+    - list: One (count, latest, digest) tuple per table; latest may be
+      None.
+    """
+    columns = []
+    for table in tables:
+        table = getattr(table, '__table__', table)
+        columns.append(
+            select(func.count()).select_from(table).scalar_subquery())
+        changed = _change_column(table)
+        if changed is not None:
+            columns += [select(func.max(changed)).scalar_subquery(),
+                        literal(None)]
+        else:
+            columns += [literal(None), _keys_column(table)]
+    row = db.session.execute(select(*columns)).one()
+    return [(row[index], row[index + 1],
+             hashlib.sha1(row[index + 2].encode()).hexdigest()
+             if row[index + 2] is not None else None)
+            for index in range(0, len(row), 3)]
+
+
+class PageCache:
+    """
+    LRU of rendered list pages keyed by (endpoint, viewer, fingerprint).
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_PAGES):
+        self.max_entries = max_entries
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._pages.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._pages[key] = body
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._pages),
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+        }
+
+
+page_cache = PageCache()
+
+
+def cached_list_page(*tables):
+    """
+    Serve a list page from its tables' fingerprints: a 304 when the
+    client's copy is current, else the cached body, else render it once.
+
+    Responses carry an ETag (endpoint + viewer + fingerprint) and a
+    Last-Modified of the newest row. Requests with pending flash messages
+    are always rendered, so the messages are shown and consumed.
+    """
+
+    def decorator(view):
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            fingerprints = table_fingerprints(*tables)
+            viewer = session.get('user_id') or ''
+            etag = hashlib.sha1(
+                repr((request.endpoint, request.query_string, viewer,
+                      fingerprints)).encode()).hexdigest()
+            stamps = [latest for _, latest, _ in fingerprints if latest]
+            last_modified = max(stamps).replace(
+                tzinfo=timezone.utc) if stamps else None
+
+            # Only the ETag decides a 304: deleting an older row leaves
+            # Last-Modified unchanged, so If-Modified-Since alone could
+            # keep serving a page that still lists it
+            if request.if_none_match.contains(etag):
+                page_cache.not_modified += 1
+                response = Response(status=304)
+            else:
+                body = page_cache.get(etag)
+                if body is None:
+                    result = view(*args, **kwargs)
+                    # Only cache plain rendered pages, not errors/redirects
+                    if not isinstance(result, str):
+                        return result
+                    body = result
+                    page_cache.put(etag, body)
+                response = Response(body, mimetype='text/html')
+
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,213 @@
+import logging
+import os
+import re
+import threading
+import traceback
+from collections import deque
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# N+1 detection: every SQL statement of a request is reduced to its shape
+# (literals and IN lists collapsed); a shape repeated more than
+# N_PLUS_ONE_THRESHOLD times in one request is reported together with the
+# application stack that issued it, i.e. the loop doing the lazy loads.
+#
+# Config:
+# - N_PLUS_ONE_DETECTION: on/off (default: on in debug mode)
+# - N_PLUS_ONE_THRESHOLD: repeats of one shape allowed per request
+# - N_PLUS_ONE_MODE: 'log' (warn) or 'raise' (tests: the request fails with
+#   QueryProblem, so the test calling the route fails)
+#
+# Views can declare a total statement budget with @query_budget(n); a
+# request that exceeds it is reported (or raised) the same way.
+
+DEFAULT_THRESHOLD = 5
+MAX_REPORTS = 100
+
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+# Frames from these paths are library internals, not the loop to blame
+_LIBRARY_PATHS = ('site-packages', 'dist-packages', os.sep + 'lib' + os.sep +
+                  'python', os.path.abspath(__file__))
+
+
+def normalize_sql(statement):
+    """
+    Shape of a statement: whitespace, string/number literals and the length
+    of IN (...) lists do not matter.
+    """
+    shape = _STRING.sub('?', statement)
+    shape = _NUMBER.sub('?', shape)
+    shape = _IN_LIST.sub('(?...)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+def _application_stack():
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if not any(path in frame.filename for path in _LIBRARY_PATHS)
+    ]
+    return ''.join(traceback.format_list(frames))
+
+
+class QueryProblem(Exception):
+    """
+    Raised at the end of a request in 'raise' mode.
+    """
+
+    def __init__(self, reports):
+        self.reports = reports
+        super().__init__('\n\n'.join(report.describe() for report in reports))
+
+
+class QueryReport:
+
+    def __init__(self, kind, endpoint, statement, count, limit, stack):
+        self.kind = kind  # 'repeated' or 'budget'
+        self.endpoint = endpoint
+        self.statement = statement
+        self.count = count
+        self.limit = limit
+        self.stack = stack
+
+    def describe(self):
+        if self.kind == 'budget':
+            header = (f'{self.endpoint}: {self.count} SQL statements, '
+                      f'budget is {self.limit}')
+        else:
+            header = (f'{self.endpoint}: N+1 query, same statement '
+                      f'{self.count} times (threshold {self.limit}):\n'
+                      f'    {self.statement}')
+        if self.stack:
+            header += f'\n  Issued from:\n{self.stack}'
+        return header
+
+
+class _RequestQueries:
+
+    def __init__(self):
+        self.total = 0
+        # shape -> [count, statement, stack of the first repeat]
+        self.shapes = {}
+
+    def add(self, statement):
+        self.total += 1
+        shape = normalize_sql(statement)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            self.shapes[shape] = [1, statement, None]
+            return
+        entry[0] += 1
+        if entry[2] is None:
+            # The second run of a shape is inside the loop; its stack is
+            # the one worth reporting
+            entry[2] = _application_stack()
+
+
+class QueryDetector:
+
+    def __init__(self):
+        self.reports = deque(maxlen=MAX_REPORTS)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('N_PLUS_ONE_DETECTION', app.debug)
+        app.config.setdefault('N_PLUS_ONE_THRESHOLD', DEFAULT_THRESHOLD)
+        app.config.setdefault('N_PLUS_ONE_MODE', 'log')
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        if current_app.config['N_PLUS_ONE_DETECTION']:
+            g.query_detector = _RequestQueries()
+
+    def _after_request(self, response):
+        queries = g.pop('query_detector', None)
+        if queries is None:
+            return response
+
+        endpoint = request.endpoint or request.path
+        threshold = current_app.config['N_PLUS_ONE_THRESHOLD']
+        reports = [
+            QueryReport('repeated', endpoint, statement, count, threshold,
+                        stack)
+            for count, statement, stack in queries.shapes.values()
+            if count > threshold
+        ]
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None)
+        if budget is not None and queries.total > budget:
+            reports.append(
+                QueryReport('budget', endpoint, None, queries.total, budget,
+                            None))
+
+        if reports:
+            self._report(reports)
+        return response
+
+    def _report(self, reports):
+        with self._lock:
+            self.reports.extend(reports)
+        if current_app.config['N_PLUS_ONE_MODE'] == 'raise':
+            raise QueryProblem(reports)
+        for report in reports:
+            logger.warning(report.describe())
+
+    def statement_executed(self, statement):
+        if has_request_context():
+            queries = g.get('query_detector')
+            if queries is not None:
+                queries.add(statement)
+
+
+query_detector = QueryDetector()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _record_statement(conn, cursor, statement, parameters, context,
+                      executemany):
+    query_detector.statement_executed(statement)
+
+
+def query_budget(max_statements):
+    """
+    Declare the most SQL statements a view may run per request.
+    """
+
+    def decorator(view):
+        view.query_budget = max_statements
+        return view
+
+    return decorator
+
+
+@contextmanager
+def count_queries():
+    """
+    Collect the statements this thread runs inside the block (in a request
+    or not), for assertions in tests:
+
+        with count_queries() as statements:
+            client.get('/cases/1/view')
+        assert len(statements) <= 6, statements
+    """
+    statements = []
+    owner = threading.get_ident()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == owner:
+            statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
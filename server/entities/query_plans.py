@@ -0,0 +1,101 @@
+from sqlalchemy import Column, func, select
+from sqlalchemy.sql import operators, visitors
+
+from answers import case_answers_statement
+from models import (Answer, ApprovalStage, Case, Comment, Event,
+                    InternalMessage, User, db)
+
+# The filters the app runs on every request. Each must be answered from an
+# index covering all of its equality filters; `flask check-query-plans` and
+# tests/test_query_plans.py fail otherwise.
+HOT_QUERIES = {
+    'case answers':
+    case_answers_statement('w', 'c'),
+    'case answer count':
+    select(func.count()).where(Answer.case_id == 'c'),
+    'cases by status':
+    select(Case).where(Case.status == 'active'),
+    'cases by assignee':
+    select(Case).where(Case.assigned_user_id == 'u'),
+    'cases by stage':
+    select(Case).where(Case.current_stage_id == 's'),
+    'case events':
+    select(Event).where(Event.case_id == 'c').order_by(Event.created_on),
+    'case comments':
+    select(Comment).where(Comment.case_id == 'c'),
+    'unread notifications':
+    select(InternalMessage).where(
+        InternalMessage.to_user_id == 'u',
+        InternalMessage.is_read.is_(False)).order_by(
+            InternalMessage.created_on.desc()),
+    'first stage':
+    select(ApprovalStage).where(ApprovalStage.workflow_template_id == 'w',
+                                ApprovalStage.is_first.is_(True)),
+    'next stage':
+    select(ApprovalStage).where(ApprovalStage.workflow_template_id == 'w',
+                                ApprovalStage.order > 1).order_by(
+                                    ApprovalStage.order).limit(1),
+    'login':
+    select(User).where(User.username == 'name'),
+}
+
+
+def explain(connection, statement):
+    """
+    SQLite's EXPLAIN QUERY PLAN for a statement, as a list of detail lines.
+    """
+    sql = statement.compile(dialect=connection.dialect,
+                            compile_kwargs={'literal_binds': True})
+    return [
+        row[-1]
+        for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')
+    ]
+
+
+def is_full_scan(detail):
+    # "SCAN cases" reads the whole table; "SEARCH cases USING INDEX ..." and
+    # "SCAN ... USING INDEX" (ordered index walk) do not
+    return detail.startswith('SCAN ') and 'INDEX' not in detail
+
+
+def equality_filters(statement):
+    """
+    Names of the columns the statement's WHERE clause compares with = or IS.
+    """
+    names = []
+    for element in visitors.iterate(statement.whereclause):
+        if getattr(element, 'operator', None) in (operators.eq,
+                                                  operators.is_) and \
+                isinstance(element.left, Column):
+            names.append(element.left.name)
+    return names
+
+
+def unsearched_filters(statement, plan):
+    # An index that serves only a prefix of the filters still reads every
+    # row matching that prefix: SQLite lists the searched columns as "col=?"
+    return [
+        name for name in equality_filters(statement)
+        if not any(f'{name}=?' in detail for detail in plan)
+    ]
+
+
+def check_query_plans(queries=None):
+    """
+    Explain every hot query.
+
+    Returns:
+    - dict: {name: (plan lines, [problems])}; a problem is a full-scan line
+      or an equality filter no index search covers
+    """
+    results = {}
+    with db.engine.connect() as connection:
+        for name, statement in (queries or HOT_QUERIES).items():
+            plan = explain(connection, statement)
+            problems = [detail for detail in plan if is_full_scan(detail)]
+            problems += [
+                f'{column} is not searched by an index'
+                for column in unsearched_filters(statement, plan)
+            ]
+            results[name] = (plan, problems)
+    return results
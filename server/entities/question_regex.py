@@ -0,0 +1,82 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Patterns come from admin-editable question types, so the registry is a
+# bounded LRU rather than growing with every regex ever saved
+MAX_PATTERNS = 256
+
+# regex_str -> compiled pattern, or None if the string does not compile.
+# Shared by every QuestionType that uses the same pattern.
+_patterns = OrderedDict()
+_lock = threading.Lock()
+
+
+def _store(regex_str, pattern):
+    with _lock:
+        _patterns[regex_str] = pattern
+        _patterns.move_to_end(regex_str)
+        while len(_patterns) > MAX_PATTERNS:
+            _patterns.popitem(last=False)
+
+
+def compile_pattern(regex_str):
+    """
+    Compile regex_str and store it in the registry.
+
+    Used when a QuestionType is saved. Raises re.error if the pattern does
+    not compile.
+    """
+    pattern = re.compile(regex_str)
+    _store(regex_str, pattern)
+    return pattern
+
+
+def get_pattern(regex_str):
+    """
+    Return the compiled pattern for regex_str, or None if it is invalid.
+    """
+    with _lock:
+        if regex_str in _patterns:
+            _patterns.move_to_end(regex_str)
+            return _patterns[regex_str]
+
+    try:
+        pattern = re.compile(regex_str)
+    except re.error as e:
+        logger.error('Invalid question type regex %r: %s', regex_str, e)
+        pattern = None
+
+    _store(regex_str, pattern)
+    return pattern
+
+
+def matches(regex_str, value):
+    pattern = get_pattern(regex_str)
+    return pattern is not None and pattern.match(str(value)) is not None
+
+
+def find_invalid_answers(questions, form_data):
+    """
+    Check every regex-validated answer of a submission in one pass.
+
+    Args:
+    - questions (list): Questions with question_type loaded.
+    - form_data (dict): Submitted form data keyed by question_<id>.
+
+    Returns:
+    - list: (question, raw_answer) for every answer that does not match
+      its question type's regex. Empty if the submission is valid.
+    """
+    failures = []
+    for question in questions:
+        question_type = question.question_type
+        if not (question_type.has_regex and question_type.regex_str):
+            continue
+        raw_answer = form_data.get(f'question_{question.question_id}', '')
+        if not matches(question_type.regex_str, raw_answer):
+            failures.append((question, raw_answer))
+    return failures
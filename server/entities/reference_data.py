@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from models import (ApprovalStage, Question, QuestionType, Role,
+                    WorkflowTemplate, db)
+
+# Small, rarely changing tables that every admin form needs for its choices.
+# Each is read whole, once, into an immutable snapshot that is shared by all
+# requests until a create/edit/delete of that table is committed.
+#
+# The cache is per process: a commit invalidates the snapshots of the process
+# that made it. Other workers (and bulk statements, which bypass the ORM
+# events) see the change when their snapshot expires, REFERENCE_DATA_TTL
+# seconds after it was read.
+REFERENCE_DATA_TTL = 30
+REFERENCE_MODELS = {
+    'roles': Role,
+    'question_types': QuestionType,
+    'questions': Question,
+    'workflow_templates': WorkflowTemplate,
+    'approval_stages': ApprovalStage,
+}
+
+# Snapshot rows are plain namedtuples, not attached to any session: columns
+# only (no relationships), plus these resolved references
+_EXTRA_FIELDS = {
+    # question.question_type keeps working on a snapshot row
+    'questions': ('question_type', ),
+}
+
+
+def _row_type(name, model):
+    keys = [attr.key for attr in inspect(model).column_attrs]
+    return namedtuple(model.__name__ + 'Row',
+                      keys + list(_EXTRA_FIELDS.get(name, ())))
+
+
+_ROW_TYPES = {
+    name: _row_type(name, model)
+    for name, model in REFERENCE_MODELS.items()
+}
+
+
+class ReferenceTable:
+    """
+    Immutable snapshot of one reference table: rows in table order and a
+    read-only lookup by primary key.
+    """
+
+    def __init__(self, rows, key):
+        self.key = key
+        self.rows = tuple(rows)
+        self.by_id = MappingProxyType(
+            {getattr(row, key): row
+             for row in self.rows})
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, id):
+        return self.by_id.get(id)
+
+    def choices(self, label, rows=None):
+        """
+        (id, label) pairs for a SelectField / SelectMultipleField.
+        """
+        return [(str(getattr(row, self.key)), getattr(row, label))
+                for row in (self.rows if rows is None else rows)]
+
+
+class ReferenceData:
+    """
+    Process-wide cache of the REFERENCE_MODELS tables.
+    """
+
+    def __init__(self, ttl=REFERENCE_DATA_TTL):
+        self.ttl = ttl
+        # name -> (ReferenceTable, monotonic time it was read)
+        self._tables = {}
+        self._generations = {name: 0 for name in REFERENCE_MODELS}
+        self._lock = threading.Lock()
+
+    @property
+    def roles(self):
+        return self.get('roles')
+
+    @property
+    def question_types(self):
+        return self.get('question_types')
+
+    @property
+    def questions(self):
+        return self.get('questions')
+
+    @property
+    def workflow_templates(self):
+        return self.get('workflow_templates')
+
+    @property
+    def approval_stages(self):
+        return self.get('approval_stages')
+
+    def get(self, name):
+        entry = self._tables.get(name)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            return self._load(name)
+        return entry[0]
+
+    def invalidate(self, *names):
+        with self._lock:
+            for name in names or REFERENCE_MODELS:
+                self._tables.pop(name, None)
+                self._generations[name] += 1
+
+    def _load(self, name):
+        generation = self._generations[name]
+        loaded_at = time.monotonic()
+        model = REFERENCE_MODELS[name]
+        mapper = inspect(model)
+        key = mapper.primary_key[0].key
+        columns = [attr.key for attr in mapper.column_attrs]
+
+        rows = db.session.execute(
+            select(*[getattr(model, column) for column in columns])).all()
+        row_type = _ROW_TYPES[name]
+        if name == 'questions':
+            question_types = self.get('question_types')
+            snapshot = [
+                row_type(*row, question_types.get(row.question_type_id))
+                for row in rows
+            ]
+        else:
+            snapshot = [row_type(*row) for row in rows]
+
+        table = ReferenceTable(snapshot, key)
+
+        # Only publish if the table did not change while it was being read
+        with self._lock:
+            if generation == self._generations[name]:
+                self._tables[name] = (table, loaded_at)
+        return table
+
+
+reference_data = ReferenceData()
+
+# ===================================================
+# Invalidation, as for stage_graph: note which tables a flush wrote and drop
+# their snapshots once the transaction commits.
+
+_DEPENDENTS = {
+    # Question snapshots embed their question type
+    'question_types': ('question_types', 'questions'),
+}
+
+
+def _change_marker(name):
+
+    def mark_changed(mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault('reference_data_changed',
+                                    set()).update(
+                                        _DEPENDENTS.get(name, (name, )))
+
+    return mark_changed
+
+
+for _name, _model in REFERENCE_MODELS.items():
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event_name, _change_marker(_name))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    changed = session.info.pop('reference_data_changed', None)
+    if changed:
+        reference_data.invalidate(*changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('reference_data_changed', None)
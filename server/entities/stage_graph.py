@@ -0,0 +1,176 @@
+import threading
+from collections import namedtuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from models import ApprovalStage
+
+# Plain snapshot of an ApprovalStage row. Safe to share between requests
+# because it is not attached to any session.
+StageNode = namedtuple('StageNode', [
+    'stage_id', 'stage_name', 'next_stage_name', 'last_stage_name', 'order',
+    'is_first', 'is_last', 'workflow_template_id', 'approve_role_id',
+    'deny_role_id'
+])
+
+
+class WorkflowStages:
+    """
+    Ordered approval stages of one workflow template with O(1) transitions.
+    """
+
+    def __init__(self, workflow_template_id, nodes):
+        self.workflow_template_id = workflow_template_id
+        self.nodes = sorted(nodes, key=lambda node: node.order)
+        self._by_id = {node.stage_id: node for node in self.nodes}
+        self._position = {
+            node.stage_id: index
+            for index, node in enumerate(self.nodes)
+        }
+
+        self.first = next((node for node in self.nodes if node.is_first),
+                          self.nodes[0] if self.nodes else None)
+        self.last = next((node for node in self.nodes if node.is_last),
+                         self.nodes[-1] if self.nodes else None)
+
+    def get(self, stage_id):
+        return self._by_id.get(stage_id)
+
+    def next(self, stage_id):
+        position = self._position.get(stage_id)
+        if position is None or position + 1 >= len(self.nodes):
+            return None
+        return self.nodes[position + 1]
+
+    def previous(self, stage_id):
+        position = self._position.get(stage_id)
+        if not position:
+            return None
+        return self.nodes[position - 1]
+
+
+class StageGraph:
+    """
+    In-process index of approval stages keyed by workflow_template_id.
+
+    The whole approval_stages table is read with a single query the first
+    time it is needed and then answered from memory until a stage is
+    created, edited or deleted (see the session hooks below).
+    """
+
+    def __init__(self):
+        self._templates = None
+        self._stage_templates = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def for_template(self, workflow_template_id):
+        templates, _ = self._index()
+        stages = templates.get(workflow_template_id)
+        if stages is None:
+            stages = WorkflowStages(workflow_template_id, [])
+        return stages
+
+    def for_stage(self, stage_id):
+        """
+        Return the WorkflowStages that contains stage_id, or None.
+        """
+        templates, stage_templates = self._index()
+        if stage_id not in stage_templates:
+            return None
+        return templates[stage_templates[stage_id]]
+
+    def get(self, stage_id):
+        stages = self.for_stage(stage_id)
+        return stages.get(stage_id) if stages else None
+
+    def first(self, workflow_template_id):
+        return self.for_template(workflow_template_id).first
+
+    def last(self, workflow_template_id):
+        return self.for_template(workflow_template_id).last
+
+    def next(self, stage_id):
+        stages = self.for_stage(stage_id)
+        return stages.next(stage_id) if stages else None
+
+    def previous(self, stage_id):
+        stages = self.for_stage(stage_id)
+        return stages.previous(stage_id) if stages else None
+
+    def invalidate(self):
+        with self._lock:
+            self._templates = None
+            self._stage_templates = None
+            self._generation += 1
+
+    def _index(self):
+        templates = self._templates
+        stage_templates = self._stage_templates
+        if templates is None or stage_templates is None:
+            templates, stage_templates = self._load()
+        return templates, stage_templates
+
+    def _load(self):
+        generation = self._generation
+        nodes_by_template = {}
+        for row in ApprovalStage.query.all():
+            node = StageNode(stage_id=row.stage_id,
+                             stage_name=row.stage_name,
+                             next_stage_name=row.next_stage_name,
+                             last_stage_name=row.last_stage_name,
+                             order=row.order,
+                             is_first=bool(row.is_first),
+                             is_last=bool(row.is_last),
+                             workflow_template_id=row.workflow_template_id,
+                             approve_role_id=row.approve_role_id,
+                             deny_role_id=row.deny_role_id)
+            nodes_by_template.setdefault(row.workflow_template_id,
+                                         []).append(node)
+
+        templates = {
+            workflow_template_id: WorkflowStages(workflow_template_id, nodes)
+            for workflow_template_id, nodes in nodes_by_template.items()
+        }
+        stage_templates = {
+            node.stage_id: workflow_template_id
+            for workflow_template_id, nodes in nodes_by_template.items()
+            for node in nodes
+        }
+
+        # Only publish the index if no stage changed while it was being read
+        with self._lock:
+            if generation == self._generation:
+                self._templates = templates
+                self._stage_templates = stage_templates
+        return templates, stage_templates
+
+
+stage_graph = StageGraph()
+
+# ===================================================
+# Invalidation: remember that a stage changed while the session is
+# flushing and drop the index once the change is actually committed, so
+# other requests never rebuild it from rows that might still roll back.
+
+
+def _mark_stages_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info['approval_stages_changed'] = True
+
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(ApprovalStage, _event_name, _mark_stages_changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('approval_stages_changed', False):
+        stage_graph.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('approval_stages_changed', None)
@@ -0,0 +1,73 @@
+from sqlalchemy.orm import joinedload
+
+from models import Question, Role
+
+# Stay well below SQLite's limit on bound parameters per statement
+IN_CHUNK_SIZE = 500
+
+
+def split_ids(ids_str):
+    # Comma-separated id columns (role_ids, question_ids) in stored order
+    return [id.strip() for id in (ids_str or '').split(',') if id.strip()]
+
+
+def _fetch_by_ids(query, column, ids):
+    ids = list(ids)
+    rows = []
+    for start in range(0, len(ids), IN_CHUNK_SIZE):
+        rows.extend(
+            query.filter(column.in_(ids[start:start + IN_CHUNK_SIZE])).all())
+    return rows
+
+
+def resolve_templates(templates, roles=True, questions=True):
+    """
+    Populate roles_list and questions_list on every template with one
+    query per model, however many templates there are.
+
+    The ids of all templates are collected first, fetched together, and
+    each template's lists are rebuilt in the order stored in role_ids /
+    question_ids. Questions come with question_type loaded.
+
+    Args:
+    - templates (list): WorkflowTemplate instances.
+    - roles (bool): Resolve role_ids into roles_list.
+    - questions (bool): Resolve question_ids into questions_list.
+
+    Returns:
+    - list: The same templates.
+    """
+    if roles:
+        role_ids = {id for t in templates for id in split_ids(t.role_ids)}
+        roles_by_id = {
+            role.role_id: role
+            for role in _fetch_by_ids(Role.query, Role.role_id, role_ids)
+        }
+        for template in templates:
+            template.roles_list = [
+                roles_by_id[id] for id in split_ids(template.role_ids)
+                if id in roles_by_id
+            ]
+
+    if questions:
+        question_ids = {
+            id
+            for t in templates for id in split_ids(t.question_ids)
+        }
+        questions_by_id = {
+            question.question_id: question
+            for question in _fetch_by_ids(
+                Question.query.options(joinedload(Question.question_type)),
+                Question.question_id, question_ids)
+        }
+        for template in templates:
+            template.questions_list = [
+                questions_by_id[id] for id in split_ids(template.question_ids)
+                if id in questions_by_id
+            ]
+
+    return templates
+
+
+def resolve_template(template, roles=True, questions=True):
+    return resolve_templates([template], roles=roles, questions=questions)[0]
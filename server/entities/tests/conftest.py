@@ -0,0 +1,172 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ENTITIES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    ENTITIES_DIR,
+    os.path.join(ENTITIES_DIR, '..', '..', 'text-specifications')
+]
+
+_fd, DATABASE_PATH = tempfile.mkstemp(suffix='.db')
+os.close(_fd)
+
+# main.py reads these at import time
+os.environ['DATABASE_URL'] = f'sqlite:///{DATABASE_PATH}'
+os.environ['EVENT_PIPELINE_MODE'] = 'sync'
+os.environ['N_PLUS_ONE_DETECTION'] = '1'
+os.environ['LOG_FILE'] = ''
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+
+@pytest.fixture(scope='session')
+def app():
+    from main import app
+
+    # A request that repeats a statement shape or exceeds its view's
+    # @query_budget raises QueryProblem, so the test calling it fails
+    app.config.update(TESTING=True,
+                      WTF_CSRF_ENABLED=False,
+                      N_PLUS_ONE_DETECTION=True,
+                      N_PLUS_ONE_MODE='raise')
+    yield app
+    with app.app_context():
+        from models import db
+        db.engine.dispose()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(DATABASE_PATH + suffix):
+            os.remove(DATABASE_PATH + suffix)
+
+
+@pytest.fixture
+def database(app):
+    """
+    A fresh, empty database file for every test.
+    """
+    from models import db
+    from forms import form_class_cache
+    from page_cache import page_cache
+    from reference_data import reference_data
+    from stage_graph import stage_graph
+
+    with app.app_context():
+        db.engine.dispose()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(DATABASE_PATH + suffix):
+                os.remove(DATABASE_PATH + suffix)
+        db.create_all()
+        reference_data.invalidate()
+        stage_graph.invalidate()
+        page_cache.clear()
+        form_class_cache.clear()
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app, database):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+
+    def login(user_id, username='tester'):
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+            session['username'] = username
+
+    return login
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    """
+    Record render_template() calls of main.py instead of rendering (the
+    Jinja templates are not part of this tree). Each call is appended as
+    (template name, context).
+    """
+    import main
+
+    calls = []
+
+    def render_template(name, **context):
+        calls.append((name, context))
+        return ''
+
+    monkeypatch.setattr(main, 'render_template', render_template)
+    return calls
+
+
+@pytest.fixture
+def make_workflow(database):
+    """
+    Factory: an admin user, a text question type, `question_count`
+    questions and a workflow template with three approval stages.
+    """
+    from types import SimpleNamespace
+
+    from models import (ApprovalStage, Question, QuestionType, Role, User,
+                        WorkflowTemplate)
+
+    db = database
+
+    def make_workflow(question_count=10, title='Template'):
+        role = Role.query.filter_by(role_name='admin').first()
+        if role is None:
+            role = Role(role_name='admin')
+            db.session.add(role)
+        user = User.query.filter_by(username='admin').first()
+        if user is None:
+            user = User(username='admin',
+                        email='admin@example.com',
+                        password_hash='x',
+                        roles=[role])
+            db.session.add(user)
+        question_type = QuestionType.query.filter_by(type='text').first()
+        if question_type is None:
+            question_type = QuestionType(type='text', author='tests')
+            db.session.add(question_type)
+        db.session.flush()
+
+        questions = [
+            Question(question_text=f'{title} question {i}',
+                     question_type_id=question_type.question_type_id,
+                     author='tests') for i in range(question_count)
+        ]
+        db.session.add_all(questions)
+        db.session.flush()
+
+        template = WorkflowTemplate(title=title,
+                                    role_ids=role.role_id,
+                                    question_ids=','.join(
+                                        q.question_id for q in questions),
+                                    author='tests')
+        db.session.add(template)
+        db.session.flush()
+
+        stages = [
+            ApprovalStage(stage_name=f'{title} stage {order}',
+                          next_stage_name=f'{title} stage {order + 1}'
+                          if order < 3 else None,
+                          order=order,
+                          is_first=order == 1,
+                          is_last=order == 3,
+                          workflow_template_id=template.id,
+                          approve_role_id=role.role_id,
+                          deny_role_id=role.role_id,
+                          author='tests') for order in (1, 2, 3)
+        ]
+        db.session.add_all(stages)
+        db.session.commit()
+
+        return SimpleNamespace(
+            template_id=template.id,
+            question_ids=[q.question_id for q in questions],
+            stage_ids=[stage.stage_id for stage in stages],
+            role_id=role.role_id,
+            user_id=user.user_id)
+
+    return make_workflow
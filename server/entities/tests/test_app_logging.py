@@ -0,0 +1,96 @@
+import json
+import logging
+import queue
+import sys
+
+from flask import g
+
+from app_logging import (JsonFormatter, LazyQueueHandler,
+                         RequestContextFilter, parse_levels)
+
+
+def make_record(message='Saved %s', args=('case',), level=logging.INFO,
+                **extra):
+    record = logging.LogRecord('tests', level, __file__, 1, message, args,
+                               None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_full_queue_drops_and_counts(capsys):
+    handler = LazyQueueHandler(queue.Queue(1))
+
+    for _ in range(3):
+        handler.handle(make_record())
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 2
+    assert capsys.readouterr().err == ''
+
+
+def test_queued_record_has_its_message_resolved():
+    handler = LazyQueueHandler(queue.Queue())
+    args = ['before']
+
+    handler.handle(make_record('Value %s', (args, )))
+    args[0] = 'after'
+
+    record = handler.queue.get_nowait()
+    assert record.msg == "Value ['before']"
+    assert record.args is None
+
+
+def test_json_formatter_fields():
+    record = make_record(case_id='c1', request_id='r1', path='/cases')
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry['message'] == 'Saved case'
+    assert entry['level'] == 'INFO'
+    assert entry['logger'] == 'tests'
+    assert entry['case_id'] == 'c1'
+    assert entry['request_id'] == 'r1'
+    assert entry['path'] == '/cases'
+    assert 'exception' not in entry
+
+
+def test_json_formatter_exception():
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        record = make_record()
+        record.exc_info = sys.exc_info()
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert 'ValueError: boom' in entry['exception']
+
+
+def test_request_filter_samples_debug(app):
+    log_filter = RequestContextFilter()
+
+    with app.test_request_context('/cases', method='POST'):
+        g.request_id = 'abc'
+        g.log_sampled = False
+        assert not log_filter.filter(make_record(level=logging.DEBUG))
+        info = make_record()
+        assert log_filter.filter(info)
+        assert (info.request_id, info.method, info.path) == ('abc', 'POST',
+                                                             '/cases')
+
+        g.log_sampled = True
+        assert log_filter.filter(make_record(level=logging.DEBUG))
+
+    # Outside a request DEBUG records are always kept
+    assert log_filter.filter(make_record(level=logging.DEBUG))
+
+
+def test_parse_levels():
+    assert parse_levels('case_export=debug, sqlalchemy.engine=WARNING') == {
+        'case_export': 'DEBUG',
+        'sqlalchemy.engine': 'WARNING'
+    }
+    assert parse_levels('') == {}
+    assert parse_levels(None) == {}
+    assert parse_levels('broken,=INFO,name=') == {}
+    assert parse_levels({'a': 'INFO'}) == {'a': 'INFO'}
@@ -0,0 +1,45 @@
+import case_api
+from models import Case
+
+
+def add_case(db, template_id):
+    case = Case(workflow_id=template_id,
+                current_role_id='r1',
+                author_username='tests')
+    db.session.add(case)
+    db.session.commit()
+    return case.id
+
+
+def test_requires_login(client, database, make_workflow):
+    workflow = make_workflow(question_count=1)
+    case_id = add_case(database, workflow.template_id)
+
+    for path in ('/api/v1/cases', f'/api/v1/cases/{case_id}',
+                 f'/api/v1/cases/{case_id}/answers'):
+        response = client.get(path)
+        assert response.status_code == 403
+        assert 'cases' not in response.get_json()
+
+
+def test_case_detail(client, database, login, make_workflow):
+    workflow = make_workflow(question_count=1)
+    case_id = add_case(database, workflow.template_id)
+    login(workflow.user_id)
+
+    response = client.get(f'/api/v1/cases/{case_id}?fields=id,status')
+
+    assert response.status_code == 200
+    assert response.get_json() == {'id': case_id, 'status': 'active'}
+
+
+def test_case_deleted_after_version_lookup(client, login, monkeypatch):
+    login('u1')
+    # case_version() still found the case; the row is gone by the read
+    monkeypatch.setattr(case_api, 'case_version',
+                        lambda case_id, counted: (None, 0))
+
+    response = client.get('/api/v1/cases/missing')
+
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Case missing not found'}
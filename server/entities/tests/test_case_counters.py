@@ -0,0 +1,72 @@
+import pytest
+
+from case_counters import counted_status_breakdown, status_breakdown
+from models import Case, CaseStatusCount
+
+
+@pytest.fixture
+def counters(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'CASE_STATUS_COUNTERS', True)
+
+
+def add_cases(db, workflow, *statuses):
+    cases = [
+        Case(workflow_id=workflow.template_id,
+             current_role_id=workflow.role_id,
+             author_username='tests',
+             status=status) for status in statuses
+    ]
+    db.session.add_all(cases)
+    db.session.commit()
+    return cases
+
+
+def test_counters_follow_case_changes(database, counters, make_workflow):
+    workflow = make_workflow(question_count=1)
+
+    first, second, _ = add_cases(database, workflow, None, 'active',
+                                 'pending')
+    assert counted_status_breakdown() == {'active': 2, 'pending': 1}
+
+    second.status = 'completed'
+    database.session.commit()
+    assert counted_status_breakdown() == {
+        'active': 1,
+        'pending': 1,
+        'completed': 1
+    }
+
+    database.session.delete(first)
+    database.session.commit()
+    assert counted_status_breakdown() == {
+        'active': 0,
+        'pending': 1,
+        'completed': 1
+    }
+
+    second.status = 'abandoned'
+    database.session.flush()
+    database.session.rollback()
+    assert counted_status_breakdown()['completed'] == 1
+    assert status_breakdown() == {
+        status: count
+        for status, count in counted_status_breakdown().items() if count
+    }
+
+
+def test_rebuild_matches_group_by(app, database, make_workflow):
+    workflow = make_workflow(question_count=1)
+    # Written with the counters off, so the table is wrong
+    add_cases(database, workflow, 'active', 'active', 'pending')
+    database.session.add(CaseStatusCount(status='completed', count=5))
+    database.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['rebuild-case-counters'])
+
+    assert result.exit_code == 0, result.output
+    assert 'completed: counter was 5, cases has 0' in result.output
+    assert 'active: counter was 0, cases has 2' in result.output
+    assert counted_status_breakdown() == status_breakdown() == {
+        'active': 2,
+        'pending': 1
+    }
@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+
+from case_export import export_cases
+from models import Answer, Case
+
+
+def seed_answers(database, workflow):
+    case = Case(workflow_id=workflow.template_id,
+                current_role_id=workflow.role_id,
+                author_username='tests',
+                status='active')
+    database.session.add(case)
+    database.session.flush()
+    database.session.add_all([
+        Answer(case_id=case.id,
+               case_number=case.id,
+               workflow_id=workflow.template_id,
+               question_id=workflow.question_ids[0],
+               answer_text='in a case'),
+        Answer(id='orphan1',
+               case_id=None,
+               case_number='gone',
+               workflow_id=workflow.template_id,
+               question_id=workflow.question_ids[1],
+               answer_text='no case'),
+    ])
+    database.session.commit()
+    return case.id
+
+
+def test_ndjson_export_includes_orphaned_answers(database, make_workflow):
+    workflow = make_workflow(question_count=2)
+    case_id = seed_answers(database, workflow)
+
+    records = [
+        json.loads(line) for line in ''.join(export_cases()).splitlines()
+    ]
+
+    assert records[0]['id'] == case_id
+    assert [a['answer_text'] for a in records[0]['answers']] == ['in a case']
+    assert records[1]['record_type'] == 'orphaned_answer'
+    assert records[1]['id'] == 'orphan1'
+    assert records[1]['case_number'] == 'gone'
+
+
+def test_csv_export_includes_orphaned_answers(database, make_workflow):
+    workflow = make_workflow(question_count=2)
+    seed_answers(database, workflow)
+
+    rows = list(csv.DictReader(io.StringIO(''.join(export_cases('csv')))))
+
+    assert [row['record_type'] for row in rows
+            ] == ['case', 'answer', 'orphaned_answer']
+    assert rows[-1]['item_id'] == 'orphan1'
+    assert rows[-1]['text'] == 'no case'
+
+
+def test_status_filter_skips_orphaned_answers(database, make_workflow):
+    workflow = make_workflow(question_count=2)
+    seed_answers(database, workflow)
+
+    records = [
+        json.loads(line)
+        for line in ''.join(export_cases(status='active')).splitlines()
+    ]
+
+    assert len(records) == 1
+    assert 'record_type' not in records[0]
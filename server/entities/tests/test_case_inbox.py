@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+from case_inbox import decode_cursor, encode_cursor, list_cases
+from models import Case
+
+
+def add_cases(db, template_id, count):
+    now = datetime(2024, 1, 1)
+    cases = [
+        Case(workflow_id=template_id,
+             current_role_id='r1',
+             author_username='tests',
+             updated_on=now + timedelta(minutes=index))
+        for index in range(count)
+    ]
+    db.session.add_all(cases)
+    db.session.commit()
+    return cases
+
+
+def test_pages_through_cases_without_updated_on(database, make_workflow):
+    workflow = make_workflow(question_count=1)
+    cases = add_cases(database, workflow.template_id, 7)
+    legacy_ids = {cases[1].id, cases[4].id, cases[6].id}
+    database.session.execute(Case.__table__.update().where(
+        Case.id.in_(legacy_ids)).values(updated_on=None))
+    database.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        page = list_cases(cursor=cursor, limit=2)
+        seen.extend(case.id for case in page.cases)
+        if not page.has_next:
+            break
+        cursor = page.next_cursor
+
+    assert sorted(seen) == sorted(case.id for case in cases)
+    assert len(seen) == len(set(seen))
+    # Rows without updated_on come after all the others
+    assert set(seen[-3:]) == legacy_ids
+
+
+def test_cursor_round_trip_without_updated_on():
+    case = Case(id='abc', updated_on=None)
+    assert decode_cursor(encode_cursor(case)) == (None, 'abc')
+    assert decode_cursor('garbage') is None
@@ -0,0 +1,77 @@
+from sqlalchemy import text
+
+from case_search import MAX_SEARCH_RESULTS, search_cases
+from models import Answer, Case, Comment
+
+
+def add_case(db, workflow, case_id, answer_text):
+    db.session.add(
+        Case(id=case_id,
+             case_number=f'n-{case_id}',
+             workflow_id=workflow.template_id,
+             current_role_id=workflow.role_id,
+             author_username='tests'))
+    db.session.add(
+        Answer(case_id=case_id,
+               case_number=case_id,
+               workflow_id=workflow.template_id,
+               question_id=workflow.question_ids[0],
+               answer_text=answer_text))
+    db.session.commit()
+
+
+def found(terms, **kwargs):
+    return [result['case_id'] for result in search_cases(terms, **kwargs)]
+
+
+def test_index_follows_answer_changes(database, make_workflow):
+    workflow = make_workflow(question_count=1)
+    add_case(database, workflow, 'c1', 'broken hydraulic pump')
+    assert found('hydraulic pump') == ['c1']
+
+    answer = Answer.query.filter_by(case_id='c1').one()
+    answer.answer_text = 'replaced the valve'
+    database.session.commit()
+    assert found('hydraulic') == []
+    assert found('valve') == ['c1']
+
+    database.session.delete(answer)
+    database.session.commit()
+    assert found('valve') == []
+
+
+def test_index_follows_bulk_writes_and_comments(database, make_workflow):
+    workflow = make_workflow(question_count=1)
+    add_case(database, workflow, 'c1', 'first answer')
+    database.session.add(
+        Comment(case_id='c1', user_id=workflow.user_id,
+                content='needs a second look'))
+    database.session.commit()
+    results = search_cases('second look')
+    assert [r['case_id'] for r in results] == ['c1']
+    assert results[0]['snippets'][0]['source'] == 'comment'
+    assert results[0]['case_number'] == 'n-c1'
+
+    # Triggers also see writes that bypass the ORM
+    database.session.execute(
+        text("UPDATE comments SET content = 'all clear'"))
+    database.session.execute(text("DELETE FROM answers"))
+    database.session.commit()
+    assert found('second') == []
+    assert found('first') == []
+    assert found('clear') == ['c1']
+
+
+def test_limit_is_clamped(database, make_workflow):
+    workflow = make_workflow(question_count=1)
+    for index in range(3):
+        add_case(database, workflow, f'c{index}', 'pump failure')
+
+    assert len(found('pump', limit=-1)) == 1
+    assert len(found('pump', limit=0)) == 1
+    assert len(found('pump', limit=2)) == 2
+    assert len(found('pump', limit=MAX_SEARCH_RESULTS + 1)) == 3
+
+
+def test_search_route_requires_login(client, database):
+    assert client.get('/search?q=pump').status_code == 403
@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+from db_backup import BackupRestartLimit, backup_database, restore_backup
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / 'site.db')
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute('CREATE TABLE notes (id INTEGER, body TEXT)')
+        connection.executemany('INSERT INTO notes VALUES (?, ?)',
+                               [(i, 'x' * 2000) for i in range(50)])
+    connection.close()
+    return path
+
+
+def test_backup_copies_in_steps(source, tmp_path):
+    steps = []
+    result = backup_database(source,
+                             backup_dir=str(tmp_path / 'backups'),
+                             pages=4,
+                             sleep=0,
+                             progress=lambda remaining, total: steps.append(
+                                 remaining))
+
+    assert len(steps) > 1
+    restored = str(tmp_path / 'restored.db')
+    restore_backup(result.path, restored)
+    connection = sqlite3.connect(restored)
+    assert connection.execute('SELECT COUNT(*) FROM notes').fetchone() == (
+        50, )
+    connection.close()
+
+
+def test_backup_gives_up_when_writes_keep_restarting_it(source, tmp_path):
+    writer = sqlite3.connect(source, isolation_level=None)
+
+    def write(remaining, total):
+        writer.execute("INSERT INTO notes VALUES (0, 'new')")
+
+    with pytest.raises(BackupRestartLimit):
+        backup_database(source,
+                        backup_dir=str(tmp_path / 'backups'),
+                        pages=2,
+                        sleep=0,
+                        progress=write,
+                        max_restarts=3)
+    writer.close()
+
+    assert not list((tmp_path / 'backups').glob('*.db.gz'))
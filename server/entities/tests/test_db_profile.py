@@ -0,0 +1,25 @@
+import sqlite3
+
+from db_profile import DATABASE_PROFILES, _pragma_hook
+
+
+def test_production_pragmas(tmp_path):
+    connection = sqlite3.connect(str(tmp_path / 'profile.db'))
+    try:
+        _pragma_hook(DATABASE_PROFILES['production']['pragmas'])(connection,
+                                                                 None)
+        settings = {
+            name: connection.execute(f'PRAGMA {name}').fetchone()[0]
+            for name in ('journal_mode', 'synchronous', 'busy_timeout',
+                         'foreign_keys')
+        }
+    finally:
+        connection.close()
+
+    # synchronous NORMAL = 1; foreign keys are left to the default (off)
+    assert settings == {
+        'journal_mode': 'wal',
+        'synchronous': 1,
+        'busy_timeout': 5000,
+        'foreign_keys': 0
+    }
@@ -0,0 +1,33 @@
+from models import Answer, Case, Event
+
+
+def submit(client, url, workflow, **extra):
+    data = {
+        f'question_{question_id}': 'answer'
+        for question_id in workflow.question_ids
+    }
+    data.update(extra)
+    return client.post(url, data=data)
+
+
+def test_delete_case_with_events(client, login, make_workflow):
+    workflow = make_workflow(question_count=3)
+    login(workflow.user_id)
+    submit(client,
+           '/execute_workflow',
+           workflow,
+           template_id=workflow.template_id,
+           user_id=workflow.user_id)
+    case_id = Case.query.one().id
+
+    # Moving the case to its next stage records an event
+    response = submit(client, f'/edit_case/{case_id}', workflow)
+    assert response.status_code == 302
+    assert Event.query.filter_by(case_id=case_id).count() == 1
+
+    response = client.get(f'/delete_case/{case_id}')
+
+    assert response.status_code == 302
+    assert Case.query.count() == 0
+    assert Event.query.count() == 0
+    assert Answer.query.count() == 0
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from comment_threads import DEFAULT_THREADS_PER_PAGE
+from models import Case, Comment
+
+
+def test_edit_case_links_to_more_comment_threads(client, login, rendered,
+                                                 database, make_workflow):
+    workflow = make_workflow(question_count=2)
+    case = Case(workflow_id=workflow.template_id,
+                current_role_id=workflow.role_id,
+                current_stage_id=workflow.stage_ids[0],
+                author_username='tests')
+    database.session.add(case)
+    database.session.flush()
+    started = datetime(2024, 1, 1)
+    database.session.add_all([
+        Comment(content=f'comment {index}',
+                user_id='tests',
+                case_id=case.id,
+                created_on=started + timedelta(minutes=index))
+        for index in range(DEFAULT_THREADS_PER_PAGE + 5)
+    ])
+    database.session.commit()
+    case_id = case.id
+    login(workflow.user_id)
+
+    assert client.get(f'/edit_case/{case_id}').status_code == 200
+    _, context = rendered[-1]
+    assert len(context['comment_threads']) == DEFAULT_THREADS_PER_PAGE
+    assert context['previous_comments_url'] is None
+    next_url = context['next_comments_url']
+    assert next_url.endswith(f'/edit_case/{case_id}?comments_page=2')
+
+    assert client.get(next_url).status_code == 200
+    _, context = rendered[-1]
+    assert [node.comment.content for node in context['comment_threads']] == [
+        f'comment {index}'
+        for index in range(DEFAULT_THREADS_PER_PAGE,
+                           DEFAULT_THREADS_PER_PAGE + 5)
+    ]
+    assert context['next_comments_url'] is None
+    assert context['previous_comments_url'].endswith('comments_page=1')
@@ -0,0 +1,48 @@
+import json
+import logging
+from datetime import datetime
+
+from event_handler import EventPipeline
+from models import Event
+
+
+def event_row(event_id, case_id):
+    return {
+        'id': event_id,
+        'case_id': case_id,
+        'event_type': 'status_change',
+        'old_value': 'active',
+        'new_value': 'pending',
+        'created_on': datetime(2024, 1, 1),
+    }
+
+
+def test_failed_batch_is_retried_row_by_row(app, database, caplog):
+    pipeline = EventPipeline()
+    pipeline.app = app
+    # events.case_id is NOT NULL: this row fails the whole batch INSERT
+    batch = [event_row('e1', 'c1'), event_row('bad', None),
+             event_row('e2', 'c2')]
+
+    with caplog.at_level(logging.ERROR, logger='event_handler'):
+        pipeline._write(batch)
+
+    assert sorted(event.id for event in Event.query) == ['e1', 'e2']
+    assert pipeline.metrics()['flushed_events'] == 2
+    assert pipeline.metrics()['failed_events'] == 1
+    dead = [record for record in caplog.records
+            if record.name == 'event_handler.dead_letter']
+    assert len(dead) == 1
+    assert json.loads(dead[0].getMessage())['id'] == 'bad'
+    assert 'NOT NULL' in dead[0].error
+
+
+def test_batch_is_written_in_one_insert(app, database):
+    pipeline = EventPipeline()
+    pipeline.app = app
+
+    pipeline._write([event_row(f'e{index}', 'c1') for index in range(5)])
+
+    assert Event.query.count() == 5
+    assert pipeline.metrics()['flush_count'] == 1
+    assert pipeline.metrics()['failed_events'] == 0
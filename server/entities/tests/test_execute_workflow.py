@@ -0,0 +1,42 @@
+from models import Answer, Case
+from query_detector import count_queries
+
+
+def submit_new_case(client, workflow):
+    data = {
+        f'question_{question_id}': f'answer {index}'
+        for index, question_id in enumerate(workflow.question_ids)
+    }
+    data.update(template_id=workflow.template_id, user_id=workflow.user_id)
+    return client.post('/execute_workflow', data=data)
+
+
+def test_new_case_saves_answers(client, login, make_workflow):
+    workflow = make_workflow(question_count=10)
+    login(workflow.user_id)
+
+    response = submit_new_case(client, workflow)
+
+    assert response.status_code == 302
+    case = Case.query.one()
+    assert case.current_stage_id == workflow.stage_ids[0]
+    assert Answer.query.filter_by(case_id=case.id).count() == 10
+
+
+def test_new_case_statements_do_not_grow_with_questions(
+        client, login, make_workflow):
+    small = make_workflow(question_count=10, title='Small')
+    large = make_workflow(question_count=30, title='Large')
+    login(small.user_id)
+    # Warm the reference data and stage caches
+    submit_new_case(client, small)
+    submit_new_case(client, large)
+
+    counts = []
+    for workflow in (small, large):
+        with count_queries() as statements:
+            response = submit_new_case(client, workflow)
+        assert response.status_code == 302
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1], counts
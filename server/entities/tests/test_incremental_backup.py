@@ -0,0 +1,90 @@
+import os
+import sqlite3
+
+from db_backup import backup_database, list_backups
+from incremental_backup import (restore_chain, take_base_backup,
+                                take_delta_backup)
+from models import Case, RowChange
+
+
+def add_case(database, workflow, case_id):
+    database.session.add(
+        Case(id=case_id,
+             workflow_id=workflow.template_id,
+             current_role_id=workflow.role_id,
+             author_username='tests'))
+    database.session.commit()
+
+
+def case_ids(path):
+    connection = sqlite3.connect(path)
+    try:
+        return {row[0] for row in connection.execute('SELECT id FROM cases')}
+    finally:
+        connection.close()
+
+
+def test_retention_keeps_the_chain_base(database, make_workflow, tmp_path):
+    workflow = make_workflow(question_count=1)
+    add_case(database, workflow, 'base1')
+    database_path = database.engine.url.database
+    name = os.path.splitext(os.path.basename(database_path))[0]
+    backup_dir = str(tmp_path)
+
+    take_base_backup(database_path, backup_dir)
+    add_case(database, workflow, 'delta1')
+    take_delta_backup(database_path, backup_dir)
+
+    # Routine full backups with retention must not touch the chain
+    for _ in range(3):
+        backup_database(database_path, backup_dir=backup_dir, keep=1)
+    assert len(list_backups(backup_dir, name)) <= 1
+
+    target = str(tmp_path / 'restored.db')
+    restore_chain(backup_dir, name, target)
+    assert case_ids(target) == {'base1', 'delta1'}
+
+
+def test_change_log_is_pruned(database, make_workflow, tmp_path):
+    workflow = make_workflow(question_count=1)
+    add_case(database, workflow, 'gone1')
+    database.session.delete(database.session.get(Case, 'gone1'))
+    database.session.commit()
+    assert RowChange.query.count() == 1
+    database_path = database.engine.url.database
+
+    take_base_backup(database_path, str(tmp_path))
+    # Only the watermark row is left
+    assert RowChange.query.count() == 1
+
+    add_case(database, workflow, 'gone2')
+    database.session.delete(database.session.get(Case, 'gone2'))
+    database.session.commit()
+    take_delta_backup(database_path, str(tmp_path))
+    assert [change.row_id for change in RowChange.query] == ['gone2']
+
+
+def delete_case(database, case_id):
+    database.session.delete(database.session.get(Case, case_id))
+    database.session.commit()
+
+
+def test_deletes_after_pruning_reach_the_next_delta(database, make_workflow,
+                                                     tmp_path):
+    workflow = make_workflow(question_count=1)
+    for case_id in ('a', 'b', 'c'):
+        add_case(database, workflow, case_id)
+    database_path = database.engine.url.database
+    name = os.path.splitext(os.path.basename(database_path))[0]
+    backup_dir = str(tmp_path)
+
+    take_base_backup(database_path, backup_dir)
+    delete_case(database, 'a')
+    take_delta_backup(database_path, backup_dir)
+    # The log was pruned; this tombstone must still get a newer id
+    delete_case(database, 'b')
+    take_delta_backup(database_path, backup_dir)
+
+    target = str(tmp_path / 'restored.db')
+    restore_chain(backup_dir, name, target)
+    assert case_ids(target) == {'c'}
@@ -0,0 +1,100 @@
+import json
+import sqlite3
+
+import pytest
+
+from json_restore import restore_json_backup
+
+BACKUP = {
+    'database_name': 'site',
+    'exported_at': '2024-01-01T00:00:00Z',
+    # Bare values outside the rows are decoded one by one, so a read can
+    # end inside them
+    'format_version': 1.5,
+    'size_bytes': 12e3,
+    'complete': True,
+    'checksum': None,
+    'tables': {
+        'measurements': {
+            'schema': [
+                {'name': 'id', 'type': 'INTEGER', 'is_primary_key': True},
+                {'name': 'value', 'type': 'REAL'},
+                {'name': 'big', 'type': 'REAL'},
+                {'name': 'count', 'type': 'INTEGER'},
+                {'name': 'flag', 'type': 'BOOLEAN'},
+                {'name': 'note', 'type': 'TEXT'},
+            ],
+            'row_count': 3,
+            'average_row_bytes': -12.75e-1,
+            'data': [
+                {'id': 1, 'value': 1.5, 'big': 12e3, 'count': 1234567,
+                 'flag': True, 'note': None},
+                {'id': 2, 'value': -0.25, 'big': 1.5e-7, 'count': 0,
+                 'flag': False, 'note': 'a, b] c}'},
+                {'id': 3, 'value': 100.0, 'big': -2e10, 'count': -42,
+                 'flag': None, 'note': '"quoted"'},
+            ],
+        },
+    },
+}
+
+EXPECTED = [
+    (1, 1.5, 12000.0, 1234567, 1, None),
+    (2, -0.25, 1.5e-7, 0, 0, 'a, b] c}'),
+    (3, 100.0, -2e10, -42, None, '"quoted"'),
+]
+
+
+@pytest.mark.parametrize('read_chunk', [1, 2, 3, 5, 7, 64, 1024 * 1024])
+def test_restore_at_any_chunk_size(tmp_path, read_chunk):
+    backup_path = tmp_path / 'backup.json'
+    # Compact separators put numbers directly against the delimiters
+    backup_path.write_text(json.dumps(BACKUP, separators=(',', ':')))
+    database_path = str(tmp_path / 'restored.db')
+
+    result = restore_json_backup(str(backup_path),
+                                 database_path,
+                                 read_chunk=read_chunk)
+
+    assert result.tables == {'measurements': 3}
+    connection = sqlite3.connect(database_path)
+    try:
+        rows = connection.execute(
+            'SELECT * FROM measurements ORDER BY id').fetchall()
+    finally:
+        connection.close()
+    assert rows == EXPECTED
+
+
+def test_failed_append_keeps_the_indexes(tmp_path):
+    database_path = str(tmp_path / 'existing.db')
+    connection = sqlite3.connect(database_path)
+    connection.execute('CREATE TABLE measurements (id INTEGER PRIMARY KEY, '
+                       'value REAL, big REAL, count INTEGER, flag BOOLEAN, '
+                       'note TEXT)')
+    connection.execute('CREATE INDEX ix_measurements_note '
+                       'ON measurements (note)')
+    connection.execute(
+        "INSERT INTO measurements (id, note) VALUES (10, 'kept')")
+    connection.commit()
+    connection.close()
+    backup = json.dumps(BACKUP, separators=(',', ':'))
+    backup_path = tmp_path / 'truncated.json'
+    # Cut off inside the second row
+    backup_path.write_text(backup[:backup.index('{"id":2') + 10])
+
+    with pytest.raises(ValueError):
+        restore_json_backup(str(backup_path), database_path, replace=False,
+                            batch_size=1)
+
+    connection = sqlite3.connect(database_path)
+    try:
+        indexes = connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' "
+            "AND tbl_name = 'measurements'").fetchall()
+        rows = connection.execute('SELECT * FROM measurements').fetchall()
+    finally:
+        connection.close()
+    assert indexes == [('ix_measurements_note', )]
+    # The failed table's transaction was rolled back
+    assert rows == [(10, None, None, None, None, 'kept')]
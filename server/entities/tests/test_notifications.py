@@ -0,0 +1,127 @@
+import pytest
+
+from models import InternalMessage, User
+from notifications import notification_hub
+from query_detector import count_queries
+
+
+@pytest.fixture
+def hub():
+    notification_hub._unread.clear()
+    notification_hub._changes.clear()
+    yield notification_hub
+    notification_hub.unread_ttl = 60
+
+
+@pytest.fixture
+def user_id(database):
+    user = User(username='reader',
+                email='reader@example.com',
+                password_hash='x')
+    database.session.add(user)
+    database.session.commit()
+    return user.user_id
+
+
+def send(db, user_id, subject='Hello', is_read=False):
+    message = InternalMessage(to_user_id=user_id,
+                              subject=subject,
+                              content='Body',
+                              is_read=is_read)
+    db.session.add(message)
+    db.session.commit()
+    return message
+
+
+def test_count_follows_commits(database, hub, user_id):
+    send(database, user_id, 'first')
+    send(database, user_id, 'old', is_read=True)
+    assert hub.unread_count(user_id) == 1
+
+    second = send(database, user_id, 'second')
+    third = send(database, user_id, 'third')
+    with count_queries() as statements:
+        assert hub.unread_count(user_id) == 3
+    assert statements == []
+
+    second.is_read = True
+    database.session.commit()
+    assert hub.unread_count(user_id) == 2
+
+    database.session.delete(third)
+    database.session.commit()
+    assert hub.unread_count(user_id) == 1
+
+    rolled_back = InternalMessage(to_user_id=user_id,
+                                  subject='never',
+                                  content='Body')
+    database.session.add(rolled_back)
+    database.session.flush()
+    database.session.rollback()
+    assert hub.unread_count(user_id) == 1
+
+
+def test_commit_during_the_count_is_not_lost(database, hub, user_id,
+                                             monkeypatch):
+    count = type(hub)._count
+
+    def count_then_commit(self, counted_user_id):
+        counted = count(self, counted_user_id)
+        # Another request commits a message after the COUNT ran
+        monkeypatch.setattr(type(hub), '_count', count)
+        send(database, user_id, 'racing')
+        return counted
+
+    monkeypatch.setattr(type(hub), '_count', count_then_commit)
+
+    assert hub.unread_count(user_id) == 0
+    assert hub.unread_count(user_id) == 1
+
+
+def test_changes_from_elsewhere_show_after_the_ttl(database, hub, user_id):
+    assert hub.unread_count(user_id) == 0
+    # Bulk statements (or other processes) bypass the session hooks
+    database.session.execute(InternalMessage.__table__.insert().values(
+        id='bulk1', to_user_id=user_id, subject='Bulk', content='Body',
+        is_read=False))
+    database.session.commit()
+    assert hub.unread_count(user_id) == 0
+
+    hub.unread_ttl = 0
+    assert hub.unread_count(user_id) == 1
+
+
+def test_unread_count_route(client, database, hub, login, user_id):
+    send(database, user_id)
+    login(user_id)
+
+    assert client.get('/notifications/unread_count').get_json() == {
+        'unread_count': 1
+    }
+    client.post('/notifications/mark_all_read')
+    assert client.get('/notifications/unread_count').get_json() == {
+        'unread_count': 0
+    }
+
+
+def test_stream_pushes_committed_messages(client, database, hub, login,
+                                          user_id):
+    send(database, user_id, 'waiting')
+    login(user_id)
+
+    response = client.get('/notifications/stream', buffered=False)
+    events = response.iter_encoded()
+    try:
+        assert next(events) == (b'event: unread\n'
+                                b'data: {"unread_count": 1}\n\n')
+
+        message = send(database, user_id, 'pushed')
+        pushed = next(events).decode()
+    finally:
+        response.close()
+
+    assert pushed.startswith('event: message\n')
+    assert f'"id": "{message.id}"' in pushed
+    assert '"subject": "pushed"' in pushed
+    assert '"unread_count": 2' in pushed
+    assert notification_hub._subscribers == {}
@@ -0,0 +1,50 @@
+from models import Role, User, user_roles
+from page_cache import table_fingerprints
+
+
+def add_user_with_role(db):
+    admin, editor = Role(role_name='admin'), Role(role_name='editor')
+    user = User(username='alice',
+                email='alice@example.com',
+                password_hash='x',
+                roles=[admin])
+    db.session.add_all([admin, editor, user])
+    db.session.commit()
+    return user, editor
+
+
+def test_swapping_a_role_changes_the_fingerprint(database):
+    user, editor = add_user_with_role(database)
+    before = table_fingerprints(User, user_roles)
+
+    user.roles = [editor]
+    database.session.commit()
+    after = table_fingerprints(User, user_roles)
+
+    assert after[1][0] == before[1][0] == 1
+    assert after[1] != before[1]
+
+
+def test_users_page_is_not_served_stale(client, database, login, rendered):
+    user, editor = add_user_with_role(database)
+    login(user.user_id)
+    etag = client.get('/users').headers['ETag'].strip('"')
+
+    user.roles = [editor]
+    database.session.commit()
+    response = client.get('/users', headers={'If-None-Match': f'"{etag}"'})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'].strip('"') != etag
+
+
+def test_users_page_follows_role_renames(client, database, login, rendered):
+    user, _ = add_user_with_role(database)
+    login(user.user_id)
+    etag = client.get('/users').headers['ETag'].strip('"')
+
+    user.roles[0].role_name = 'administrator'
+    database.session.commit()
+    response = client.get('/users', headers={'If-None-Match': f'"{etag}"'})
+
+    assert response.status_code == 200
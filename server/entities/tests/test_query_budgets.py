@@ -0,0 +1,62 @@
+import pytest
+
+from forms import form_class_cache
+from models import Case
+from query_detector import QueryProblem, count_queries
+from reference_data import reference_data
+from stage_graph import stage_graph
+from test_execute_workflow import submit_new_case
+
+HOT_ROUTES = ('select_workflow_template', 'execute_workflow', 'edit_case')
+
+
+@pytest.fixture
+def case_workflow(client, login, make_workflow, rendered):
+    workflow = make_workflow(question_count=30)
+    login(workflow.user_id)
+    submit_new_case(client, workflow)
+    workflow.case_id = Case.query.one().id
+    workflow.answers = {
+        f'question_{question_id}': 'answer'
+        for question_id in workflow.question_ids
+    }
+    return workflow
+
+
+def hot_requests(client, workflow):
+    edit_url = f'/edit_case/{workflow.case_id}'
+    return [
+        ('select_workflow_template',
+         lambda: client.get('/select_workflow_template')),
+        ('execute_workflow', lambda: client.get('/execute_workflow')),
+        ('execute_workflow', lambda: submit_new_case(client, workflow)),
+        ('edit_case', lambda: client.get(edit_url)),
+        ('edit_case', lambda: client.post(edit_url, data=workflow.answers)),
+    ]
+
+
+@pytest.mark.parametrize('endpoint', HOT_ROUTES)
+def test_hot_route_declares_a_budget(app, endpoint):
+    assert app.view_functions[endpoint].query_budget is not None
+
+
+def test_hot_routes_stay_within_budget(app, client, case_workflow):
+    for endpoint, send in hot_requests(client, case_workflow):
+        # Cold caches are the most expensive request
+        reference_data.invalidate()
+        stage_graph.invalidate()
+        form_class_cache.clear()
+        with count_queries() as statements:
+            # Raises QueryProblem (conftest: 'raise' mode) over budget
+            response = send()
+        assert response.status_code in (200, 302), endpoint
+        budget = app.view_functions[endpoint].query_budget
+        assert len(statements) <= budget, (endpoint, statements)
+
+
+def test_budget_breach_fails_the_request(app, client, case_workflow,
+                                         monkeypatch):
+    monkeypatch.setattr(app.view_functions['edit_case'], 'query_budget', 1)
+
+    with pytest.raises(QueryProblem, match='budget is 1'):
+        client.get(f'/edit_case/{case_workflow.case_id}')
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+from flask_migrate import stamp, upgrade
+from sqlalchemy import inspect
+
+from query_plans import HOT_QUERIES, check_query_plans
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                              'migrations')
+
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_hot_query_uses_an_index(database, name):
+    plan, problems = check_query_plans({name: HOT_QUERIES[name]})[name]
+
+    assert not problems, plan
+    assert any('USING' in detail and 'INDEX' in detail for detail in plan), plan
+
+
+def test_upgrade_builds_an_empty_database(database):
+    db = database
+    db.drop_all()
+
+    upgrade(directory=MIGRATIONS_DIR)
+
+    inspector = inspect(db.engine)
+    assert set(db.metadata.tables) <= set(inspector.get_table_names())
+    for table in db.metadata.tables.values():
+        migrated = {index['name'] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= migrated, table.name
+    plans = check_query_plans()
+    assert not [name for name, (_, problems) in plans.items() if problems]
+
+
+def test_upgrade_after_create_all(database):
+    # See migrations/README: create_all() databases are stamped first
+    stamp(directory=MIGRATIONS_DIR, revision='1d07b3e5a9c2')
+
+    upgrade(directory=MIGRATIONS_DIR)
+
+    plans = check_query_plans()
+    assert not [name for name, (_, problems) in plans.items() if problems]
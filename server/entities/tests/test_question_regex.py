@@ -0,0 +1,32 @@
+import question_regex
+from question_regex import get_pattern, matches
+
+
+def test_registry_is_bounded(monkeypatch):
+    monkeypatch.setattr(question_regex, 'MAX_PATTERNS', 3)
+    monkeypatch.setattr(question_regex, '_patterns',
+                        question_regex.OrderedDict())
+
+    for index in range(10):
+        get_pattern(f'^a{index}$')
+
+    assert list(question_regex._patterns) == ['^a7$', '^a8$', '^a9$']
+
+
+def test_recently_used_patterns_are_kept(monkeypatch):
+    monkeypatch.setattr(question_regex, 'MAX_PATTERNS', 2)
+    monkeypatch.setattr(question_regex, '_patterns',
+                        question_regex.OrderedDict())
+
+    get_pattern('^a$')
+    get_pattern('^b$')
+    get_pattern('^a$')
+    get_pattern('^c$')
+
+    assert list(question_regex._patterns) == ['^a$', '^c$']
+
+
+def test_invalid_pattern_never_matches():
+    assert get_pattern('(') is None
+    assert not matches('(', 'anything')
+    assert matches(r'^\d+$', 42)
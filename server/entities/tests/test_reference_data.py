@@ -0,0 +1,59 @@
+import pytest
+
+from models import QuestionType, Role
+from query_detector import count_queries
+from reference_data import reference_data
+
+
+@pytest.fixture
+def ttl():
+    yield reference_data
+    reference_data.ttl = 30
+
+
+def role_names():
+    return sorted(role.role_name for role in reference_data.roles)
+
+
+def test_commit_invalidates_the_snapshot(database):
+    database.session.add(Role(role_name='admin'))
+    database.session.commit()
+    assert role_names() == ['admin']
+    with count_queries() as statements:
+        assert role_names() == ['admin']
+    assert statements == []
+
+    database.session.add(Role(role_name='reviewer'))
+    database.session.flush()
+    # Not committed yet: other requests keep the old snapshot
+    assert role_names() == ['admin']
+    database.session.commit()
+    assert role_names() == ['admin', 'reviewer']
+
+    Role.query.filter_by(role_name='admin').one().role_name = 'owner'
+    database.session.commit()
+    assert role_names() == ['owner', 'reviewer']
+
+
+def test_question_type_change_refreshes_questions(database, make_workflow):
+    workflow = make_workflow(question_count=1)
+    question = reference_data.questions.get(workflow.question_ids[0])
+    assert question.question_type.type == 'text'
+
+    QuestionType.query.filter_by(type='text').one().type = 'string'
+    database.session.commit()
+
+    question = reference_data.questions.get(workflow.question_ids[0])
+    assert question.question_type.type == 'string'
+
+
+def test_changes_from_elsewhere_show_after_the_ttl(database, ttl):
+    assert role_names() == []
+    # Bulk statements (or other workers) bypass the session hooks
+    database.session.execute(Role.__table__.insert().values(
+        role_id='r1', role_name='bulk', created_on=database.func.now()))
+    database.session.commit()
+    assert role_names() == []
+
+    reference_data.ttl = 0
+    assert role_names() == ['bulk']
@@ -1,3 +1,8 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+
 from wtforms.validators import DataRequired
 from wtforms import StringField, SubmitField, PasswordField
 from wtforms.validators import DataRequired, Length
@@ -19,6 +24,9 @@ from wtforms.validators import DataRequired, Email, EqualTo, Length, Optional
 from wtforms import StringField, IntegerField, SelectField, validators
 
 from models import Role, WorkflowTemplate, ScreenBuilder
+from reference_data import reference_data
+
+logger = logging.getLogger(__name__)
 
 
 class TeamForm(FlaskForm):
@@ -53,8 +61,7 @@ class UserForm(FlaskForm):
 
     def __init__(self, *args, **kwargs):
         super(UserForm, self).__init__(*args, **kwargs)
-        self.roles.choices = [(str(role.role_id), role.role_name)
-                              for role in Role.query.all()]
+        self.roles.choices = reference_data.roles.choices('role_name')
 
 
 # ==================================
@@ -83,37 +90,45 @@ class QuestionTypeForm(FlaskForm):
         if not super(QuestionTypeForm, self).validate():
             return False
 
-        print(
-            f"these values hasregex:{self.has_regex.data} and hasopts:{self.has_options.data}"
-        )
+        logger.debug('QuestionTypeForm: has_regex=%s has_options=%s',
+                     self.has_regex.data, self.has_options.data)
 
         # Validate options and regex conditions
         if self.has_regex.data and self.has_options.data:
             self.has_options.errors.append(
                 'Cannot have both Regex and Options selected.')
-            print("cannot do both")
+            logger.debug('QuestionTypeForm: both regex and options set')
             return False
 
         # Validate options based on has_options
         if self.has_options.data and not self.options_str.data:
             self.options_str.errors.append(
                 'Options must not be blank when Has Options is selected.')
-            print("needs options if checked")
+            logger.debug('QuestionTypeForm: options missing')
             return False
 
         # Validate regex_str based on has_regex
         if self.has_regex.data and not self.regex_str.data:
             self.regex_str.errors.append(
                 'Regex String must not be blank when Has Regex is selected.')
-            print("needs regex if checked")
+            logger.debug('QuestionTypeForm: regex missing')
             return False
 
+        # Reject a regex that does not compile before it is saved
+        if self.has_regex.data:
+            try:
+                re.compile(self.regex_str.data)
+            except re.error as e:
+                self.regex_str.errors.append(
+                    f'Regex String is not a valid regular expression: {e}')
+                return False
+
         # Validate supplemental_str based on has_supplemental
         if self.has_supplemental.data and not self.supplemental_str.data:
             self.supplemental_str.errors.append(
                 'Supplemental String must not be blank when Has Supplemental is selected.'
             )
-            print("needs supple if checked")
+            logger.debug('QuestionTypeForm: supplemental missing')
             return False
         return True
 
@@ -138,13 +153,12 @@ class QuestionForm(FlaskForm):
 
     def __init__(self, *args, **kwargs):
         super(QuestionForm, self).__init__(*args, **kwargs)
-        from models import QuestionType
-        # Load all active question types
-        self.question_type.choices = [
-            (str(qt.question_type_id), qt.type)
-            for qt in QuestionType.query.filter_by(
-                is_active=True).order_by(QuestionType.type).all()
-        ]
+        # All active question types
+        question_types = reference_data.question_types
+        self.question_type.choices = question_types.choices(
+            'type',
+            sorted((qt for qt in question_types if qt.is_active),
+                   key=lambda qt: qt.type))
 
 
 # =====================================================
@@ -174,11 +188,9 @@ class WorkflowTemplateForm(FlaskForm):
     def __init__(self, *args, **kwargs):
         super(WorkflowTemplateForm, self).__init__(*args, **kwargs)
         # Populate choices dynamically
-        from models import Role, Question
-        self.roles.choices = [(str(role.role_id), role.role_name)
-                              for role in Role.query.all()]
-        self.questions.choices = [(str(q.question_id), q.question_text)
-                                  for q in Question.query.all()]
+        self.roles.choices = reference_data.roles.choices('role_name')
+        self.questions.choices = reference_data.questions.choices(
+            'question_text')
 
 
 # ===================================================
@@ -248,6 +260,76 @@ def generate_form(template):
     return DynamicForm
 
 
+class FormClassCache:
+    """
+    Bounded LRU cache of generate_form() classes keyed by workflow template id.
+
+    Each entry remembers the version fingerprint of the template it was built
+    from (see form_fingerprint); a lookup with a different fingerprint
+    rebuilds the class and replaces the entry.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, template):
+        fingerprint = form_fingerprint(template)
+        with self._lock:
+            entry = self._entries.get(template.id)
+            if entry is not None and entry[0] == fingerprint:
+                self._entries.move_to_end(template.id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        form_class = generate_form(template)
+
+        with self._lock:
+            self._entries[template.id] = (fingerprint, form_class)
+            self._entries.move_to_end(template.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return form_class
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+        }
+
+
+def form_fingerprint(template):
+    """
+    Version of everything generate_form() reads: the template, and each
+    question and question type in template.questions_list (in order).
+    """
+    return (template.updated_on, tuple(
+        (question.question_id, question.updated_on,
+         question.question_type_id, question.question_type.updated_on)
+        for question in template.questions_list))
+
+
+form_class_cache = FormClassCache()
+
+
+def get_form_class(template):
+    """
+    Cached generate_form(): only builds a new class when the template,
+    one of its questions or their question types changed.
+    """
+    return form_class_cache.get(template)
+
+
 # ===================================================
 
 
@@ -257,9 +339,8 @@ class ScreenBuilderForm(FlaskForm):
 
     def __init__(self, *args, **kwargs):
         super(ScreenBuilderForm, self).__init__(*args, **kwargs)
-        from models import Question
-        self.questions.choices = [(str(q.question_id), q.question_text)
-                                  for q in Question.query.all()]
+        self.questions.choices = reference_data.questions.choices(
+            'question_text')
 
 
 class ApprovalStageForm(FlaskForm):
@@ -283,22 +364,18 @@ class ApprovalStageForm(FlaskForm):
     def __init__(self, *args, **kwargs):
         super(ApprovalStageForm, self).__init__(*args, **kwargs)
 
-        from models import ApprovalStage
-        stages = ApprovalStage.query.all()
         stage_choices = [(stage.stage_name, stage.stage_name)
-                         for stage in stages]
+                         for stage in reference_data.approval_stages]
         stage_choices.insert(0, ('', 'None'))
 
         self.next_stage_name.choices = stage_choices
         self.last_stage_name.choices = stage_choices
 
-        self.workflow_template.choices = [
-            (wt.id, wt.title) for wt in WorkflowTemplate.query.all()
-        ]
-        self.approve_role.choices = [(role.role_id, role.role_name)
-                                     for role in Role.query.all()]
-        self.deny_role.choices = [(role.role_id, role.role_name)
-                                  for role in Role.query.all()]
+        self.workflow_template.choices = (
+            reference_data.workflow_templates.choices('title'))
+        role_choices = reference_data.roles.choices('role_name')
+        self.approve_role.choices = role_choices
+        self.deny_role.choices = role_choices
 
 
 # ============================